@@ -1,16 +1,56 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, send_file, url_for
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import parse_form_data
 import psycopg2
 from pgvector.psycopg2 import register_vector
 from services.processing_service import ProcessingService
 from services.report_generation_service import ReportGenerationService
+from services.llm_scheduler import BATCH, INTERACTIVE, get_scheduler, llm_context
+from services.llm_router import get_router
+from services.instrumentation import COUNTERS, TimedCursor
+from services.blob_store import BlobStore
+from services.link_refresh_service import LinkRefreshService
+from services import metrics
+from tracing import FileExporter, get_exporter, render_waterfall, span, use_span, waterfall
+from repositories.item_repository import ItemRepository
+from repositories.job_repository import JobRepository
 from repositories.node_repository import NodeRepository
+from repositories.report_section_repository import ReportSectionRepository
+from repositories.job_report_repository import JobReportRepository
+from repositories.report_task_repository import ReportTaskRepository
+from repositories.refresh_task_repository import RefreshTaskRepository
 import config
+import base64
+import functools
+import io
+import json
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 app = Flask(__name__)
 CORS(app)
 
+# Report regenerations run here instead of in the gunicorn request
+report_executor = ThreadPoolExecutor(max_workers=config.REPORT_TASK_WORKERS, thread_name_prefix='report-task')
+# Jobs of bulk submissions (and due retries of failed attempts) are queued here rather than each getting its own thread
+bulk_job_executor = ThreadPoolExecutor(max_workers=config.BULK_JOB_WORKERS, thread_name_prefix='bulk-job')
+# Link refreshes requested through the API
+refresh_executor = ThreadPoolExecutor(max_workers=config.LINK_REFRESH_WORKERS, thread_name_prefix='link-refresh')
+
+
+@app.before_request
+def start_request_metrics():
+    metrics.begin_request()
+
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.end_request(request.method, route, response.status_code)
+    return response
+
 
 def get_db_connection():
     conn = psycopg2.connect(
@@ -18,7 +58,8 @@ def get_db_connection():
         port=config.DB_PORT,
         database=config.DB_NAME,
         user=config.DB_USER,
-        password=config.DB_PASSWORD
+        password=config.DB_PASSWORD,
+        cursor_factory=TimedCursor
     )
     register_vector(conn)
     return conn
@@ -42,28 +83,168 @@ def submit_job():
         return jsonify({'error': 'Empty items'}), 400
 
     try:
+        job_uuid = create_and_start_job(items, processing_config)
+        return jsonify({'job_uuid': job_uuid}), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/submit/multipart', methods=['POST'])
+def submit_job_multipart():
+    """Submit a job as multipart/form-data, for large documents.
+
+    File parts are streamed into the blob store in chunks and hashed on the
+    way, so memory use does not grow with their size. Form fields:
+    `processing` (JSON) and optionally `items` (JSON list): text and link
+    items, and file items `{"type": "file", "file": "<part name>", "wage": ...}`
+    that give a wage to the file part of that name. File parts not named by
+    an item become file items without a wage.
+    """
+    blob_store = BlobStore()
+    writers = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        writer = blob_store.writer()
+        writers.append(writer)
+        return writer
+
+    try:
+        _, form, files = parse_form_data(
+            request.environ, stream_factory=stream_factory, silent=False,
+            max_form_memory_size=config.UPLOAD_MAX_FORM_MEMORY, max_form_parts=config.UPLOAD_MAX_PARTS
+        )
+        uploads: dict = {}
+        for name, storage in files.items(multi=True):
+            uploads.setdefault(name, []).append(storage.stream.commit())
+
+        try:
+            items = json.loads(form.get('items') or '[]')
+            processing_config = json.loads(form.get('processing') or '{}')
+        except json.JSONDecodeError as e:
+            return jsonify({'error': f'Invalid JSON form field: {e}'}), 400
+
+        job_items = []
+        for item in items:
+            if item.get('type') == 'file' and 'file' in item:
+                if not uploads.get(item['file']):
+                    return jsonify({'error': f"Missing file part: {item['file']}"}), 400
+                blob_hash, _ = uploads[item['file']].pop(0)
+                job_items.append({'type': 'file', 'blob_hash': blob_hash, 'wage': item.get('wage')})
+            else:
+                job_items.append(item)
+        for blobs in uploads.values():
+            job_items.extend({'type': 'file', 'blob_hash': blob_hash} for blob_hash, _ in blobs)
+
+        if not job_items:
+            return jsonify({'error': 'Empty items'}), 400
+
+        job_uuid = create_and_start_job(job_items, processing_config)
+        return jsonify({'job_uuid': job_uuid}), 201
+    except RequestEntityTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        # Parts of a failed upload are removed; committed blobs stay (they are deduplicated)
+        for writer in writers:
+            writer.discard()
+
+
+@app.route('/api/submit/bulk', methods=['POST'])
+def submit_jobs_bulk():
+    """Submit many jobs as NDJSON: one job spec per line ({"items": [...], "processing": {...}}).
+
+    Jobs and items are inserted with set-based statements in one
+    transaction. A spec's `idempotency_key` (or, for specs without one, the
+    `Idempotency-Key` header plus the line number) makes retries safe: a key
+    seen before returns its existing job, which is not processed again.
+    Returns the job UUIDs in input order.
+    """
+    header_key = request.headers.get('Idempotency-Key')
+    specs = []
+    for line_no, line in enumerate(iter(request.stream.readline, b''), 1):
+        if not line.strip():
+            continue
+        try:
+            spec = json.loads(line)
+        except json.JSONDecodeError as e:
+            return jsonify({'error': f'Line {line_no}: invalid JSON: {e}'}), 400
+        if not isinstance(spec, dict) or not spec.get('items'):
+            return jsonify({'error': f'Line {line_no}: missing items'}), 400
+        if not spec.get('idempotency_key') and header_key:
+            spec['idempotency_key'] = f"{header_key}:{line_no}"
+        specs.append(spec)
+        if len(specs) > config.BULK_SUBMIT_MAX_JOBS:
+            return jsonify({'error': f'At most {config.BULK_SUBMIT_MAX_JOBS} jobs per request'}), 413
+
+    if not specs:
+        return jsonify({'error': 'No job specs'}), 400
+
+    try:
+        with span('submit_bulk', jobs=len(specs)) as submit_span:
+            conn = get_db_connection()
+            try:
+                results = ProcessingService(conn).create_jobs_bulk(specs)
+            finally:
+                conn.close()
+
+        for spec, result in zip(specs, results):
+            if result['created'] and spec.get('processing'):
+                queue_job(result['job_uuid'], spec['processing'], submit_span)
+
+        return jsonify({'jobs': results}), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def create_and_start_job(items, processing_config) -> str:
+    """Create a job and, when processing is configured, queue it on the job executor."""
+    with span('submit_job', items=len(items)) as submit_span:
         conn = get_db_connection()
         processing_service = ProcessingService(conn)
         job_uuid = processing_service.create_job(items)
         conn.close()
+        if submit_span is not None:
+            submit_span.job_uuid = job_uuid
 
-        if processing_config:
-            def process_in_background():
-                conn = get_db_connection()
-                service = ProcessingService(conn)
-                try:
-                    service.process_job(job_uuid, processing_config)
-                finally:
-                    conn.close()
+    if processing_config:
+        queue_job(job_uuid, processing_config, submit_span)
 
-            thread = threading.Thread(target=process_in_background, daemon=True)
-            thread.start()
+    return job_uuid
 
-        return jsonify({'job_uuid': job_uuid}), 201
+
+def run_queued_job(job_uuid, processing_config, parent_span):
+    metrics.BACKGROUND_JOBS.dec(kind='processing', state='queued')
+    try:
+        process_in_background(job_uuid, processing_config, parent_span)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        print(f"[BULK] Job {job_uuid} failed: {e}", flush=True)
+
+
+def process_in_background(job_uuid, processing_config, parent_span):
+    metrics.BACKGROUND_JOBS.inc(kind='processing', state='running')
+    conn = get_db_connection()
+    # Independent pipeline steps run in parallel, each on a connection of its own
+    service = ProcessingService(conn, connection_factory=get_db_connection)
+    try:
+        # Continues the submit trace in the background thread
+        with use_span(parent_span), span('process_job', job_uuid=job_uuid), llm_context(job_uuid, BATCH):
+            retry_in = service.run_job(job_uuid, processing_config)
+    finally:
+        conn.close()
+        metrics.BACKGROUND_JOBS.dec(kind='processing', state='running')
+
+    if retry_in is not None:
+        # The next attempt is stored with the job; the scheduler loop of some worker queues it when due
+        print(f"[JOB {job_uuid}] Next attempt scheduled in {retry_in}s", flush=True)
 
 
+def queue_job(job_uuid, processing_config, parent_span):
+    metrics.BACKGROUND_JOBS.inc(kind='processing', state='queued')
+    bulk_job_executor.submit(run_queued_job, job_uuid, processing_config, parent_span)
+
 
 @app.route('/api/jobs/<job_uuid>', methods=['GET'])
 def get_job_details(job_uuid):
@@ -77,7 +258,8 @@ def get_job_details(job_uuid):
             conn.close()
             return jsonify({'error': 'Job not found'}), 404
 
-        steps = processing_service.get_job_steps(job_uuid)
+        # Step profiles are served by /api/jobs/<uuid>/profile
+        steps = processing_service.get_job_steps(job_uuid, full_metadata=False)
         facts = processing_service.get_extracted_facts(job_uuid)
         nodes = node_repo.get_nodes_by_job(job_uuid)
         
@@ -94,6 +276,7 @@ def get_job_details(job_uuid):
 
         # Report is now in job_status directly
         report = job_status.get('report')
+        reports = JobReportRepository(conn).get_reports(job_uuid)
 
         conn.close()
 
@@ -103,14 +286,316 @@ def get_job_details(job_uuid):
             'facts': facts,
             'nodes': nodes,
             'node_relations': all_relations,
-            'report': report
+            'report': report,
+            'reports': reports
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/jobs/<job_uuid>/items', methods=['POST'])
+def add_job_items(job_uuid):
+    """Add items to an existing job and process only them.
+
+    Facts are extracted from the new items only; predictions and unknowns
+    are extracted from the new items' content (with all facts as context)
+    and added to the existing nodes and relations. Report sections whose
+    inputs did not change are reused from the cache. The job's report is
+    marked stale (`report_stale`) until it has been regenerated.
+    """
+    data = request.json
+    if not data or not data.get('items'):
+        return jsonify({'error': 'Missing items'}), 400
+
+    try:
+        conn = get_db_connection()
+        processing_service = ProcessingService(conn)
+        job = processing_service.get_job_status(job_uuid)
+        if not job:
+            conn.close()
+            return jsonify({'error': 'Job not found'}), 404
+        # Held as 'processing' until a run takes over, so no run or other change can interleave
+        previous_status = processing_service.claim_job(job_uuid)
+        if previous_status is None:
+            conn.close()
+            return jsonify({'error': 'Job is processing'}), 409
+
+        try:
+            added = processing_service.add_items(job_uuid, data['items'])
+            processing_config = data.get('processing') or processing_service.get_processing_config(job_uuid)
+        except Exception as e:
+            conn.rollback()
+            processing_service.release_job(job_uuid, previous_status)
+            conn.close()
+            if isinstance(e, ValueError):
+                return jsonify({'error': str(e)}), 400
+            raise
+        if not processing_config:
+            processing_service.release_job(job_uuid, previous_status)
+        conn.close()
+
+        if processing_config:
+            queue_job(job_uuid, processing_config, None)
+
+        return jsonify({
+            'job_uuid': job_uuid,
+            'items_added': added,
+            'processing': bool(processing_config),
+            'report_stale': True
+        }), 202 if processing_config else 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_uuid>/resume', methods=['POST'])
+def resume_job(job_uuid):
+    """Re-run a failed job from where it stopped: completed steps and items are skipped.
+
+    Uses the configuration the job was started with unless the body has a
+    `processing` object. A job still marked processing (e.g. its worker was
+    killed) or retrying (its next attempt is scheduled) is only resumed with
+    ?force=true, which cancels the scheduled attempt.
+    """
+    try:
+        conn = get_db_connection()
+        processing_service = ProcessingService(conn)
+        job = processing_service.get_job_status(job_uuid)
+        if not job:
+            conn.close()
+            return jsonify({'error': 'Job not found'}), 404
+        if job['status'] == 'completed':
+            conn.close()
+            return jsonify({'error': 'Job is completed'}), 409
+
+        # Claimed before the run starts, so a concurrent resume or a due retry cannot run the job twice
+        force = request.args.get('force', 'false').lower() == 'true'
+        previous_status = processing_service.claim_job(job_uuid, force)
+        if previous_status is None or previous_status == 'completed':
+            if previous_status:
+                processing_service.release_job(job_uuid, previous_status)
+            conn.close()
+            return jsonify({'error': f"Job is {previous_status or 'processing'}"}), 409
+
+        body = request.get_json(silent=True) or {}
+        processing_config = body.get('processing') or processing_service.get_processing_config(job_uuid)
+        steps = processing_service.get_job_steps(job_uuid, full_metadata=False)
+        if not processing_config:
+            processing_service.release_job(job_uuid, previous_status)
+            conn.close()
+            return jsonify({'error': 'No processing configuration stored for this job'}), 400
+        conn.close()
+
+        queue_job(job_uuid, processing_config, None)
+
+        return jsonify({
+            'job_uuid': job_uuid,
+            'status': 'resuming',
+            'completed_steps': [s['step_number'] for s in steps if s['status'] in ('completed', 'skipped')]
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_uuid>/refresh-schedule', methods=['PUT'])
+def set_refresh_schedule(job_uuid):
+    """Monitor a job's link sources: {"interval": seconds} re-checks them periodically, null stops it."""
+    body = request.get_json(silent=True) or {}
+    interval = body.get('interval')
+    if interval is not None and (isinstance(interval, bool) or not isinstance(interval, int) or interval <= 0):
+        return jsonify({'error': 'interval must be a positive number of seconds or null'}), 400
+
+    try:
+        conn = get_db_connection()
+        updated = JobRepository(conn).set_refresh_interval(job_uuid, interval)
+        conn.close()
+        if not updated:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify({'job_uuid': job_uuid, 'refresh_interval': interval}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_uuid>/refresh', methods=['POST'])
+def refresh_job_now(job_uuid):
+    """Re-check a job's link sources in the background; changed items are then processed again.
+
+    Returns 202 with the URL of the refresh task, whose summary holds the outcome.
+    """
+    try:
+        conn = get_db_connection()
+        job_repo = JobRepository(conn)
+        if not job_repo.get_job_by_uuid(job_uuid):
+            conn.close()
+            return jsonify({'error': 'Job not found'}), 404
+
+        # Claimed now, so a second refresh or a run of the job is refused rather than interleaved
+        previous_status = job_repo.claim_job(job_uuid)
+        if previous_status is None:
+            conn.close()
+            return jsonify({'error': 'Job is processing'}), 409
+        try:
+            task = RefreshTaskRepository(conn).create_task(job_uuid)
+        except Exception:
+            job_repo.release_job(job_uuid, previous_status)
+            raise
+        finally:
+            conn.close()
+
+        metrics.BACKGROUND_JOBS.inc(kind='link_refresh', state='queued')
+        refresh_executor.submit(run_refresh_task, task['task_uuid'], job_uuid, previous_status)
+
+        status_url = url_for('get_refresh_task', job_uuid=job_uuid, task_uuid=task['task_uuid'])
+        return jsonify({
+            'job_uuid': job_uuid,
+            'task': task,
+            'status_url': status_url
+        }), 202, {'Location': status_url}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def run_refresh_task(task_uuid, job_uuid, previous_status):
+    """Refresh a claimed job's link sources on the background executor and record the outcome on its task."""
+    metrics.BACKGROUND_JOBS.dec(kind='link_refresh', state='queued')
+    metrics.BACKGROUND_JOBS.inc(kind='link_refresh', state='running')
+    conn = get_db_connection()
+    task_repo = RefreshTaskRepository(conn)
+    try:
+        task_repo.update_status(task_uuid, 'processing')
+        with span('link_refresh', job_uuid=job_uuid, task_uuid=task_uuid):
+            summary = _refresh_claimed_job(job_uuid, previous_status)
+        task_repo.update_status(task_uuid, 'completed', summary)
+    except Exception as e:
+        print(f"[LINK_REFRESH] Task {task_uuid} failed: {e}", flush=True)
+        conn.rollback()
+        task_repo.update_status(task_uuid, 'failed', error_message=str(e))
+    finally:
+        conn.close()
+        metrics.BACKGROUND_JOBS.dec(kind='link_refresh', state='running')
+
+
+@app.route('/api/jobs/<job_uuid>/refresh/tasks/<task_uuid>', methods=['GET'])
+def get_refresh_task(job_uuid, task_uuid):
+    try:
+        conn = get_db_connection()
+        task = RefreshTaskRepository(conn).get_task(task_uuid)
+        conn.close()
+        if not task or task['job_uuid'] != job_uuid:
+            return jsonify({'error': 'Task not found'}), 404
+        return jsonify({'job_uuid': job_uuid, 'task': task}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def refresh_job_sources(job_uuid):
+    """Check a job's link sources for changes and, when some changed, process those items again.
+
+    Returns None when the job is processing (or retrying) and was left alone.
+    """
+    conn = get_db_connection()
+    try:
+        previous_status = JobRepository(conn).claim_job(job_uuid)
+    finally:
+        conn.close()
+    if previous_status is None:
+        return None
+    return _refresh_claimed_job(job_uuid, previous_status)
+
+
+def _refresh_claimed_job(job_uuid, previous_status):
+    """Refresh a job claimed with JobRepository.claim_job; it is released unless a run is started."""
+    conn = get_db_connection()
+    try:
+        job_repo = JobRepository(conn)
+        try:
+            summary = LinkRefreshService(conn).refresh_job(job_uuid)
+            processing_config = job_repo.get_processing_config(job_uuid) if summary['changed'] else None
+        except Exception:
+            conn.rollback()
+            job_repo.release_job(job_uuid, previous_status)
+            raise
+        if not processing_config:
+            job_repo.release_job(job_uuid, previous_status)
+    finally:
+        conn.close()
+
+    summary['processing'] = bool(processing_config)
+    if processing_config:
+        queue_job(job_uuid, processing_config, None)
+    return summary
+
+
+def scheduler_loop():
+    """Queue the job retries that are due every JOB_RETRY_CHECK_INTERVAL seconds and refresh the
+    monitored jobs that are due every LINK_REFRESH_CHECK_INTERVAL seconds (0 disables either).
+
+    Both are claimed in the database, so with several workers each is picked up once, and
+    retries scheduled by a worker that has since exited are still run.
+    """
+    intervals = [i for i in (config.JOB_RETRY_CHECK_INTERVAL, config.LINK_REFRESH_CHECK_INTERVAL) if i > 0]
+    next_refresh = time.monotonic() + config.LINK_REFRESH_CHECK_INTERVAL
+    while True:
+        time.sleep(min(intervals))
+        if config.JOB_RETRY_CHECK_INTERVAL > 0:
+            queue_due_retries()
+        if config.LINK_REFRESH_CHECK_INTERVAL > 0 and time.monotonic() >= next_refresh:
+            next_refresh = time.monotonic() + config.LINK_REFRESH_CHECK_INTERVAL
+            refresh_due_jobs()
+
+
+def queue_due_retries():
+    """Claim the retrying jobs whose next attempt is due and queue them with their stored configuration."""
+    try:
+        conn = get_db_connection()
+        try:
+            due = JobRepository(conn).claim_due_retries(config.BULK_JOB_WORKERS)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"[RETRY] Could not claim due retries: {e}", flush=True)
+        return
+
+    for job_uuid in due:
+        print(f"[RETRY] Queueing next attempt of job {job_uuid}", flush=True)
+        queue_job(job_uuid, None, None)
+
+
+def refresh_due_jobs():
+    """Refresh the monitored jobs whose link sources are due for a check."""
+    try:
+        conn = get_db_connection()
+        try:
+            due = JobRepository(conn).claim_due_refreshes(config.LINK_REFRESH_BATCH)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"[LINK_REFRESH] Could not claim due jobs: {e}", flush=True)
+        return
+
+    for job_uuid in due:
+        try:
+            with span('link_refresh', job_uuid=job_uuid):
+                refresh_job_sources(job_uuid)
+        except Exception as e:
+            print(f"[LINK_REFRESH] Refresh of job {job_uuid} failed: {e}", flush=True)
+
+
+_scheduler_thread = None
+
+
+def start_scheduler():
+    """Start the retry and link refresh scheduler of this worker (see gunicorn.conf.py), unless disabled."""
+    global _scheduler_thread
+    if _scheduler_thread is not None or (
+            config.JOB_RETRY_CHECK_INTERVAL <= 0 and config.LINK_REFRESH_CHECK_INTERVAL <= 0):
+        return
+    _scheduler_thread = threading.Thread(target=scheduler_loop, daemon=True, name='scheduler')
+    _scheduler_thread.start()
+
+
 @app.route('/api/jobs', methods=['GET'])
 def get_all_jobs():
+    """Jobs with item, node and relation counts; polled by the UI, so only aggregates are read."""
     try:
         limit = request.args.get('limit', 100, type=int)
 
@@ -119,28 +604,9 @@ def get_all_jobs():
         node_repo = NodeRepository(conn)
 
         jobs = processing_service.get_all_jobs(limit)
-
+        graph_counts = node_repo.get_graph_counts([job['job_uuid'] for job in jobs])
         for job in jobs:
-            job_uuid = job['job_uuid']
-            nodes = node_repo.get_nodes_by_job(job_uuid)
-
-            job['node_counts'] = {
-                'fact': sum(1 for n in nodes if n['type'] == 'fact'),
-                'prediction': sum(1 for n in nodes if n['type'] == 'prediction'),
-                'missing_information': sum(1 for n in nodes if n['type'] == 'missing_information'),
-                'total': len(nodes)
-            }
-
-            relation_count = 0
-            seen = set()
-            for node in nodes:
-                rels = node_repo.get_node_relations(str(node['id']), 'both')
-                for r in rels:
-                    if str(r['id']) not in seen:
-                        seen.add(str(r['id']))
-                        relation_count += 1
-            job['relation_count'] = relation_count
-            # Report is already in job from get_all_jobs
+            job.update(graph_counts[job['job_uuid']])
 
         conn.close()
 
@@ -149,7 +615,6 @@ def get_all_jobs():
         return jsonify({'error': str(e)}), 500
 
 
-
 @app.route('/api/jobs/<job_uuid>/nodes', methods=['GET'])
 def get_job_nodes(job_uuid):
     try:
@@ -165,6 +630,39 @@ def get_job_nodes(job_uuid):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/items/<int:item_id>/content', methods=['GET'])
+def get_item_content(item_id):
+    """Content of one item: files as their bytes (streamed from the blob store), text and link items as text.
+
+    Job reads only carry item summaries. Supports Range requests (206) and
+    If-None-Match against the content hash.
+    """
+    try:
+        conn = get_db_connection()
+        item = ItemRepository(conn).get_item_content(item_id)
+        conn.close()
+
+        if not item:
+            return jsonify({'error': 'Item not found'}), 404
+
+        if item['blob_hash']:
+            body = BlobStore().path(item['blob_hash'])
+            mimetype = 'application/octet-stream'
+        elif item['type'] == 'file':
+            body = io.BytesIO(base64.b64decode(item['content']))
+            mimetype = 'application/octet-stream'
+        else:
+            body = io.BytesIO(item['content'].encode('utf-8'))
+            mimetype = 'text/plain; charset=utf-8'
+
+        return send_file(
+            body, mimetype=mimetype, conditional=True, etag=item['content_hash'],
+            download_name=f"item-{item_id}", max_age=0
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/nodes/<node_id>', methods=['GET'])
 def get_node(node_id):
     try:
@@ -208,23 +706,80 @@ def generate_job_report(job_uuid):
 
         conn = get_db_connection()
         processing_service = ProcessingService(conn)
-        node_repo = NodeRepository(conn)
-        report_service = ReportGenerationService()
+        job_report_repo = JobReportRepository(conn)
+        requested_horizon = request.args.get('time_horizon')
 
         job_status = processing_service.get_job_status(job_uuid)
         if not job_status:
             conn.close()
             return jsonify({'error': 'Job not found'}), 404
 
+        # Check for a cached report of the requested horizon
+        if not regenerate and requested_horizon:
+            stored = job_report_repo.get_report(job_uuid, requested_horizon, language)
+            if stored:
+                conn.close()
+                return jsonify({
+                    'job_uuid': job_uuid,
+                    'cached': True,
+                    'report_stale': bool(job_status.get('report_stale')),
+                    'report': stored['report']
+                }), 200
+
         # Check for cached report in job
-        if not regenerate and job_status.get('report'):
+        if not regenerate and not requested_horizon and job_status.get('report'):
             conn.close()
             return jsonify({
                 'job_uuid': job_uuid,
                 'cached': True,
+                'report_stale': bool(job_status.get('report_stale')),
                 'report': job_status['report']
             }), 200
 
+        # Keep the horizon of the existing report so unchanged sections are reused
+        time_horizon = requested_horizon or (job_status.get('report') or {}).get('time_horizon', '1 year')
+
+        # Generation outlives the request timeout: run it in the background, coalescing duplicates
+        task, created = ReportTaskRepository(conn).create_or_get_active(
+            job_uuid, language, time_horizon, config.REPORT_TASK_TIMEOUT
+        )
+        conn.close()
+
+        if created:
+            metrics.BACKGROUND_JOBS.inc(kind='report_task', state='queued')
+            report_executor.submit(run_report_task, task['task_uuid'], job_uuid, language, time_horizon)
+        else:
+            print(f"[REPORT_TASK] Joining active task {task['task_uuid']} for {job_uuid} ({language}, {time_horizon})", flush=True)
+
+        status_url = url_for('get_report_task', job_uuid=job_uuid, task_uuid=task['task_uuid'])
+        return jsonify({
+            'job_uuid': job_uuid,
+            'task': task,
+            'status_url': status_url
+        }), 202, {'Location': status_url}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def run_report_task(task_uuid, job_uuid, language, time_horizon):
+    """Regenerate a report on the background executor and record the outcome on its task."""
+    metrics.BACKGROUND_JOBS.dec(kind='report_task', state='queued')
+    metrics.BACKGROUND_JOBS.inc(kind='report_task', state='running')
+    try:
+        with span('report_task', job_uuid=job_uuid, task_uuid=task_uuid, language=language, time_horizon=time_horizon):
+            _run_report_task(task_uuid, job_uuid, language, time_horizon)
+    finally:
+        metrics.BACKGROUND_JOBS.dec(kind='report_task', state='running')
+
+
+def _run_report_task(task_uuid, job_uuid, language, time_horizon):
+    conn = get_db_connection()
+    task_repo = ReportTaskRepository(conn)
+    try:
+        task_repo.update_status(task_uuid, 'processing')
+        node_repo = NodeRepository(conn)
+        report_service = ReportGenerationService(ReportSectionRepository(conn), get_db_connection)
+
         nodes = node_repo.get_nodes_by_job(job_uuid)
         facts = [n for n in nodes if n['type'] == 'fact']
         predictions = [n for n in nodes if n['type'] == 'prediction']
@@ -240,23 +795,199 @@ def generate_job_report(job_uuid):
                     all_relations.append(rel)
                     seen_relations.add(rel_id)
 
-        report = report_service.generate_report(facts, predictions, unknowns, all_relations, language)
+        # Served ahead of batch extraction in the LLM scheduler
+        with llm_context(job_uuid, INTERACTIVE):
+            report = report_service.generate_report(
+                facts, predictions, unknowns, all_relations, language, time_horizon, job_uuid=job_uuid
+            )
 
-        # Save regenerated report to job
-        from repositories.job_repository import JobRepository
+        # Save regenerated report; the job's default report only if it is for the same horizon
+        JobReportRepository(conn).save_report(job_uuid, time_horizon, language, report)
         job_repo = JobRepository(conn)
-        job_repo.save_report(job_uuid, report)
+        default_report = (job_repo.get_job_by_uuid(job_uuid) or {}).get('report')
+        if not default_report or default_report.get('time_horizon') == time_horizon:
+            job_repo.save_report(job_uuid, report)
 
+        task_repo.update_status(task_uuid, 'completed')
+        print(f"[REPORT_TASK] Task {task_uuid} completed", flush=True)
+    except Exception as e:
+        print(f"[REPORT_TASK] Task {task_uuid} failed: {str(e)}", flush=True)
+        conn.rollback()
+        task_repo.update_status(task_uuid, 'failed', str(e))
+    finally:
+        conn.close()
+
+
+@app.route('/api/jobs/<job_uuid>/report/tasks/<task_uuid>', methods=['GET'])
+def get_report_task(job_uuid, task_uuid):
+    try:
+        conn = get_db_connection()
+        task = ReportTaskRepository(conn).get_task(task_uuid)
+        if not task or task['job_uuid'] != job_uuid:
+            conn.close()
+            return jsonify({'error': 'Task not found'}), 404
+
+        response = {'job_uuid': job_uuid, 'task': task}
+        if task['status'] == 'completed':
+            stored = JobReportRepository(conn).get_report(job_uuid, task['time_horizon'], task['language'])
+            response['report'] = stored['report'] if stored else None
         conn.close()
 
+        return jsonify(response), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_uuid>/profile', methods=['GET'])
+def get_job_profile(job_uuid):
+    """Where a job spent its time: per-step and per-item profiles plus job totals."""
+    try:
+        conn = get_db_connection()
+        processing_service = ProcessingService(conn)
+        steps = processing_service.get_job_steps(job_uuid)
+        conn.close()
+
+        if not steps:
+            return jsonify({'error': 'Job not found or not started'}), 404
+
+        profiled = []
+        totals = dict.fromkeys(('wall_ms',) + COUNTERS, 0)
+        for step in steps:
+            profile = (step.get('metadata') or {}).get('profile')
+            profiled.append({
+                'step_number': step['step_number'],
+                'step_type': step['step_type'],
+                'status': step['status'],
+                'profile': profile
+            })
+            for key in totals:
+                totals[key] += (profile or {}).get(key) or 0
+
         return jsonify({
             'job_uuid': job_uuid,
-            'cached': False,
-            'report': report
+            'totals': {k: round(v, 1) for k, v in totals.items()},
+            'peak_rss_mb': max(((s['profile'] or {}).get('peak_rss_mb') or 0 for s in profiled), default=0),
+            'steps': profiled
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/jobs/<job_uuid>/trace', methods=['GET'])
+def get_job_trace(job_uuid):
+    """Spans of a job as a waterfall (JSON, or plain text with ?format=text)."""
+    try:
+        exporter = get_exporter()
+        if not isinstance(exporter, FileExporter):
+            return jsonify({'error': 'Job traces need TRACING_EXPORTER=file'}), 404
+
+        rows = waterfall(exporter.read_job(job_uuid))
+        if not rows:
+            return jsonify({'error': 'No spans recorded for this job'}), 404
+
+        if request.args.get('format') == 'text':
+            return Response(render_waterfall(rows), mimetype='text/plain')
+        return jsonify({'job_uuid': job_uuid, 'spans': rows, 'count': len(rows)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_uuid>/reports', methods=['GET'])
+def get_job_reports(job_uuid):
+    try:
+        conn = get_db_connection()
+        reports = JobReportRepository(conn).get_reports(job_uuid)
+        conn.close()
+
+        return jsonify({'job_uuid': job_uuid, 'reports': reports, 'count': len(reports)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+_metrics_conn = None
+_metrics_conn_lock = threading.Lock()
+
+
+def _metrics_query(sql):
+    """Rows of `sql` over this worker's one metrics connection, reconnecting once if it was dropped."""
+    global _metrics_conn
+    with _metrics_conn_lock:
+        for attempt in range(2):
+            if _metrics_conn is None or _metrics_conn.closed:
+                _metrics_conn = get_db_connection()
+                _metrics_conn.autocommit = True
+            try:
+                with _metrics_conn.cursor() as cur:
+                    cur.execute(sql)
+                    return cur.fetchall()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                _metrics_conn.close()
+                _metrics_conn = None
+                if attempt:
+                    raise
+
+
+def _job_status_counts():
+    rows = _metrics_query("SELECT status, COUNT(*) FROM processing_jobs GROUP BY status")
+    return {(status,): count for status, count in rows}
+
+
+def _db_connection_counts():
+    rows = _metrics_query(
+        "SELECT COALESCE(state, 'unknown'), COUNT(*) FROM pg_stat_activity "
+        "WHERE datname = current_database() GROUP BY 1"
+    )
+    return {(state,): count for state, count in rows}
+
+
+@functools.lru_cache(maxsize=1)
+def _db_max_connections():
+    return int(_metrics_query("SHOW max_connections")[0][0])
+
+
+def _scheduler_gauge(field):
+    def collect():
+        return {(provider,): queue[field] for provider, queue in get_scheduler().metrics().items()}
+    return collect
+
+
+def _scheduler_queued():
+    return {
+        (provider, priority): stats['queued']
+        for provider, queue in get_scheduler().metrics().items()
+        for priority, stats in queue['priorities'].items()
+    }
+
+
+# Read from the database, so already the same for every worker
+metrics.REGISTRY.gauge('processing_jobs', 'Jobs by status (all workers, from the database)', ('status',),
+                       lambda: _job_status_counts(), aggregate=False)
+# Connections are opened per request / job / step rather than pooled; these show how close
+# the workers together get to the server's limit. Scrapes reuse one connection per worker
+metrics.REGISTRY.gauge('db_connections', 'Open connections to the database by state (all workers)', ('state',),
+                       lambda: _db_connection_counts(), aggregate=False)
+metrics.REGISTRY.gauge('db_max_connections', 'Connection limit of the database server', (),
+                       lambda: {(): _db_max_connections()}, aggregate=False)
+metrics.REGISTRY.gauge('llm_scheduler_active', 'LLM calls running per endpoint', ('endpoint',), _scheduler_gauge('active'))
+metrics.REGISTRY.gauge('llm_scheduler_concurrency', 'LLM concurrency limit per endpoint', ('endpoint',), _scheduler_gauge('concurrency'))
+metrics.REGISTRY.gauge('llm_scheduler_queued', 'LLM calls waiting for a slot', ('endpoint', 'priority'), _scheduler_queued)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/llm/scheduler', methods=['GET'])
+def get_llm_scheduler_metrics():
+    return jsonify(get_scheduler().metrics()), 200
+
+
+@app.route('/api/llm/endpoints', methods=['GET'])
+def get_llm_endpoints():
+    return jsonify({'endpoints': get_router().status()}), 200
+
+
 if __name__ == '__main__':
+    start_scheduler()
     app.run(host='0.0.0.0', port=config.PORT, debug=config.FLASK_DEBUG)
@@ -15,6 +15,16 @@ DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
 # LLM Provider: 'cloudflare' or 'ollama'
 LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'ollama')
 
+# Structured output: constrain LLM responses to JSON schemas (Ollama `format`, Cloudflare JSON mode)
+LLM_STRUCTURED_OUTPUT = os.getenv('LLM_STRUCTURED_OUTPUT', 'false').lower() == 'true'
+
+# Streaming: parse LLM output incrementally and store each fact/prediction/unknown node as it arrives
+LLM_STREAMING = os.getenv('LLM_STREAMING', 'false').lower() == 'true'
+
+# Extraction mode: 'standard' (separate fact/prediction/unknown passes) or 'fused' (one structured call per chunk)
+EXTRACTION_MODE = os.getenv('EXTRACTION_MODE', 'standard')
+FUSED_CHUNK_CHARS = int(os.getenv('FUSED_CHUNK_CHARS', '10000'))
+
 # Cloudflare Workers AI
 CLOUDFLARE_ACCOUNT_ID = os.getenv('CLOUDFLARE_ACCOUNT_ID', '')
 CLOUDFLARE_API_TOKEN = os.getenv('CLOUDFLARE_API_TOKEN', '')
@@ -25,6 +35,100 @@ CLOUDFLARE_MODEL_PL = os.getenv('CLOUDFLARE_MODEL_PL', '@cf/meta/llama-3.1-70b-i
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'host.docker.internal')
 OLLAMA_PORT = os.getenv('OLLAMA_PORT', '11434')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'qwen3:30b-a3b')
+# Keep the model (and its prefilled prompt prefix) loaded between calls
+OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+# Prefill the shared Atlantis prefix once per model and reuse it via the `context` parameter
+OLLAMA_PREFIX_CONTEXT = os.getenv('OLLAMA_PREFIX_CONTEXT', 'false').lower() == 'true'
+
+# LLM endpoints: JSON list of {"name", "provider", "url", "model", "languages", "priority", "concurrency"}.
+# Empty = single endpoint from LLM_PROVIDER / OLLAMA_*. See services/llm_router.py.
+LLM_ENDPOINTS = os.getenv('LLM_ENDPOINTS', '')
+# Without LLM_ENDPOINTS: fall back between Ollama and Cloudflare when the primary provider fails
+LLM_FAILOVER = os.getenv('LLM_FAILOVER', 'true').lower() == 'true'
+LLM_ENDPOINT_MAX_FAILURES = int(os.getenv('LLM_ENDPOINT_MAX_FAILURES', '2'))
+LLM_ENDPOINT_COOLDOWN = float(os.getenv('LLM_ENDPOINT_COOLDOWN', '30'))
+LLM_HEALTH_CHECK_INTERVAL = int(os.getenv('LLM_HEALTH_CHECK_INTERVAL', '15'))
+
+# Prompt token budgets: default context window, per-model overrides ({"model": tokens}) and
+# local tokenizers ({"model": "path/to/tokenizer.json" or HF tokenizer id}, needs `tokenizers`)
+LLM_CONTEXT_TOKENS = int(os.getenv('LLM_CONTEXT_TOKENS', '8192'))
+LLM_CONTEXT_WINDOWS = os.getenv('LLM_CONTEXT_WINDOWS', '')
+LLM_TOKENIZERS = os.getenv('LLM_TOKENIZERS', '')
+
+# Generate reports as independently cached sections (only stale sections are regenerated, in parallel)
+REPORT_SECTIONS = os.getenv('REPORT_SECTIONS', 'true').lower() == 'true'
+REPORT_SECTION_WORKERS = int(os.getenv('REPORT_SECTION_WORKERS', '4'))
+REPORT_HORIZON_WORKERS = int(os.getenv('REPORT_HORIZON_WORKERS', '3'))
+REPORT_TASK_WORKERS = int(os.getenv('REPORT_TASK_WORKERS', '2'))
+REPORT_TASK_TIMEOUT = int(os.getenv('REPORT_TASK_TIMEOUT', '900'))
+
+# Pipeline steps of a job run at the same time (validation, prediction and unknown extraction
+# only depend on fact extraction); 1 runs them one after another
+PIPELINE_STEP_WORKERS = int(os.getenv('PIPELINE_STEP_WORKERS', '3'))
+
+# Jobs failing with a transient error (network, database connection) are retried, resuming after
+# the last completed step, up to JOB_MAX_ATTEMPTS times; the next attempt is due after
+# JOB_RETRY_DELAY seconds, doubled for every further attempt, and is stored with the job.
+# Every JOB_RETRY_CHECK_INTERVAL seconds each worker queues the attempts that are due (0 = never)
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '2'))
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', '30'))
+JOB_RETRY_CHECK_INTERVAL = int(os.getenv('JOB_RETRY_CHECK_INTERVAL', '10'))
+
+# Bulk submission (POST /api/submit/bulk): jobs per request; and jobs of any kind processed at a time per worker
+BULK_SUBMIT_MAX_JOBS = int(os.getenv('BULK_SUBMIT_MAX_JOBS', '1000'))
+BULK_JOB_WORKERS = int(os.getenv('BULK_JOB_WORKERS', '2'))
+
+# Coalesce identical concurrent conversions and LLM calls (per process); with advisory locks,
+# report sections are also coalesced across worker processes
+SINGLE_FLIGHT = os.getenv('SINGLE_FLIGHT', 'true').lower() == 'true'
+SINGLE_FLIGHT_ADVISORY_LOCKS = os.getenv('SINGLE_FLIGHT_ADVISORY_LOCKS', 'false').lower() == 'true'
+SINGLE_FLIGHT_LOCK_TIMEOUT = int(os.getenv('SINGLE_FLIGHT_LOCK_TIMEOUT', '600'))
+
+# Log prompt-eval vs eval token counts and timings for every LLM call
+LLM_TIMING_LOG = os.getenv('LLM_TIMING_LOG', 'false').lower() == 'true'
+
+# LLM scheduler defaults per endpoint provider, per worker process (0 = no token limit)
+LLM_CONCURRENCY_OLLAMA = int(os.getenv('LLM_CONCURRENCY_OLLAMA', '2'))
+LLM_CONCURRENCY_CLOUDFLARE = int(os.getenv('LLM_CONCURRENCY_CLOUDFLARE', '4'))
+LLM_TPM_OLLAMA = int(os.getenv('LLM_TPM_OLLAMA', '0'))
+LLM_TPM_CLOUDFLARE = int(os.getenv('LLM_TPM_CLOUDFLARE', '0'))
+# Retries for Cloudflare 429 responses (honours Retry-After)
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))
+
+# Tracing: 'none', 'console' or 'file' (JSON lines in TRACE_FILE, served by /api/jobs/<uuid>/trace)
+TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'none').lower()
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces/spans.jsonl')
+
+# /metrics across gunicorn workers: directory where each worker shares its samples (set by
+# gunicorn.conf.py; empty serves each worker's own samples with a pid label), and how often
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '10'))
+
+# Uploaded files, stored once per SHA-256 (content-addressed)
+BLOB_DIR = os.getenv('BLOB_DIR', 'blobs')
+# POST /api/submit/multipart: limit on non-file form fields (bytes) and on the number of parts
+UPLOAD_MAX_FORM_MEMORY = int(os.getenv('UPLOAD_MAX_FORM_MEMORY', str(1024 * 1024)))
+UPLOAD_MAX_PARTS = int(os.getenv('UPLOAD_MAX_PARTS', '100'))
+
+# Link fetching: 'auto' (plain HTTP, Playwright for pages that need JavaScript), 'http' or 'browser';
+# pages with less visible text than LINK_MIN_TEXT_CHARS are treated as JavaScript-rendered
+LINK_FETCH_MODE = os.getenv('LINK_FETCH_MODE', 'auto').lower()
+LINK_FETCH_TIMEOUT = int(os.getenv('LINK_FETCH_TIMEOUT', '15'))
+LINK_FETCH_POOL_SIZE = int(os.getenv('LINK_FETCH_POOL_SIZE', '10'))
+LINK_MIN_TEXT_CHARS = int(os.getenv('LINK_MIN_TEXT_CHARS', '500'))
+# Links of a step are fetched together (asyncio + httpx): requests in total, per host, and body size cap
+LINK_FETCH_CONCURRENCY = int(os.getenv('LINK_FETCH_CONCURRENCY', '32'))
+LINK_FETCH_PER_HOST = int(os.getenv('LINK_FETCH_PER_HOST', '4'))
+LINK_FETCH_MAX_BYTES = int(os.getenv('LINK_FETCH_MAX_BYTES', str(20 * 1024 * 1024)))
+
+# Scheduled re-checks of monitored jobs' link sources (PUT /api/jobs/<uuid>/refresh-schedule):
+# how often each worker looks for due jobs (0 disables; the scheduler is started by the gunicorn
+# post_worker_init hook), jobs per round, HTTP timeout, and refreshes requested through
+# POST /api/jobs/<uuid>/refresh running at a time per worker
+LINK_REFRESH_CHECK_INTERVAL = int(os.getenv('LINK_REFRESH_CHECK_INTERVAL', '300'))
+LINK_REFRESH_BATCH = int(os.getenv('LINK_REFRESH_BATCH', '10'))
+LINK_REFRESH_TIMEOUT = int(os.getenv('LINK_REFRESH_TIMEOUT', '30'))
+LINK_REFRESH_WORKERS = int(os.getenv('LINK_REFRESH_WORKERS', '2'))
 
 # Flask
 FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
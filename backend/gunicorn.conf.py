@@ -0,0 +1,23 @@
+"""Gunicorn hooks; loaded automatically from the working directory (gunicorn ... app:app)."""
+import glob
+import os
+
+# Workers share their metric samples here so /metrics covers all of them (see services/metrics.py)
+os.environ.setdefault('METRICS_DIR', '/tmp/metrics')
+
+
+def on_starting(server):
+    # Samples of a previous run's workers must not be added to this run's counters
+    directory = os.environ['METRICS_DIR']
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, 'worker-*.json')):
+        os.remove(path)
+
+
+def post_worker_init(worker):
+    # Background threads start in the workers, not when app is merely imported (tests, scripts)
+    from app import start_scheduler
+    from services.metrics import REGISTRY
+    import config
+    REGISTRY.start_sharing(config.METRICS_FLUSH_INTERVAL)
+    start_scheduler()
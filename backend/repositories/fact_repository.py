@@ -1,6 +1,9 @@
 from typing import List, Dict
 
+from tracing import traced
 
+
+@traced
 class FactRepository:
     def __init__(self, db_connection):
         self.conn = db_connection
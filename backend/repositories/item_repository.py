@@ -1,23 +1,41 @@
-from typing import List, Dict, Optional
+import hashlib
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timezone
 
+from tracing import traced
 
+
+def content_fingerprint(content: Optional[str], blob_hash: Optional[str] = None,
+                        blob_size: Optional[int] = None) -> Tuple[int, str]:
+    """(size, sha256) of an item's content; for blobs these are known already."""
+    if blob_hash:
+        return blob_size, blob_hash
+    encoded = content.encode('utf-8')
+    return len(encoded), hashlib.sha256(encoded).hexdigest()
+
+
+@traced
 class ItemRepository:
+    PREVIEW_CHARS = 100
+
     def __init__(self, db_connection):
         self.conn = db_connection
 
-    def create_item(self, job_uuid: str, item_type: str, content: str, wage: Optional[float] = None):
+    def create_item(self, job_uuid: str, item_type: str, content: Optional[str], wage: Optional[float] = None,
+                    blob_hash: Optional[str] = None, blob_size: Optional[int] = None):
+        """Create an item holding either text content or a reference to a stored blob."""
+        content_size, content_hash = content_fingerprint(content, blob_hash, blob_size)
         cur = self.conn.cursor()
         try:
             cur.execute(
                 """
-                INSERT INTO processing_items (job_id, item_type, content, wage, status)
+                INSERT INTO processing_items (job_id, item_type, content, blob_hash, content_size, content_hash, wage, status)
                 VALUES (
                     (SELECT id FROM processing_jobs WHERE job_uuid = %s),
-                    %s, %s, %s, 'pending'
+                    %s, %s, %s, %s, %s, %s, 'pending'
                 )
                 """,
-                (job_uuid, item_type, content, wage)
+                (job_uuid, item_type, content, blob_hash, content_size, content_hash, wage)
             )
             self.conn.commit()
         except Exception as e:
@@ -26,12 +44,24 @@ class ItemRepository:
         finally:
             cur.close()
 
+    def get_referenced_blob_hashes(self, blob_hashes: List[str]) -> set:
+        """Those of the blobs that some item references."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                "SELECT DISTINCT blob_hash FROM processing_items WHERE blob_hash = ANY(%s)",
+                (list(blob_hashes),)
+            )
+            return {row[0] for row in cur.fetchall()}
+        finally:
+            cur.close()
+
     def get_items_by_job_uuid(self, job_uuid: str) -> List[Dict]:
         cur = self.conn.cursor()
         try:
             cur.execute(
                 """
-                SELECT id, item_type, content, wage, status, processed_content, error_message
+                SELECT id, item_type, content, wage, status, processed_content, error_message, blob_hash
                 FROM processing_items
                 WHERE job_id = (SELECT id FROM processing_jobs WHERE job_uuid = %s)
                 ORDER BY id
@@ -47,13 +77,91 @@ class ItemRepository:
                     'wage': float(row[3]) if row[3] else None,
                     'status': row[4],
                     'processed_content': row[5],
-                    'error_message': row[6]
+                    'error_message': row[6],
+                    'blob_hash': row[7]
                 }
                 for row in rows
             ]
         finally:
             cur.close()
 
+    def get_item_summaries_by_job_uuid(self, job_uuid: str) -> List[Dict]:
+        """Items without their content: size, hash and a short preview of text and link items.
+
+        Link items also show how their page was last fetched (`fetch_tier`, `fetch_ms`).
+        """
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT id, item_type, wage, status, processed_content, error_message,
+                       COALESCE(content_size, octet_length(content)),
+                       COALESCE(content_hash, encode(sha256(convert_to(content, 'UTF8')), 'hex')),
+                       CASE WHEN item_type = 'file' THEN NULL ELSE left(content, %s) END,
+                       ls.fetch_tier, ls.fetch_ms
+                FROM processing_items
+                LEFT JOIN link_snapshots ls ON ls.item_id = processing_items.id
+                WHERE job_id = (SELECT id FROM processing_jobs WHERE job_uuid = %s)
+                ORDER BY id
+                """,
+                (self.PREVIEW_CHARS, job_uuid)
+            )
+            rows = cur.fetchall()
+            return [
+                {
+                    'id': row[0],
+                    'type': row[1],
+                    'wage': float(row[2]) if row[2] else None,
+                    'status': row[3],
+                    'processed_content': row[4],
+                    'error_message': row[5],
+                    'content_size': row[6],
+                    'content_hash': row[7],
+                    'preview': row[8],
+                    'fetch_tier': row[9],
+                    'fetch_ms': row[10]
+                }
+                for row in rows
+            ]
+        finally:
+            cur.close()
+
+    def get_link_items(self, job_uuid: str) -> List[Dict]:
+        """A job's link items (id, type, url as content) without loading other items' content."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT id, content
+                FROM processing_items
+                WHERE job_id = (SELECT id FROM processing_jobs WHERE job_uuid = %s) AND item_type = 'link'
+                ORDER BY id
+                """,
+                (job_uuid,)
+            )
+            return [{'id': row[0], 'type': 'link', 'content': row[1]} for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+    def get_item_content(self, item_id: int) -> Optional[Dict]:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT id, item_type, content, blob_hash,
+                       COALESCE(content_hash, encode(sha256(convert_to(content, 'UTF8')), 'hex'))
+                FROM processing_items
+                WHERE id = %s
+                """,
+                (item_id,)
+            )
+            row = cur.fetchone()
+            if not row:
+                return None
+            return {'id': row[0], 'type': row[1], 'content': row[2], 'blob_hash': row[3], 'content_hash': row[4]}
+        finally:
+            cur.close()
+
     def update_item_status(self, item_id: int, status: str,
                           processed_content: Optional[str] = None,
                           error_message: Optional[str] = None):
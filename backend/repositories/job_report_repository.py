@@ -0,0 +1,74 @@
+from typing import List, Dict, Optional
+import psycopg2.extras
+
+from tracing import traced
+
+
+@traced
+class JobReportRepository:
+    """Reports of a job, one per time horizon and language."""
+
+    def __init__(self, db_connection):
+        self.conn = db_connection
+
+    def save_report(self, job_uuid: str, time_horizon: str, language: str, report: Dict) -> None:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                INSERT INTO job_reports (job_id, time_horizon, language, report)
+                VALUES ((SELECT id FROM processing_jobs WHERE job_uuid = %s), %s, %s, %s)
+                ON CONFLICT (job_id, time_horizon, language)
+                DO UPDATE SET report = EXCLUDED.report, updated_at = CURRENT_TIMESTAMP
+                """,
+                (job_uuid, time_horizon, language, psycopg2.extras.Json(report))
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
+
+    def get_reports(self, job_uuid: str) -> List[Dict]:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT time_horizon, language, report, created_at, updated_at
+                FROM job_reports
+                WHERE job_id = (SELECT id FROM processing_jobs WHERE job_uuid = %s)
+                ORDER BY created_at, time_horizon
+                """,
+                (job_uuid,)
+            )
+            return [self._row_to_dict(row) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+    def get_report(self, job_uuid: str, time_horizon: str, language: Optional[str] = None) -> Optional[Dict]:
+        """Return the report for a horizon, preferring the given language."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT time_horizon, language, report, created_at, updated_at
+                FROM job_reports
+                WHERE job_id = (SELECT id FROM processing_jobs WHERE job_uuid = %s)
+                  AND time_horizon = %s
+                ORDER BY (language = %s) DESC, updated_at DESC
+                LIMIT 1
+                """,
+                (job_uuid, time_horizon, language)
+            )
+            row = cur.fetchone()
+            return self._row_to_dict(row) if row else None
+        finally:
+            cur.close()
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict:
+        return {
+            'time_horizon': row[0],
+            'language': row[1],
+            'report': row[2],
+            'created_at': row[3].isoformat() if row[3] else None,
+            'updated_at': row[4].isoformat() if row[4] else None
+        }
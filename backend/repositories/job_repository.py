@@ -1,8 +1,15 @@
 from typing import List, Dict, Optional
 from datetime import datetime, timezone
 import json
+import uuid
 
+import psycopg2.extras
 
+from repositories.item_repository import content_fingerprint
+from tracing import traced
+
+
+@traced
 class JobRepository:
     def __init__(self, db_connection):
         self.conn = db_connection
@@ -22,12 +29,112 @@ class JobRepository:
         finally:
             cur.close()
 
+    def create_jobs_bulk(self, jobs: List[Dict]) -> List[Dict]:
+        """Create jobs and their items in set-based statements and one transaction.
+
+        Each job is {'idempotency_key': str or None, 'items': [...]} with items
+        as accepted by ItemRepository.create_item. Returns, in order,
+        {'job_uuid', 'idempotency_key', 'created'}; a job whose key already
+        exists is not created again and returns the existing job.
+        """
+        new_uuids = [str(uuid.uuid4()) for _ in jobs]
+        keys = [job.get('idempotency_key') for job in jobs]
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                INSERT INTO processing_jobs (job_uuid, idempotency_key, status)
+                SELECT u, k, 'pending' FROM unnest(%s::uuid[], %s::text[]) AS t(u, k)
+                ON CONFLICT (idempotency_key) DO NOTHING
+                RETURNING id, job_uuid
+                """,
+                (new_uuids, keys)
+            )
+            created = {str(row[1]): row[0] for row in cur.fetchall()}
+
+            existing = {}
+            pending_keys = [k for u, k in zip(new_uuids, keys) if k is not None and u not in created]
+            if pending_keys:
+                cur.execute(
+                    "SELECT idempotency_key, job_uuid FROM processing_jobs WHERE idempotency_key = ANY(%s)",
+                    (pending_keys,)
+                )
+                existing = {row[0]: str(row[1]) for row in cur.fetchall()}
+
+            item_rows = []
+            for job, job_uuid in zip(jobs, new_uuids):
+                if job_uuid not in created:
+                    continue
+                for item in job['items']:
+                    content_size, content_hash = content_fingerprint(
+                        item.get('content'), item.get('blob_hash'), item.get('blob_size')
+                    )
+                    item_rows.append((
+                        created[job_uuid], item['type'], item.get('content'), item.get('blob_hash'),
+                        content_size, content_hash, item.get('wage')
+                    ))
+            if item_rows:
+                psycopg2.extras.execute_values(
+                    cur,
+                    """
+                    INSERT INTO processing_items (job_id, item_type, content, blob_hash, content_size, content_hash, wage, status)
+                    VALUES %s
+                    """,
+                    item_rows,
+                    template="(%s, %s, %s, %s, %s, %s, %s, 'pending')",
+                    page_size=1000
+                )
+            self.conn.commit()
+
+            return [
+                {'job_uuid': job_uuid, 'idempotency_key': key, 'created': True} if job_uuid in created
+                else {'job_uuid': existing[key], 'idempotency_key': key, 'created': False}
+                for job_uuid, key in zip(new_uuids, keys)
+            ]
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+        finally:
+            cur.close()
+
+    def start_attempt(self, job_uuid: str, processing_config: Dict) -> int:
+        """Record a processing attempt and its configuration; returns the attempt number."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE processing_jobs
+                SET processing_config = %s, attempts = attempts + 1, updated_at = %s
+                WHERE job_uuid = %s
+                RETURNING attempts
+                """,
+                (psycopg2.extras.Json(processing_config), datetime.now(timezone.utc), job_uuid)
+            )
+            row = cur.fetchone()
+            self.conn.commit()
+            return row[0] if row else 0
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+        finally:
+            cur.close()
+
+    def get_processing_config(self, job_uuid: str) -> Optional[Dict]:
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT processing_config FROM processing_jobs WHERE job_uuid = %s", (job_uuid,))
+            row = cur.fetchone()
+            return row[0] if row else None
+        finally:
+            cur.close()
+
     def get_job_by_uuid(self, job_uuid: str) -> Optional[Dict]:
         cur = self.conn.cursor()
         try:
             cur.execute(
                 """
-                SELECT job_uuid, status, created_at, updated_at, completed_at, error_message, report
+                SELECT job_uuid, status, created_at, updated_at, completed_at, error_message, report, report_stale,
+                       refresh_interval, refreshed_at
                 FROM processing_jobs
                 WHERE job_uuid = %s
                 """,
@@ -44,19 +151,31 @@ class JobRepository:
                 'updated_at': row[3].isoformat() if row[3] else None,
                 'completed_at': row[4].isoformat() if row[4] else None,
                 'error_message': row[5],
-                'report': row[6]
+                'report': row[6],
+                'report_stale': row[7],
+                'refresh_interval': row[8],
+                'refreshed_at': row[9].isoformat() if row[9] else None
             }
         finally:
             cur.close()
 
     def get_all_jobs(self, limit: int = 100) -> List[Dict]:
+        """Latest jobs with their item counts (one query, no per-job reads)."""
         cur = self.conn.cursor()
         try:
             cur.execute(
                 """
-                SELECT job_uuid, status, created_at, updated_at, completed_at, error_message, report
-                FROM processing_jobs
-                ORDER BY created_at DESC
+                SELECT j.job_uuid, j.status, j.created_at, j.updated_at, j.completed_at, j.error_message, j.report,
+                       j.report_stale, items.total, items.completed, items.failed
+                FROM processing_jobs j
+                CROSS JOIN LATERAL (
+                    SELECT COUNT(*) AS total,
+                           COUNT(*) FILTER (WHERE status = 'completed') AS completed,
+                           COUNT(*) FILTER (WHERE status = 'failed') AS failed
+                    FROM processing_items
+                    WHERE job_id = j.id
+                ) items
+                ORDER BY j.created_at DESC
                 LIMIT %s
                 """,
                 (limit,)
@@ -70,7 +189,11 @@ class JobRepository:
                     'updated_at': row[3].isoformat() if row[3] else None,
                     'completed_at': row[4].isoformat() if row[4] else None,
                     'error_message': row[5],
-                    'report': row[6]
+                    'report': row[6],
+                    'report_stale': row[7],
+                    'total_items': row[8],
+                    'completed_items': row[9],
+                    'failed_items': row[10]
                 }
                 for row in rows
             ]
@@ -93,13 +216,167 @@ class JobRepository:
         finally:
             cur.close()
 
+    def claim_job(self, job_uuid: str, force: bool = False) -> Optional[str]:
+        """Mark an idle job 'processing' while it is being changed or run; returns its previous status.
+
+        None when the job does not exist or is already processing or retrying,
+        so concurrent changes and runs of a job exclude each other. `force`
+        also takes over a job marked processing or retrying (e.g. its worker
+        was killed); a scheduled retry is cancelled.
+        """
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE processing_jobs j
+                SET status = 'processing', retry_at = NULL, updated_at = %s
+                FROM (SELECT id, status FROM processing_jobs WHERE job_uuid = %s FOR UPDATE) previous
+                WHERE j.id = previous.id AND (%s OR previous.status NOT IN ('processing', 'retrying'))
+                RETURNING previous.status
+                """,
+                (datetime.now(timezone.utc), job_uuid, force)
+            )
+            row = cur.fetchone()
+            self.conn.commit()
+            return row[0] if row else None
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+        finally:
+            cur.close()
+
+    def release_job(self, job_uuid: str, status: str):
+        """Put a claimed job back into `status` when no run was started for it."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                "UPDATE processing_jobs SET status = %s, updated_at = %s WHERE job_uuid = %s",
+                (status, datetime.now(timezone.utc), job_uuid)
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
+
+    def schedule_retry(self, job_uuid: str, delay: int, error_message: str):
+        """Leave a job 'retrying' until `delay` seconds from now; claim_due_retries then hands it out."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE processing_jobs
+                SET status = 'retrying', retry_at = CURRENT_TIMESTAMP + make_interval(secs => %s),
+                    error_message = %s, completed_at = NULL, updated_at = %s
+                WHERE job_uuid = %s
+                """,
+                (delay, error_message, datetime.now(timezone.utc), job_uuid)
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
+
+    def claim_due_retries(self, limit: int) -> List[str]:
+        """Retrying jobs whose next attempt is due; claimed ('processing') so other workers skip them."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE processing_jobs
+                SET status = 'processing', retry_at = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE id IN (
+                    SELECT id FROM processing_jobs
+                    WHERE status = 'retrying' AND retry_at <= CURRENT_TIMESTAMP
+                    ORDER BY retry_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING job_uuid
+                """,
+                (limit,)
+            )
+            job_uuids = [str(row[0]) for row in cur.fetchall()]
+            self.conn.commit()
+            return job_uuids
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+        finally:
+            cur.close()
+
+    def mark_report_stale(self, job_uuid: str):
+        """Flag the job's report as out of date (items were added or changed after it was generated).
+
+        The status is left alone; it changes when a run of the job is started.
+        """
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE processing_jobs
+                SET report_stale = TRUE, updated_at = %s
+                WHERE job_uuid = %s
+                """,
+                (datetime.now(timezone.utc), job_uuid)
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
+
+    def set_refresh_interval(self, job_uuid: str, interval: Optional[int]) -> bool:
+        """Monitor the job's link sources every `interval` seconds (None stops monitoring)."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE processing_jobs
+                SET refresh_interval = %s, refreshed_at = CURRENT_TIMESTAMP
+                WHERE job_uuid = %s
+                """,
+                (interval, job_uuid)
+            )
+            updated = cur.rowcount > 0
+            self.conn.commit()
+            return updated
+        finally:
+            cur.close()
+
+    def claim_due_refreshes(self, limit: int) -> List[str]:
+        """Jobs whose link sources are due for a check; claimed so other workers skip them."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE processing_jobs
+                SET refreshed_at = CURRENT_TIMESTAMP
+                WHERE id IN (
+                    SELECT id FROM processing_jobs
+                    WHERE refresh_interval IS NOT NULL
+                      AND status NOT IN ('processing', 'retrying')
+                      AND (refreshed_at IS NULL
+                           OR refreshed_at <= CURRENT_TIMESTAMP - make_interval(secs => refresh_interval))
+                    ORDER BY refreshed_at NULLS FIRST
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING job_uuid
+                """,
+                (limit,)
+            )
+            job_uuids = [str(row[0]) for row in cur.fetchall()]
+            self.conn.commit()
+            return job_uuids
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+        finally:
+            cur.close()
+
     def save_report(self, job_uuid: str, report: Dict):
         cur = self.conn.cursor()
         try:
             cur.execute(
                 """
                 UPDATE processing_jobs
-                SET report = %s, updated_at = %s
+                SET report = %s, report_stale = FALSE, updated_at = %s
                 WHERE job_uuid = %s
                 """,
                 (json.dumps(report, ensure_ascii=False), datetime.now(timezone.utc), job_uuid)
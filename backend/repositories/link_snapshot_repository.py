@@ -0,0 +1,100 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+from tracing import traced
+
+
+@traced
+class LinkSnapshotRepository:
+    """Last converted version of each link item (see services/link_refresh_service.py)."""
+
+    def __init__(self, db_connection):
+        self.conn = db_connection
+
+    def get_snapshot(self, item_id: int) -> Optional[Dict]:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT item_id, etag, last_modified, response_hash, markdown_hash, checked_at, changed_at,
+                       fetch_tier, fetch_ms
+                FROM link_snapshots
+                WHERE item_id = %s
+                """,
+                (item_id,)
+            )
+            row = cur.fetchone()
+            if not row:
+                return None
+
+            return {
+                'item_id': row[0],
+                'etag': row[1],
+                'last_modified': row[2],
+                'response_hash': row[3],
+                'markdown_hash': row[4],
+                'checked_at': row[5].isoformat() if row[5] else None,
+                'changed_at': row[6].isoformat() if row[6] else None,
+                'fetch_tier': row[7],
+                'fetch_ms': row[8]
+            }
+        finally:
+            cur.close()
+
+    def get_snapshotted_item_ids(self, item_ids: List[int]) -> Set[int]:
+        """Which of these items have a snapshot."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT item_id FROM link_snapshots WHERE item_id = ANY(%s)", (list(item_ids),))
+            return {row[0] for row in cur.fetchall()}
+        finally:
+            cur.close()
+
+    def save_snapshot(self, item_id: int, markdown_hash: str, etag: Optional[str] = None,
+                      last_modified: Optional[str] = None, response_hash: Optional[str] = None,
+                      fetch_tier: Optional[str] = None, fetch_ms: Optional[float] = None):
+        """Store a newly converted version; changed_at only moves when the markdown differs."""
+        now = datetime.now(timezone.utc)
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                INSERT INTO link_snapshots (item_id, etag, last_modified, response_hash, markdown_hash,
+                                            fetch_tier, fetch_ms, checked_at, changed_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (item_id) DO UPDATE
+                SET etag = EXCLUDED.etag,
+                    last_modified = EXCLUDED.last_modified,
+                    response_hash = EXCLUDED.response_hash,
+                    markdown_hash = EXCLUDED.markdown_hash,
+                    fetch_tier = EXCLUDED.fetch_tier,
+                    fetch_ms = EXCLUDED.fetch_ms,
+                    checked_at = EXCLUDED.checked_at,
+                    changed_at = CASE WHEN link_snapshots.markdown_hash = EXCLUDED.markdown_hash
+                                      THEN link_snapshots.changed_at ELSE EXCLUDED.changed_at END
+                """,
+                (item_id, etag, last_modified, response_hash, markdown_hash, fetch_tier, fetch_ms, now, now)
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
+
+    def mark_checked(self, item_id: int, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                     response_hash: Optional[str] = None):
+        """Record a check that found no change, keeping validators the response did not send."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE link_snapshots
+                SET etag = COALESCE(%s, etag),
+                    last_modified = COALESCE(%s, last_modified),
+                    response_hash = COALESCE(%s, response_hash),
+                    checked_at = %s
+                WHERE item_id = %s
+                """,
+                (etag, last_modified, response_hash, datetime.now(timezone.utc), item_id)
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
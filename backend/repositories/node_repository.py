@@ -1,7 +1,10 @@
 from typing import List, Dict, Optional
 import psycopg2.extras
 
+from tracing import traced
 
+
+@traced
 class NodeRepository:
     def __init__(self, db_connection):
         self.conn = db_connection
@@ -34,6 +37,30 @@ class NodeRepository:
         finally:
             cur.close()
 
+    def delete_job_nodes(self, job_uuid: str, sources: List[str], item_id: Optional[int] = None,
+                         batch: Optional[str] = None) -> int:
+        """Delete a job's nodes created by the given sources (metadata.source), optionally for one item or batch.
+
+        Used before a step is re-run so a resumed job does not store its output twice.
+        """
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                DELETE FROM nodes
+                WHERE job_id = (SELECT id FROM processing_jobs WHERE job_uuid = %s)
+                  AND metadata->>'source' = ANY(%s)
+                  AND (%s::int IS NULL OR metadata->>'item_id' = %s::text)
+                  AND (%s::text IS NULL OR metadata->>'batch' = %s)
+                """,
+                (job_uuid, sources, item_id, item_id, batch, batch)
+            )
+            deleted = cur.rowcount
+            self.conn.commit()
+            return deleted
+        finally:
+            cur.close()
+
     def get_node(self, node_id: str) -> Optional[Dict]:
         cur = self.conn.cursor()
         try:
@@ -100,6 +127,49 @@ class NodeRepository:
         finally:
             cur.close()
 
+    def get_graph_counts(self, job_uuids: List[str]) -> Dict[str, Dict]:
+        """Node counts by type and relation count of several jobs, aggregated in the database (job lists)."""
+        counts = {
+            job_uuid: {'node_counts': {'fact': 0, 'prediction': 0, 'missing_information': 0, 'total': 0},
+                       'relation_count': 0}
+            for job_uuid in job_uuids
+        }
+        if not job_uuids:
+            return counts
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT pj.job_uuid, n.type, COUNT(*)
+                FROM nodes n
+                JOIN processing_jobs pj ON n.job_id = pj.id
+                WHERE pj.job_uuid = ANY(%s::uuid[])
+                GROUP BY pj.job_uuid, n.type
+                """,
+                (job_uuids,)
+            )
+            for job_uuid, node_type, count in cur.fetchall():
+                node_counts = counts[str(job_uuid)]['node_counts']
+                node_counts[node_type] = count
+                node_counts['total'] += count
+
+            cur.execute(
+                """
+                SELECT pj.job_uuid, COUNT(DISTINCT nr.id)
+                FROM node_relations nr
+                JOIN nodes n ON n.id = nr.source_node_id OR n.id = nr.target_node_id
+                JOIN processing_jobs pj ON n.job_id = pj.id
+                WHERE pj.job_uuid = ANY(%s::uuid[])
+                GROUP BY pj.job_uuid
+                """,
+                (job_uuids,)
+            )
+            for job_uuid, relation_count in cur.fetchall():
+                counts[str(job_uuid)]['relation_count'] = relation_count
+            return counts
+        finally:
+            cur.close()
+
     def create_relation(self, source_node_id: str, target_node_id: str,
                        relation_type: str, confidence: float = 1.0, metadata: Optional[Dict] = None) -> str:
         cur = self.conn.cursor()
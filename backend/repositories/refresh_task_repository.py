@@ -0,0 +1,84 @@
+from typing import Dict, Optional
+
+import psycopg2.extras
+
+from tracing import traced
+
+
+@traced
+class RefreshTaskRepository:
+    """Background re-checks of a job's link sources (POST /api/jobs/<uuid>/refresh)."""
+
+    def __init__(self, db_connection):
+        self.conn = db_connection
+
+    def create_task(self, job_uuid: str) -> Dict:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                INSERT INTO refresh_tasks (job_id, status)
+                VALUES ((SELECT id FROM processing_jobs WHERE job_uuid = %s), 'pending')
+                RETURNING task_uuid
+                """,
+                (job_uuid,)
+            )
+            task_uuid = str(cur.fetchone()[0])
+            self.conn.commit()
+            return self.get_task(task_uuid)
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+        finally:
+            cur.close()
+
+    def update_status(self, task_uuid: str, status: str, summary: Optional[Dict] = None,
+                      error_message: Optional[str] = None) -> None:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE refresh_tasks
+                SET status = %s,
+                    summary = COALESCE(%s, summary),
+                    error_message = %s,
+                    updated_at = CURRENT_TIMESTAMP,
+                    completed_at = CASE WHEN %s IN ('completed', 'failed') THEN CURRENT_TIMESTAMP ELSE completed_at END
+                WHERE task_uuid = %s
+                """,
+                (status, psycopg2.extras.Json(summary) if summary is not None else None, error_message,
+                 status, task_uuid)
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
+
+    def get_task(self, task_uuid: str) -> Optional[Dict]:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT rt.task_uuid, pj.job_uuid, rt.status, rt.summary, rt.error_message,
+                       rt.created_at, rt.updated_at, rt.completed_at
+                FROM refresh_tasks rt
+                JOIN processing_jobs pj ON rt.job_id = pj.id
+                WHERE rt.task_uuid = %s
+                """,
+                (task_uuid,)
+            )
+            row = cur.fetchone()
+            if not row:
+                return None
+
+            return {
+                'task_uuid': str(row[0]),
+                'job_uuid': str(row[1]),
+                'status': row[2],
+                'summary': row[3],
+                'error_message': row[4],
+                'created_at': row[5].isoformat() if row[5] else None,
+                'updated_at': row[6].isoformat() if row[6] else None,
+                'completed_at': row[7].isoformat() if row[7] else None
+            }
+        finally:
+            cur.close()
@@ -0,0 +1,45 @@
+from typing import List, Dict
+import psycopg2.extras
+
+from tracing import traced
+
+
+@traced
+class ReportSectionRepository:
+    def __init__(self, db_connection):
+        self.conn = db_connection
+
+    def get_sections(self, job_uuid: str, input_hashes: List[str]) -> Dict[str, object]:
+        """Return cached section content keyed by input hash."""
+        if not input_hashes:
+            return {}
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT input_hash, content
+                FROM report_sections
+                WHERE job_id = (SELECT id FROM processing_jobs WHERE job_uuid = %s)
+                  AND input_hash = ANY(%s)
+                """,
+                (job_uuid, input_hashes)
+            )
+            return {row[0]: row[1] for row in cur.fetchall()}
+        finally:
+            cur.close()
+
+    def save_section(self, job_uuid: str, section: str, input_hash: str,
+                     language: str, time_horizon: str, content) -> None:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                INSERT INTO report_sections (job_id, section, input_hash, language, time_horizon, content)
+                VALUES ((SELECT id FROM processing_jobs WHERE job_uuid = %s), %s, %s, %s, %s, %s)
+                ON CONFLICT (job_id, section, input_hash) DO UPDATE SET content = EXCLUDED.content
+                """,
+                (job_uuid, section, input_hash, language, time_horizon, psycopg2.extras.Json(content))
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
@@ -0,0 +1,111 @@
+from typing import Dict, Optional, Tuple
+
+from tracing import traced
+
+
+@traced
+class ReportTaskRepository:
+    """Background report regenerations, at most one active per job, language and horizon."""
+
+    def __init__(self, db_connection):
+        self.conn = db_connection
+
+    def create_or_get_active(self, job_uuid: str, language: str, time_horizon: str,
+                             stale_after: int = 900) -> Tuple[Dict, bool]:
+        """Create a pending task, or return the active one for the same report.
+
+        Returns (task, created). Active tasks not updated for `stale_after`
+        seconds (e.g. their worker was killed) are failed first so they cannot
+        block regeneration forever.
+        """
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE report_tasks
+                SET status = 'failed', error_message = 'Task timed out', updated_at = CURRENT_TIMESTAMP
+                WHERE status IN ('pending', 'processing')
+                  AND updated_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+                """,
+                (stale_after,)
+            )
+            cur.execute(
+                """
+                INSERT INTO report_tasks (job_id, language, time_horizon, status)
+                VALUES ((SELECT id FROM processing_jobs WHERE job_uuid = %s), %s, %s, 'pending')
+                ON CONFLICT (job_id, language, time_horizon) WHERE status IN ('pending', 'processing')
+                DO NOTHING
+                RETURNING task_uuid
+                """,
+                (job_uuid, language, time_horizon)
+            )
+            row = cur.fetchone()
+            created = row is not None
+            if not created:
+                cur.execute(
+                    """
+                    SELECT rt.task_uuid
+                    FROM report_tasks rt
+                    JOIN processing_jobs pj ON rt.job_id = pj.id
+                    WHERE pj.job_uuid = %s AND rt.language = %s AND rt.time_horizon = %s
+                      AND rt.status IN ('pending', 'processing')
+                    """,
+                    (job_uuid, language, time_horizon)
+                )
+                row = cur.fetchone()
+            self.conn.commit()
+            return self.get_task(str(row[0])), created
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+        finally:
+            cur.close()
+
+    def update_status(self, task_uuid: str, status: str, error_message: Optional[str] = None) -> None:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE report_tasks
+                SET status = %s,
+                    error_message = %s,
+                    updated_at = CURRENT_TIMESTAMP,
+                    completed_at = CASE WHEN %s IN ('completed', 'failed') THEN CURRENT_TIMESTAMP ELSE completed_at END
+                WHERE task_uuid = %s
+                """,
+                (status, error_message, status, task_uuid)
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
+
+    def get_task(self, task_uuid: str) -> Optional[Dict]:
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT rt.task_uuid, pj.job_uuid, rt.language, rt.time_horizon, rt.status,
+                       rt.error_message, rt.created_at, rt.updated_at, rt.completed_at
+                FROM report_tasks rt
+                JOIN processing_jobs pj ON rt.job_id = pj.id
+                WHERE rt.task_uuid = %s
+                """,
+                (task_uuid,)
+            )
+            row = cur.fetchone()
+            if not row:
+                return None
+
+            return {
+                'task_uuid': str(row[0]),
+                'job_uuid': str(row[1]),
+                'language': row[2],
+                'time_horizon': row[3],
+                'status': row[4],
+                'error_message': row[5],
+                'created_at': row[6].isoformat() if row[6] else None,
+                'updated_at': row[7].isoformat() if row[7] else None,
+                'completed_at': row[8].isoformat() if row[8] else None
+            }
+        finally:
+            cur.close()
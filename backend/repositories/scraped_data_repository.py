@@ -1,6 +1,12 @@
-from typing import List, Dict
+import json
+from typing import List, Dict, Optional
 
+import psycopg2.extras
 
+from tracing import traced
+
+
+@traced
 class ScrapedDataRepository:
     def __init__(self, db_connection):
         self.conn = db_connection
@@ -34,3 +40,31 @@ class ScrapedDataRepository:
         finally:
             cur.close()
 
+    def create_scraped_data_bulk(self, job_uuid: str, step_id: Optional[int], rows: List[Dict]) -> int:
+        """Record many fetches in one statement; rows are {url, content, content_type, status, error_message, metadata}."""
+        if not rows:
+            return 0
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT id FROM processing_jobs WHERE job_uuid = %s", (job_uuid,))
+            job_id = cur.fetchone()[0]
+            psycopg2.extras.execute_values(
+                cur,
+                """
+                INSERT INTO scraped_data (job_id, step_id, url, content, content_type, status, error_message, metadata)
+                VALUES %s
+                """,
+                [
+                    (job_id, step_id, row['url'], row.get('content'), row.get('content_type'), row['status'],
+                     row.get('error_message'), json.dumps(row.get('metadata') or {}))
+                    for row in rows
+                ],
+                page_size=500
+            )
+            self.conn.commit()
+            return len(rows)
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+        finally:
+            cur.close()
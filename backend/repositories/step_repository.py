@@ -1,17 +1,27 @@
 from typing import List, Dict, Optional
 
+from tracing import traced
 
+
+@traced
 class StepRepository:
     def __init__(self, db_connection):
         self.conn = db_connection
 
-    def get_steps_by_job_uuid(self, job_uuid: str) -> List[Dict]:
+    def get_steps_by_job_uuid(self, job_uuid: str, full_metadata: bool = True) -> List[Dict]:
+        """Steps of a job in order.
+
+        Without `full_metadata` the per-step profile and item checkpoints are left
+        out of metadata, for job listings: they grow with the job's items and
+        GET /api/jobs/<uuid>/profile serves them.
+        """
+        metadata = 'metadata' if full_metadata else "metadata - 'profile' - 'completed_items'"
         cur = self.conn.cursor()
         try:
             cur.execute(
-                """
-                SELECT id, step_number, step_type, status, input_data, output_data, 
-                       error_message, metadata, created_at, completed_at
+                f"""
+                SELECT id, step_number, step_type, status, input_data, output_data,
+                       error_message, {metadata}, created_at, completed_at
                 FROM processing_steps
                 WHERE job_id = (SELECT id FROM processing_jobs WHERE job_uuid = %s)
                 ORDER BY step_number
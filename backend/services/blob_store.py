@@ -0,0 +1,128 @@
+"""Content-addressed storage for uploaded files.
+
+Files are stored once per SHA-256 of their bytes under BLOB_DIR
+(`<dir>/ab/abcdef...`), so the same document submitted by several jobs
+takes space once. Items reference blobs by hash (`processing_items.blob_hash`)
+instead of carrying base64 text. Blobs are written to a temporary file and
+renamed into place, so readers never see a partial blob.
+"""
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterable, Tuple
+
+import config
+
+CHUNK_SIZE = 1024 * 1024
+_HASH = re.compile(r'^[0-9a-f]{64}$')
+
+
+class BlobStore:
+    """Deduplicated blobs on the local filesystem, keyed by SHA-256."""
+
+    def __init__(self, root: str = None):
+        self.root = root or config.BLOB_DIR
+
+    def path(self, blob_hash: str) -> str:
+        if not _HASH.match(blob_hash or ''):
+            raise ValueError(f"Invalid blob hash: {blob_hash}")
+        return os.path.join(self.root, blob_hash[:2], blob_hash)
+
+    def exists(self, blob_hash: str) -> bool:
+        return os.path.exists(self.path(blob_hash))
+
+    def put_bytes(self, data: bytes) -> Tuple[str, int]:
+        """Store data, returns (sha256, size)."""
+        return self.put_chunks([data])
+
+    def put_stream(self, stream: IO[bytes]) -> Tuple[str, int]:
+        """Store a binary stream, read in chunks, returns (sha256, size)."""
+        return self.put_chunks(iter(lambda: stream.read(CHUNK_SIZE), b''))
+
+    def put_chunks(self, chunks: Iterable[bytes]) -> Tuple[str, int]:
+        """Store chunks while hashing them; only one chunk is held in memory."""
+        writer = self.writer()
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+            return writer.commit()
+        finally:
+            writer.discard()
+
+    def writer(self) -> 'BlobWriter':
+        """Incremental writer, e.g. as the stream factory of a multipart upload."""
+        return BlobWriter(self)
+
+    def delete(self, blob_hash: str):
+        """Remove a blob; callers make sure no item references it."""
+        path = self.path(blob_hash)
+        if os.path.exists(path):
+            os.unlink(path)
+
+    def size(self, blob_hash: str) -> int:
+        return os.path.getsize(self.path(blob_hash))
+
+    def open(self, blob_hash: str) -> IO[bytes]:
+        """Binary file object for streaming a blob."""
+        return open(self.path(blob_hash), 'rb')
+
+    @contextmanager
+    def map(self, blob_hash: str):
+        """Read-only memory map of a blob (empty blobs yield b'')."""
+        with self.open(blob_hash) as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b''
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+
+class BlobWriter:
+    """Writes a blob to a temporary file, hashing it on the way; `commit` moves it into place."""
+
+    def __init__(self, store: BlobStore):
+        self.store = store
+        os.makedirs(store.root, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.root, prefix='.upload-')
+        self._file = os.fdopen(fd, 'w+b')
+        self._digest = hashlib.sha256()
+        self.size = 0
+        self.blob_hash = None
+        # Whether commit added the blob (False when identical bytes were stored already)
+        self.created = False
+
+    def write(self, chunk: bytes) -> int:
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        return self._file.write(chunk)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        # Called by the multipart parser once a part is complete; writing is over by then
+        return self._file.seek(offset, whence)
+
+    def commit(self) -> Tuple[str, int]:
+        """Finish the blob, returns (sha256, size). Identical blobs are kept once."""
+        if self.blob_hash is None:
+            self._file.close()
+            self.blob_hash = self._digest.hexdigest()
+            path = self.store.path(self.blob_hash)
+            if os.path.exists(path):
+                os.unlink(self._tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(self._tmp_path, path)
+                self.created = True
+        return self.blob_hash, self.size
+
+    def discard(self):
+        """Drop an uncommitted blob (no-op after commit)."""
+        if self.blob_hash is None:
+            self._file.close()
+            if os.path.exists(self._tmp_path):
+                os.unlink(self._tmp_path)
+
+    def close(self):
+        self.discard()
@@ -1,9 +1,62 @@
 """Convert all item types (file, link, text) to markdown text."""
 import base64
+import hashlib
 import io
-from typing import Dict, List
+import mimetypes
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 from markitdown import MarkItDown
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from .blob_store import BlobStore
+from .instrumentation import record
+from .metrics import CONVERSION_DURATION, LINK_FETCH_DURATION, PLAYWRIGHT_RENDER_DURATION
+from .scraper_service import visible_text
+from .single_flight import SingleFlight, flight_key
+from tracing import span
+import config
+
+# Identical files / URLs submitted concurrently (e.g. by several jobs) are converted once
+_conversions = SingleFlight('conversion')
+
+USER_AGENT = 'Mozilla/5.0 (compatible; FactExtractor/1.0)'
+HTML_TYPES = ('', 'text/html', 'application/xhtml+xml')
+# Mount points of single-page apps, filled in by JavaScript
+_APP_ROOT = re.compile(r'<div[^>]+id=["\'](?:root|app|__next|__nuxt)["\'][^>]*>\s*</div>', re.IGNORECASE)
+_JAVASCRIPT_REQUIRED = re.compile(
+    r'(enable|turn on|requires?) javascript|javascript (is )?(required|disabled)', re.IGNORECASE
+)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """Shared session, so connections to a host are kept alive and reused (per worker process)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=config.LINK_FETCH_POOL_SIZE, pool_maxsize=config.LINK_FETCH_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _session = session
+        return _session
+
+
+def needs_browser(html: str) -> Optional[str]:
+    """Why a page fetched over plain HTTP has to be rendered with JavaScript, None if it does not."""
+    text = visible_text(html)
+    if len(text) < config.LINK_MIN_TEXT_CHARS:
+        return 'little_text'
+    if len(text) < 4 * config.LINK_MIN_TEXT_CHARS and (_APP_ROOT.search(html) or _JAVASCRIPT_REQUIRED.search(text)):
+        return 'javascript_shell'
+    return None
 
 
 class ContentConverterService:
@@ -11,6 +64,13 @@ class ContentConverterService:
 
     def __init__(self):
         self.md_converter = MarkItDown()
+        self.blob_store = BlobStore()
+        # url -> LinkFetcher result of links fetched ahead of conversion (see `prefetch`)
+        self.prefetched: Dict[str, Dict] = {}
+
+    def prefetch(self, fetched: Dict[str, Dict]):
+        """Use these fetch results (e.g. from ScraperService.scrape_urls) instead of a GET per link."""
+        self.prefetched.update(fetched)
 
     def convert_items_to_text(self, items: List[Dict]) -> List[Dict]:
         """Convert all items to text format with metadata headers."""
@@ -27,22 +87,38 @@ class ContentConverterService:
                 })
             
             elif item_type == 'file':
-                converted = self._convert_file(item)
-                text_items.append(converted)
+                with span('convert', item_type='file', item_id=item.get('id')) as s:
+                    file_hash = item.get('blob_hash') or hashlib.sha256(item['content'].encode('utf-8')).hexdigest()
+                    converted = _conversions.do(flight_key('file', file_hash), lambda: self._convert_file(item))
+                    if s is not None:
+                        s.set(success=converted.get('conversion_success'), chars=len(converted['content']))
+                text_items.append(dict(converted, original_item=item))
             
             elif item_type == 'link':
-                converted = self._convert_url(item)
-                text_items.append(converted)
+                with span('convert', item_type='link', item_id=item.get('id'), url=item['content']) as s:
+                    converted = _conversions.do(flight_key('link', item['content']), lambda: self._convert_url(item))
+                    if s is not None:
+                        s.set(success=converted.get('conversion_success'), chars=len(converted['content']),
+                              fetch_tier=converted.get('fetch_tier'), fetch_ms=converted.get('fetch_ms'))
+                text_items.append(dict(converted, original_item=item))
         
         return text_items
 
     def _convert_file(self, item: Dict) -> Dict:
-        """Convert base64 file to markdown text."""
+        """Convert a stored file (blob, or legacy base64 content) to markdown text."""
+        start = time.perf_counter()
         try:
-            file_content = base64.b64decode(item['content'])
-            file_stream = io.BytesIO(file_content)
-            
-            result = self.md_converter.convert_stream(file_stream)
+            if item.get('blob_hash'):
+                # Streamed from the blob store instead of decoded into memory
+                with self.blob_store.open(item['blob_hash']) as file_stream:
+                    result = self.md_converter.convert_stream(file_stream)
+                file_size = self.blob_store.size(item['blob_hash'])
+            else:
+                file_content = base64.b64decode(item['content'])
+                result = self.md_converter.convert_stream(io.BytesIO(file_content))
+                file_size = len(file_content)
+            record(conversions=1, conversion_ms=(time.perf_counter() - start) * 1000, bytes_fetched=file_size)
+            CONVERSION_DURATION.observe(time.perf_counter() - start, source_type='file', outcome='ok')
             markdown_text = result.text_content
             
             metadata_header = f"# Source: File\n\n"
@@ -56,6 +132,7 @@ class ContentConverterService:
             }
         
         except Exception as e:
+            CONVERSION_DURATION.observe(time.perf_counter() - start, source_type='file', outcome='error')
             return {
                 'content': f"# Source: File (Conversion Failed)\n\nError: {str(e)}",
                 'source_type': 'file',
@@ -65,14 +142,16 @@ class ContentConverterService:
             }
 
     def _convert_url(self, item: Dict) -> Dict:
-        """Convert URL to markdown using playwright for JS rendering."""
+        """Convert URL to markdown: plain HTTP when the page has its content, playwright otherwise."""
         url = item['content']
         
+        start = time.perf_counter()
         try:
-            html_content = self._fetch_rendered_html(url)
+            fetched = self._fetch_url(url)
             
-            html_stream = io.BytesIO(html_content.encode('utf-8'))
-            result = self.md_converter.convert_stream(html_stream, file_extension='.html')
+            result = self.md_converter.convert_stream(io.BytesIO(fetched['body']), file_extension=fetched['extension'])
+            record(conversions=1, conversion_ms=(time.perf_counter() - start) * 1000, bytes_fetched=len(fetched['body']))
+            CONVERSION_DURATION.observe(time.perf_counter() - start, source_type='link', outcome='ok')
             markdown_text = result.text_content
             
             metadata_header = f"# Source: {url}\n\n"
@@ -83,10 +162,17 @@ class ContentConverterService:
                 'source_type': 'link',
                 'original_item': item,
                 'conversion_success': True,
-                'url': url
+                'url': url,
+                # Validators for conditional re-checks of the source (services/link_refresh_service.py)
+                'etag': fetched['etag'],
+                'last_modified': fetched['last_modified'],
+                'response_hash': fetched['response_hash'],
+                'fetch_tier': fetched['tier'],
+                'fetch_ms': fetched['fetch_ms']
             }
         
         except Exception as e:
+            CONVERSION_DURATION.observe(time.perf_counter() - start, source_type='link', outcome='error')
             return {
                 'content': f"# Source: {url} (Conversion Failed)\n\nError: {str(e)}",
                 'source_type': 'link',
@@ -96,20 +182,110 @@ class ContentConverterService:
                 'url': url
             }
 
-    def _fetch_rendered_html(self, url: str, timeout: int = 10000) -> str:
-        """Fetch HTML after JS execution using playwright."""
+    def _fetch_url(self, url: str) -> Dict:
+        """Fetch a URL with the cheapest tier that gets its content (LINK_FETCH_MODE).
+
+        Returns the body with the file extension to convert it as, the tier
+        ('http' or 'browser'), its fetch time and the response's validators.
+        """
+        if config.LINK_FETCH_MODE != 'browser':
+            fetched = self._fetch_http(url, escalate=config.LINK_FETCH_MODE != 'http')
+            if fetched is not None:
+                return fetched
+
+        start = time.perf_counter()
+        html_content, headers = self._fetch_rendered_html(url)
+        fetch_ms = round((time.perf_counter() - start) * 1000, 1)
+        record(browser_renders=1, fetch_ms=fetch_ms)
+        return {
+            'tier': 'browser',
+            'body': html_content.encode('utf-8'),
+            'extension': '.html',
+            'etag': headers.get('etag'),
+            'last_modified': headers.get('last-modified'),
+            # The rendered DOM is not the response body, so it cannot be compared with a plain GET
+            'response_hash': None,
+            'fetch_ms': fetch_ms
+        }
+
+    def _fetch_http(self, url: str, escalate: bool) -> Optional[Dict]:
+        """Plain GET on the shared session, or its prefetched result; None when the page needs the browser."""
+        prefetched = self.prefetched.pop(url, None)
+        start = time.perf_counter()
+        try:
+            if prefetched is not None:
+                response = self._prefetched_response(prefetched)
+            else:
+                response = http_session().get(url, timeout=config.LINK_FETCH_TIMEOUT)
+                response.raise_for_status()
+        except Exception as e:
+            fetch_ms = prefetched['fetch_ms'] if prefetched is not None else (time.perf_counter() - start) * 1000
+            record(http_fetches=1, fetch_ms=fetch_ms)
+            LINK_FETCH_DURATION.observe(fetch_ms / 1000, tier='http', outcome='error')
+            if not escalate:
+                raise Exception(f"Failed to fetch URL: {str(e)}")
+            print(f"[CONVERTER] Plain HTTP fetch of {url} failed ({e}), rendering in the browser", flush=True)
+            return None
+
+        fetch_ms = prefetched['fetch_ms'] if prefetched is not None else (time.perf_counter() - start) * 1000
+        record(http_fetches=1, fetch_ms=fetch_ms)
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type in HTML_TYPES:
+            html_content = response.text
+            reason = needs_browser(html_content) if escalate else None
+            if reason:
+                LINK_FETCH_DURATION.observe(fetch_ms / 1000, tier='http', outcome='escalated')
+                print(f"[CONVERTER] {url} needs JavaScript ({reason}), rendering in the browser", flush=True)
+                return None
+            body, extension = html_content.encode('utf-8'), '.html'
+        else:
+            # PDFs, documents etc. are converted as files
+            body, extension = response.content, mimetypes.guess_extension(content_type) or ''
+
+        LINK_FETCH_DURATION.observe(fetch_ms / 1000, tier='http', outcome='ok')
+        return {
+            'tier': 'http',
+            'body': body,
+            'extension': extension,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'response_hash': hashlib.sha256(response.content).hexdigest(),
+            'fetch_ms': round(fetch_ms, 1)
+        }
+
+    def _prefetched_response(self, prefetched: Dict) -> requests.Response:
+        """A prefetched body from the blob store as a Response, so it is handled like a direct GET."""
+        if prefetched['blob_hash'] is None:
+            raise Exception(prefetched['error'])
+        response = requests.Response()
+        response.url = prefetched['url']
+        response.status_code = prefetched['status_code']
+        response.headers = CaseInsensitiveDict(prefetched['headers'])
+        response.encoding = prefetched['encoding']
+        with self.blob_store.open(prefetched['blob_hash']) as f:
+            response._content = f.read()
+        response.raise_for_status()
+        return response
+
+    def _fetch_rendered_html(self, url: str, timeout: int = 10000) -> Tuple[str, Dict[str, str]]:
+        """Fetch HTML after JS execution using playwright, with the page's response headers."""
+        start = time.perf_counter()
         try:
             with sync_playwright() as p:
                 browser = p.chromium.launch(headless=True)
                 page = browser.new_page()
                 
-                page.goto(url, wait_until='networkidle', timeout=timeout)
+                response = page.goto(url, wait_until='networkidle', timeout=timeout)
                 html_content = page.content()
+                headers = response.headers if response is not None else {}
                 
                 browser.close()
-                return html_content
+                PLAYWRIGHT_RENDER_DURATION.observe(time.perf_counter() - start, outcome='ok')
+                return html_content, headers
         
         except PlaywrightTimeoutError:
+            PLAYWRIGHT_RENDER_DURATION.observe(time.perf_counter() - start, outcome='timeout')
             raise Exception(f"Timeout while loading {url}")
         except Exception as e:
+            PLAYWRIGHT_RENDER_DURATION.observe(time.perf_counter() - start, outcome='error')
             raise Exception(f"Failed to fetch URL: {str(e)}")
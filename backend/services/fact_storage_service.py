@@ -2,7 +2,10 @@
 import json
 from typing import List, Dict, Optional
 
+from tracing import traced
 
+
+@traced
 class FactStorageService:
     """Handles fact storage and validation."""
 
@@ -37,14 +40,14 @@ class FactStorageService:
             cur.close()
 
     def validate_and_store_fact(self, fact_id: int, embedding: Optional[List[float]] = None):
-        """Validate a fact and store it in the vector database."""
+        """Validate a fact and store it in the vector database (no-op for facts already validated)."""
         cur = self.conn.cursor()
         try:
             cur.execute(
                 """
                 UPDATE extracted_facts
                 SET is_validated = TRUE
-                WHERE id = %s
+                WHERE id = %s AND NOT is_validated
                 RETURNING fact, language
                 """,
                 (fact_id,)
@@ -69,6 +72,24 @@ class FactStorageService:
         finally:
             cur.close()
 
+    def get_step_fact_ids(self, step_id: int) -> List[int]:
+        """Ids of the facts extracted by a step, in extraction order."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT id FROM extracted_facts WHERE step_id = %s ORDER BY id", (step_id,))
+            return [row[0] for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+    def delete_item_facts(self, step_id: int, item_id: int):
+        """Drop what an interrupted step stored for an item before it is extracted again."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute("DELETE FROM extracted_facts WHERE step_id = %s AND item_id = %s", (step_id, item_id))
+            self.conn.commit()
+        finally:
+            cur.close()
+
     def get_extracted_facts(self, job_uuid: str, validated_only: bool = False) -> List[Dict]:
         """Get extracted facts for a job."""
         cur = self.conn.cursor()
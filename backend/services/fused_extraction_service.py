@@ -0,0 +1,101 @@
+"""Fused single-pass extraction of facts, predictions and unknowns."""
+from typing import Dict, List
+
+from .llm_client import LLMClient
+from .llm_schemas import FUSED_EXTRACTION_SCHEMA
+from .prompt_budget import PromptBuilder
+
+
+class FusedExtractionService:
+    """Extracts facts, predictions and unknowns from a chunk with one structured LLM call."""
+
+    def __init__(self):
+        self.llm_client = LLMClient('fused_extraction')
+
+    def extract(self, text: str, language: str = 'en') -> Dict[str, List]:
+        """Return {'facts': [...], 'predictions': [...], 'unknowns': [...]} for one chunk.
+
+        Each prediction is {'prediction': str, 'source_fact_ids': [int]} where the
+        ids index into the returned facts list.
+        """
+        print(f"[FUSED_EXTRACTION] Calling LLM for fused extraction ({len(text)} chars)...", flush=True)
+        result = self.llm_client.generate_json(
+            self._build_prompt(text, language), FUSED_EXTRACTION_SCHEMA,
+            language=language, timeout=180
+        )
+        if not result:
+            return {'facts': [], 'predictions': [], 'unknowns': []}
+
+        facts = [f.strip() for f in result['facts']]
+        predictions = []
+        for pred in result['predictions']:
+            text_value = pred['prediction'].strip()
+            if len(text_value) < 10:
+                continue
+            predictions.append({
+                'prediction': text_value,
+                'source_fact_ids': [i for i in pred['source_fact_ids'] if 0 <= i < len(facts)]
+            })
+        unknowns = [u.strip() for u in result['unknowns'] if len(u.strip()) > 10]
+
+        print(f"[FUSED_EXTRACTION] Got {len(facts)} facts, {len(predictions)} predictions, {len(unknowns)} unknowns", flush=True)
+        return {'facts': facts, 'predictions': predictions, 'unknowns': unknowns}
+
+    @staticmethod
+    def chunk_text(text: str, chunk_size: int) -> List[str]:
+        """Split text into chunks of at most chunk_size chars, preferring paragraph boundaries.
+
+        Whitespace-only chunks are dropped; each chunk costs an LLM call.
+        """
+        chunks = []
+
+        def emit(chunk):
+            if chunk.strip():
+                chunks.append(chunk)
+
+        current = ''
+        for paragraph in text.split('\n\n'):
+            while len(paragraph) > chunk_size:
+                emit(current)
+                current = ''
+                emit(paragraph[:chunk_size])
+                paragraph = paragraph[chunk_size:]
+            candidate = f"{current}\n\n{paragraph}" if current else paragraph
+            if len(candidate) > chunk_size:
+                emit(current)
+                current = paragraph
+            else:
+                current = candidate
+        emit(current)
+        return chunks
+
+    def _build_prompt(self, text: str, language: str) -> str:
+        builder = PromptBuilder('fused_extraction', language, max_output_tokens=2048)
+        builder.add_text('instructions', self._instructions(language))
+        builder.add_text('text', text, priority=1)
+        return builder.build()
+
+    def _instructions(self, language: str) -> str:
+        if language == 'en':
+            return (
+                "Analyze the text below in a single pass and return three lists:\n"
+                "1. facts - key facts from the text that are relevant to Atlantis (at most 20).\n"
+                "2. predictions - 3-5 forecasts of future events, threats, opportunities or trends for Atlantis "
+                "inferred from those facts. source_fact_ids are 0-based indices into YOUR facts list.\n"
+                "3. unknowns - information that is missing or unknown but would be important for Atlantis.\n"
+                "Respond with a JSON object:\n"
+                "{\"facts\": [\"fact\"], \"predictions\": [{\"prediction\": \"text\", \"source_fact_ids\": [0]}], "
+                "\"unknowns\": [\"missing info\"]}\n\n"
+                "TEXT:\n"
+            )
+        return (
+            "Przeanalizuj poniższy tekst w jednym przebiegu i zwróć trzy listy:\n"
+            "1. facts - kluczowe fakty z tekstu istotne dla Atlantis (maksymalnie 20).\n"
+            "2. predictions - 3-5 prognoz przyszłych wydarzeń, zagrożeń, szans lub trendów dla Atlantis "
+            "wywnioskowanych z tych faktów. source_fact_ids to indeksy (od 0) w TWOJEJ liście faktów.\n"
+            "3. unknowns - informacje brakujące lub nieznane, które byłyby ważne dla Atlantis.\n"
+            "Odpowiedz obiektem JSON:\n"
+            "{\"facts\": [\"fakt\"], \"predictions\": [{\"prediction\": \"tekst\", \"source_fact_ids\": [0]}], "
+            "\"unknowns\": [\"brak info\"]}\n\n"
+            "TEKST:\n"
+        )
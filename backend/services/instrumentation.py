@@ -0,0 +1,170 @@
+"""Per-step and per-item resource profiles for processing jobs.
+
+`profile_step(step_number)` makes a StepProfile active for the current
+job; code anywhere below it (LLM client, content converter, database
+cursors), including worker threads that carry the job's `llm_context`,
+adds to it with `record(...)`. The profile is stored in
+`processing_steps.metadata.profile` and served by /api/jobs/<id>/profile.
+"""
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import psycopg2.extensions
+
+from .llm_scheduler import current_context
+from .metrics import observe_db_query
+
+COUNTERS = (
+    'llm_calls', 'llm_ms', 'prompt_tokens', 'completion_tokens',
+    'conversions', 'conversion_ms', 'bytes_fetched', 'http_fetches', 'browser_renders', 'fetch_ms',
+    'db_queries', 'db_ms'
+)
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size (Linux), None elsewhere."""
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * resource.getpagesize() / 1048576, 1)
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux; it is the peak of the whole process so far
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class StepProfile:
+    """Counters for one processing step, with a breakdown per item."""
+
+    def __init__(self, step_number: int):
+        self.step_number = step_number
+        self.started = time.perf_counter()
+        self.rss_start_mb = _rss_mb()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.items: Dict[str, Dict] = {}
+        self._item: Optional[str] = None
+        self._item_started = 0.0
+        self._lock = threading.Lock()
+        self.result: Dict = {}
+
+    def record(self, **values):
+        with self._lock:
+            for key, value in values.items():
+                if value:
+                    self.counters[key] = self.counters.get(key, 0) + value
+                    if self._item is not None:
+                        item = self.items[self._item]
+                        item[key] = item.get(key, 0) + value
+
+    def mark_item(self, item_id):
+        """Attribute what follows to item_id (items of a step are processed one after another).
+
+        None ends the current item, e.g. before work on the combined content.
+        """
+        with self._lock:
+            self._close_item()
+            if item_id is not None:
+                self._item = str(item_id)
+                self._item_started = time.perf_counter()
+                self.items.setdefault(self._item, dict.fromkeys(COUNTERS, 0))
+
+    def _close_item(self):
+        if self._item is not None:
+            item = self.items[self._item]
+            item['wall_ms'] = round(item.get('wall_ms', 0) + (time.perf_counter() - self._item_started) * 1000, 1)
+            self._item = None
+
+    def finish(self) -> Dict:
+        with self._lock:
+            if self.result:
+                return self.result
+            self._close_item()
+            self.result = {
+                'wall_ms': round((time.perf_counter() - self.started) * 1000, 1),
+                **{k: round(v, 1) if isinstance(v, float) else v for k, v in self.counters.items()},
+                'rss_start_mb': self.rss_start_mb,
+                'rss_end_mb': _rss_mb(),
+                'peak_rss_mb': _peak_rss_mb(),
+                'items': {
+                    item_id: {k: round(v, 1) if isinstance(v, float) else v for k, v in item.items()}
+                    for item_id, item in self.items.items()
+                }
+            }
+            return self.result
+
+
+# (job_key, priority, step) -> active step profile; step is set when steps of a job run in parallel
+_active: Dict[Tuple, StepProfile] = {}
+_active_lock = threading.Lock()
+
+
+def _key() -> Tuple:
+    ctx = current_context()
+    return ctx['job_key'], ctx['priority'], ctx['step']
+
+
+@contextmanager
+def profile_step(step_number: int):
+    """Collect a profile for the step run by the current job (see llm_context)."""
+    key = _key()
+    profile = StepProfile(step_number)
+    with _active_lock:
+        previous = _active.get(key)
+        _active[key] = profile
+    try:
+        yield profile
+    finally:
+        profile.finish()
+        with _active_lock:
+            if previous is None:
+                _active.pop(key, None)
+            else:
+                _active[key] = previous
+
+
+def active_profile() -> Optional[StepProfile]:
+    if not _active:
+        return None
+    with _active_lock:
+        return _active.get(_key())
+
+
+def record(**values):
+    """Add to the counters of the active step profile, if any."""
+    profile = active_profile()
+    if profile is not None:
+        profile.record(**values)
+
+
+def mark_item(item_id):
+    profile = active_profile()
+    if profile is not None:
+        profile.mark_item(item_id)
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor that records query count and time in the active step profile and /metrics."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._record(time.perf_counter() - start)
+
+    @staticmethod
+    def _record(seconds: float):
+        record(db_queries=1, db_ms=seconds * 1000)
+        observe_db_query(seconds)
@@ -1,47 +1,117 @@
 """Job and item management service."""
 import base64
+from contextlib import contextmanager
 from typing import List, Dict, Optional
 
-from repositories.fact_repository import FactRepository
 from repositories.item_repository import ItemRepository
 from repositories.job_repository import JobRepository
-from repositories.scraped_data_repository import ScrapedDataRepository
-from repositories.step_repository import StepRepository
+from .blob_store import BlobStore
 
 
 class JobService:
     """Handles job and item business logic."""
     VALID_TYPES = ['text', 'file', 'link']
     VALID_STATUSES = ['pending', 'processing', 'completed', 'failed']
+    # A job whose attempt failed with a transient error waits as 'retrying' for its next attempt
+    JOB_STATUSES = VALID_STATUSES + ['retrying']
 
     def __init__(self, db_connection):
         self.conn = db_connection
         self.job_repo = JobRepository(db_connection)
         self.item_repo = ItemRepository(db_connection)
-        self.step_repo = StepRepository(db_connection)
-        self.scraped_repo = ScrapedDataRepository(db_connection)
-        self.fact_repo = FactRepository(db_connection)
+        self.blob_store = BlobStore()
 
     def create_job(self, items: List[Dict]) -> str:
+        """Create a job. File items carry base64 `content`, or the `blob_hash` of an already stored upload."""
+        created_blobs = []
+        with self._removing_unused_blobs(created_blobs):
+            stored_items = self._prepare_items(items, created_blobs)
+            job_uuid = self.job_repo.create_job()
+            for item in stored_items:
+                self.item_repo.create_item(
+                    job_uuid, item['type'], item['content'], item['wage'],
+                    blob_hash=item['blob_hash'], blob_size=item['blob_size']
+                )
+        return job_uuid
+
+    def add_items(self, job_uuid: str, items: List[Dict]) -> int:
+        """Add items to an existing job; its report is marked stale until regenerated."""
+        created_blobs = []
+        with self._removing_unused_blobs(created_blobs):
+            stored_items = self._prepare_items(items, created_blobs)
+            for item in stored_items:
+                self.item_repo.create_item(
+                    job_uuid, item['type'], item['content'], item['wage'],
+                    blob_hash=item['blob_hash'], blob_size=item['blob_size']
+                )
+        self.job_repo.mark_report_stale(job_uuid)
+        return len(stored_items)
+
+    def create_jobs_bulk(self, specs: List[Dict]) -> List[Dict]:
+        """Create many jobs at once; specs are {'items': [...], 'idempotency_key': optional}.
+
+        All specs are validated before anything is inserted. Returns
+        {'job_uuid', 'idempotency_key', 'created'} per spec, in order; specs
+        whose idempotency key was used before return that job with created=False.
+        """
+        created_blobs = []
+        with self._removing_unused_blobs(created_blobs):
+            jobs = [
+                {'idempotency_key': spec.get('idempotency_key'),
+                 'items': self._prepare_items(spec.get('items') or [], created_blobs)}
+                for spec in specs
+            ]
+            return self.job_repo.create_jobs_bulk(jobs)
+
+    @contextmanager
+    def _removing_unused_blobs(self, created_blobs: List[str]):
+        """On failure, remove the blobs added for items that were not stored (unless an item uses them)."""
+        try:
+            yield
+        except Exception:
+            if created_blobs:
+                self.conn.rollback()
+                referenced = self.item_repo.get_referenced_blob_hashes(created_blobs)
+                for blob_hash in set(created_blobs) - referenced:
+                    self.blob_store.delete(blob_hash)
+            raise
+
+    def _prepare_items(self, items: List[Dict], created_blobs: List[str]) -> List[Dict]:
+        """Validate items and store files as blobs (decoded once, never kept as base64 text).
+
+        Hashes of blobs that did not exist before are appended to `created_blobs`.
+        """
         if not items:
             raise ValueError("Items list cannot be empty")
-        for item in items:
-            self._validate_item(item)
-        job_uuid = self.job_repo.create_job()
-        for item in items:
-            self.item_repo.create_item(
-                job_uuid,
-                item['type'],
-                item['content'],
-                item.get('wage')
-            )
-        return job_uuid
+        files = [self._validate_item(item) for item in items]
+        stored = []
+        for item, file_content in zip(items, files):
+            blob_hash = blob_size = None
+            if file_content is not None:
+                writer = self.blob_store.writer()
+                try:
+                    writer.write(file_content)
+                    blob_hash, blob_size = writer.commit()
+                finally:
+                    writer.discard()
+                if writer.created:
+                    created_blobs.append(blob_hash)
+            elif item.get('blob_hash'):
+                blob_hash, blob_size = item['blob_hash'], self.blob_store.size(item['blob_hash'])
+            stored.append({
+                'type': item['type'],
+                'content': None if blob_hash else item['content'],
+                'wage': item.get('wage'),
+                'blob_hash': blob_hash,
+                'blob_size': blob_size
+            })
+        return stored
 
     def get_job_status(self, job_uuid: str) -> Optional[Dict]:
         job = self.job_repo.get_job_by_uuid(job_uuid)
         if not job:
             return None
-        items = self.item_repo.get_items_by_job_uuid(job_uuid)
+        items = self.item_repo.get_item_summaries_by_job_uuid(job_uuid)
         return {
             **job,
             'items': items,
@@ -51,26 +121,30 @@ class JobService:
         }
 
     def get_all_jobs(self, limit: int = 100) -> List[Dict]:
-        jobs = self.job_repo.get_all_jobs(limit)
-        for job in jobs:
-            job_uuid = job['job_uuid']
-            items = self.item_repo.get_items_by_job_uuid(job_uuid)
-            steps = self.step_repo.get_steps_by_job_uuid(job_uuid)
-            scraped_data = self.scraped_repo.get_scraped_data_by_job_uuid(job_uuid)
-            extracted_facts = self.fact_repo.get_facts_by_job_uuid(job_uuid)
-            job.update({
-                'items': items,
-                'steps': steps,
-                'scraped_data': scraped_data,
-                'extracted_facts': extracted_facts,
-                'total_items': len(items),
-                'completed_items': sum(1 for item in items if item['status'] == 'completed'),
-                'failed_items': sum(1 for item in items if item['status'] == 'failed')
-            })
-        return jobs
+        """Jobs for listings: item counts only; items, steps and facts are served per job."""
+        return self.job_repo.get_all_jobs(limit)
+
+    def get_item_content(self, item_id: int) -> Optional[Dict]:
+        """An item with its content; job reads only carry item summaries."""
+        return self.item_repo.get_item_content(item_id)
+
+    def start_attempt(self, job_uuid: str, processing_config: Dict) -> int:
+        return self.job_repo.start_attempt(job_uuid, processing_config)
+
+    def get_processing_config(self, job_uuid: str) -> Optional[Dict]:
+        return self.job_repo.get_processing_config(job_uuid)
+
+    def claim_job(self, job_uuid: str, force: bool = False) -> Optional[str]:
+        return self.job_repo.claim_job(job_uuid, force)
+
+    def schedule_retry(self, job_uuid: str, delay: int, error_message: str):
+        self.job_repo.schedule_retry(job_uuid, delay, error_message)
+
+    def release_job(self, job_uuid: str, status: str):
+        self.job_repo.release_job(job_uuid, status)
 
     def update_job_status(self, job_uuid: str, status: str, error_message: Optional[str] = None):
-        if status not in self.VALID_STATUSES:
+        if status not in self.JOB_STATUSES:
             raise ValueError(f"Invalid status: {status}")
         self.job_repo.update_job_status(job_uuid, status, error_message)
 
@@ -81,24 +155,35 @@ class JobService:
             raise ValueError(f"Invalid status: {status}")
         self.item_repo.update_item_status(item_id, status, processed_content, error_message)
 
-    def _validate_item(self, item: Dict):
+    def _validate_item(self, item: Dict) -> Optional[bytes]:
+        """Validate an item; returns the decoded bytes of file items."""
         if 'type' not in item:
             raise ValueError("Item must have 'type' field")
         if item['type'] not in self.VALID_TYPES:
             raise ValueError(f"Invalid type: {item['type']}. Must be one of {self.VALID_TYPES}")
+        if item['type'] == 'file' and item.get('blob_hash'):
+            if not self.blob_store.exists(item['blob_hash']):
+                raise ValueError(f"Unknown blob: {item['blob_hash']}")
+            self._validate_wage(item)
+            return None
         if 'content' not in item:
             raise ValueError("Item must have 'content' field")
         if not item['content']:
             raise ValueError("Item content cannot be empty")
+        file_content = None
         if item['type'] == 'file':
             try:
-                base64.b64decode(item['content'], validate=True)
+                file_content = base64.b64decode(item['content'], validate=True)
             except Exception as e:
                 raise ValueError(f"File content must be valid base64 encoded string: {str(e)}")
         if item['type'] == 'link':
             content = item['content'].strip()
             if not (content.startswith('http://') or content.startswith('https://')):
                 raise ValueError("Link content must be a valid URL starting with http:// or https://")
+        self._validate_wage(item)
+        return file_content
+
+    def _validate_wage(self, item: Dict):
         if 'wage' in item and item['wage'] is not None:
             try:
                 float(item['wage'])
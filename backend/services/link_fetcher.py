@@ -0,0 +1,91 @@
+"""Fetch many links concurrently.
+
+One asyncio event loop and one httpx client (HTTP/2 when the `h2` package is
+installed, connections kept alive and reused) fetch all URLs at once, limited
+to LINK_FETCH_CONCURRENCY requests in total and LINK_FETCH_PER_HOST per host,
+so a job with hundreds of links takes about as long as its slowest hosts.
+Bodies are streamed into the blob store and cut off at LINK_FETCH_MAX_BYTES;
+only metadata is held in memory.
+"""
+import asyncio
+import importlib.util
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from .blob_store import BlobStore
+import config
+
+USER_AGENT = 'Mozilla/5.0 (compatible; FactExtractor/1.0)'
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+# Response headers kept with a fetched body
+KEPT_HEADERS = ('content-type', 'etag', 'last-modified')
+
+
+class LinkFetcher:
+    """Fetches a batch of URLs with a global and a per-host concurrency limit."""
+
+    def __init__(self, blob_store: Optional[BlobStore] = None, concurrency: Optional[int] = None,
+                 per_host: Optional[int] = None, max_bytes: Optional[int] = None, timeout: Optional[float] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.blob_store = blob_store or BlobStore()
+        self.concurrency = concurrency or config.LINK_FETCH_CONCURRENCY
+        self.per_host = per_host or config.LINK_FETCH_PER_HOST
+        self.max_bytes = max_bytes or config.LINK_FETCH_MAX_BYTES
+        self.timeout = timeout or config.LINK_FETCH_TIMEOUT
+        self.transport = transport
+
+    def fetch_all(self, urls: List[str]) -> Dict[str, Dict]:
+        """Fetch URLs (duplicates once); returns a result per URL, see `_fetch`."""
+        unique = list(dict.fromkeys(urls))
+        if not unique:
+            return {}
+        return asyncio.run(self._fetch_all(unique))
+
+    async def _fetch_all(self, urls: List[str]) -> Dict[str, Dict]:
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        slots = asyncio.Semaphore(self.concurrency)
+        host_slots = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        async with httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=limits, timeout=self.timeout,
+                                     follow_redirects=True, headers={'User-Agent': USER_AGENT},
+                                     transport=self.transport) as client:
+            results = await asyncio.gather(*(
+                self._fetch(client, url, slots, host_slots[urlsplit(url).netloc.lower()]) for url in urls
+            ))
+        return dict(zip(urls, results))
+
+    async def _fetch(self, client: httpx.AsyncClient, url: str, slots: asyncio.Semaphore,
+                     host_slot: asyncio.Semaphore) -> Dict:
+        """{url, status_code, headers, encoding, blob_hash, size, http_version, fetch_ms, error}."""
+        result = {'url': url, 'status_code': None, 'headers': {}, 'encoding': None, 'blob_hash': None,
+                  'size': 0, 'http_version': None, 'fetch_ms': 0.0, 'error': None}
+        # Waiting for a busy host does not hold one of the global slots
+        async with host_slot, slots:
+            start = time.perf_counter()
+            writer = None
+            try:
+                async with client.stream('GET', url) as response:
+                    result.update(
+                        status_code=response.status_code,
+                        headers={k: response.headers[k] for k in KEPT_HEADERS if k in response.headers},
+                        encoding=response.charset_encoding,
+                        http_version=response.http_version
+                    )
+                    writer = self.blob_store.writer()
+                    async for chunk in response.aiter_bytes():
+                        if writer.size + len(chunk) > self.max_bytes:
+                            raise ValueError(f"Response larger than {self.max_bytes} bytes")
+                        writer.write(chunk)
+                    result['blob_hash'], result['size'] = writer.commit()
+                if response.status_code >= 400:
+                    result['error'] = f"HTTP {response.status_code}"
+            except Exception as e:
+                result['error'] = str(e) or type(e).__name__
+            finally:
+                if writer is not None:
+                    writer.discard()
+                result['fetch_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
@@ -0,0 +1,158 @@
+"""Detect changes in link sources and mark changed items for re-processing.
+
+Every converted link item keeps a snapshot (`link_snapshots`): the page's
+ETag / Last-Modified, the SHA-256 of the HTTP response body and of the
+converted markdown (stored in the blob store). Processing reuses the
+snapshot instead of rendering the page again, and a refresh checks a
+source in increasing order of cost:
+
+    conditional GET    304 Not Modified -> unchanged, nothing downloaded
+    response body      same bytes as last time -> unchanged, no render
+    render + convert   same markdown -> unchanged, no LLM calls
+
+Only items whose markdown changed are removed from their steps' checkpoints,
+so the next run of the job extracts facts for those items only (see
+ProcessingService.add_items for the same mechanism). Predictions and unknowns
+are drawn from the content and facts of all items together, so the reasoning
+steps are restarted and re-derive them from every item.
+"""
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from .blob_store import CHUNK_SIZE, BlobStore
+from .content_converter_service import ContentConverterService, http_session
+from .metrics import LINK_REFRESH_CHECKS
+from .step_service import StepService
+from repositories.item_repository import ItemRepository
+from repositories.job_repository import JobRepository
+from repositories.link_snapshot_repository import LinkSnapshotRepository
+import config
+
+# Prediction and unknown extraction (steps 3 and 4)
+REASONING_STEPS = [3, 4]
+
+
+class LinkRefreshService:
+    """Converts link items through their snapshots and re-checks them for changes."""
+
+    def __init__(self, db_connection, content_converter: Optional[ContentConverterService] = None):
+        self.conn = db_connection
+        self.content_converter = content_converter or ContentConverterService()
+        self.blob_store = BlobStore()
+        self.snapshot_repo = LinkSnapshotRepository(db_connection)
+        self.item_repo = ItemRepository(db_connection)
+        self.job_repo = JobRepository(db_connection)
+        self.step_service = StepService(db_connection)
+
+    def convert_link(self, item: Dict) -> Dict:
+        """Converted content of a link item: its snapshot, or a fresh render that becomes the snapshot."""
+        snapshot = self.snapshot_repo.get_snapshot(item['id'])
+        if snapshot and self.blob_store.exists(snapshot['markdown_hash']):
+            with self.blob_store.open(snapshot['markdown_hash']) as f:
+                content = f.read().decode('utf-8')
+            return {
+                'content': content,
+                'source_type': 'link',
+                'original_item': item,
+                'conversion_success': True,
+                'url': item['content']
+            }
+
+        converted = self.content_converter.convert_items_to_text([item])[0]
+        if converted.get('conversion_success'):
+            self._save_snapshot(item['id'], converted)
+        return converted
+
+    def urls_to_fetch(self, job_uuid: str, item_ids: List[int]) -> List[str]:
+        """URLs of these link items that have no snapshot yet, i.e. that converting them will fetch."""
+        snapshotted = self.snapshot_repo.get_snapshotted_item_ids(item_ids) if item_ids else set()
+        return [
+            item['content'] for item in self.item_repo.get_link_items(job_uuid)
+            if item['id'] in item_ids and item['id'] not in snapshotted
+        ]
+
+    def refresh_job(self, job_uuid: str) -> Dict:
+        """Check all link items of a job; changed ones are reopened and the report marked stale.
+
+        Returns counts per outcome and the ids of the changed items.
+        """
+        summary = {'job_uuid': job_uuid, 'checked': 0, 'not_modified': 0, 'unchanged': 0,
+                   'baseline': 0, 'failed': 0, 'changed': []}
+        for item in self.item_repo.get_link_items(job_uuid):
+            outcome = self.check_item(item)
+            LINK_REFRESH_CHECKS.inc(outcome=outcome)
+            summary['checked'] += 1
+            if outcome == 'changed':
+                summary['changed'].append(item['id'])
+            else:
+                summary[outcome] += 1
+
+        if summary['changed']:
+            self.step_service.reopen_steps(job_uuid, summary['changed'], REASONING_STEPS)
+            self.job_repo.mark_report_stale(job_uuid)
+        print(
+            f"[LINK_REFRESH] Job {job_uuid}: {summary['checked']} links, {summary['not_modified']} not modified, "
+            f"{summary['unchanged']} unchanged, {len(summary['changed'])} changed, {summary['failed']} failed",
+            flush=True
+        )
+        return summary
+
+    def check_item(self, item: Dict) -> str:
+        """Outcome for one link: not_modified, unchanged, changed, baseline (first snapshot) or failed."""
+        url = item['content']
+        snapshot = self.snapshot_repo.get_snapshot(item['id'])
+        try:
+            if not snapshot or not self.blob_store.exists(snapshot['markdown_hash']):
+                # Nothing to compare with (e.g. never converted): record the current version
+                converted = self.content_converter.convert_items_to_text([item])[0]
+                if not converted.get('conversion_success'):
+                    raise Exception(converted.get('error', 'Conversion failed'))
+                self._save_snapshot(item['id'], converted)
+                return 'baseline'
+
+            response = self._conditional_get(url, snapshot)
+            if response is None:
+                self.snapshot_repo.mark_checked(item['id'])
+                return 'not_modified'
+            etag, last_modified, response_hash = response
+            if response_hash == snapshot['response_hash']:
+                self.snapshot_repo.mark_checked(item['id'], etag, last_modified, response_hash)
+                return 'unchanged'
+
+            converted = self.content_converter.convert_items_to_text([item])[0]
+            if not converted.get('conversion_success'):
+                raise Exception(converted.get('error', 'Conversion failed'))
+            # Validators of the plain GET match what the next conditional request will get
+            markdown_hash = self._save_snapshot(
+                item['id'], dict(converted, etag=etag, last_modified=last_modified), response_hash
+            )
+            return 'unchanged' if markdown_hash == snapshot['markdown_hash'] else 'changed'
+        except Exception as e:
+            print(f"[LINK_REFRESH] Could not check item {item['id']} ({url}): {e}", flush=True)
+            return 'failed'
+
+    def _conditional_get(self, url: str, snapshot: Dict) -> Optional[Tuple[Optional[str], Optional[str], str]]:
+        """None when the server answers 304, else (etag, last_modified, sha256 of the body)."""
+        headers = {}
+        if snapshot.get('etag'):
+            headers['If-None-Match'] = snapshot['etag']
+        if snapshot.get('last_modified'):
+            headers['If-Modified-Since'] = snapshot['last_modified']
+
+        with http_session().get(url, headers=headers, timeout=config.LINK_REFRESH_TIMEOUT, stream=True) as response:
+            if response.status_code == 304:
+                return None
+            response.raise_for_status()
+            digest = hashlib.sha256()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                digest.update(chunk)
+            return response.headers.get('ETag'), response.headers.get('Last-Modified'), digest.hexdigest()
+
+    def _save_snapshot(self, item_id: int, converted: Dict, response_hash: Optional[str] = None) -> str:
+        markdown_hash, _ = self.blob_store.put_bytes(converted['content'].encode('utf-8'))
+        self.snapshot_repo.save_snapshot(
+            item_id, markdown_hash, converted.get('etag'), converted.get('last_modified'),
+            response_hash or converted.get('response_hash'), converted.get('fetch_tier'), converted.get('fetch_ms')
+        )
+        return markdown_hash
+
@@ -0,0 +1,441 @@
+"""Shared LLM client used by all extraction and report services."""
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import requests
+
+import config
+from .instrumentation import record
+from .llm_router import LLMEndpoint, get_router
+from .llm_scheduler import get_scheduler
+from .llm_schemas import SchemaValidationError, validate
+from .metrics import LLM_CALL_DURATION
+from .prompt_budget import context_window, get_token_counter
+from .prompts import static_prefix
+from .single_flight import SingleFlight, flight_key
+from tracing import current_span, end_span, span, start_span
+
+
+# Seconds before a failed prefix prefill is attempted again
+PREFIX_RETRY_AFTER = 60
+
+
+class LLMClient:
+    """Calls the LLM endpoints chosen by the router (see llm_router).
+
+    Every prompt is sent as `static_prefix(language)` followed by the
+    service-specific prompt, so the shared Atlantis context is always a
+    byte-identical prefix. On Ollama the model is kept loaded with
+    `keep_alive`, and with OLLAMA_PREFIX_CONTEXT the prefix is prefilled once
+    per model and reused through the `context` parameter.
+    """
+
+    # (endpoint url, model, prefix hash) -> token context of the prefilled prefix
+    _prefix_contexts: Dict[tuple, list] = {}
+    # Prefixes whose prefill failed -> time.monotonic() after which to try again
+    _prefix_failures: Dict[tuple, float] = {}
+    _prefix_lock = threading.Lock()
+    # Concurrent callers needing the same prefix wait for one prefill
+    _prefix_flights = SingleFlight('llm_prefix')
+    # Identical concurrent calls (same prompt, language, limits, schema) share one request
+    _flights = SingleFlight('llm')
+
+    def __init__(self, service: str = 'llm'):
+        self.service = service
+
+    def generate(self, prompt: str, language: str = 'en', timeout: int = 120,
+                 max_tokens: Optional[int] = None) -> Optional[str]:
+        """Generate free-form text. Returns None if the call failed."""
+        raw = self._call(prompt, language, timeout, max_tokens)
+        if raw is None:
+            return None
+        return raw if isinstance(raw, str) else json.dumps(raw, ensure_ascii=False)
+
+    def generate_json(self, prompt: str, schema: Dict, language: str = 'en',
+                      timeout: int = 120, max_tokens: Optional[int] = None) -> Optional[Dict]:
+        """Generate a response constrained to `schema`.
+
+        Returns the validated object, or None if the call failed or the
+        output does not match the schema.
+        """
+        raw = self._call(prompt, language, timeout, max_tokens, schema)
+        if raw is None:
+            return None
+
+        try:
+            data = json.loads(raw) if isinstance(raw, str) else raw
+            return validate(data, schema)
+        except (json.JSONDecodeError, SchemaValidationError) as e:
+            print(f"[LLM] {self.service}: structured output rejected: {e}", flush=True)
+            return None
+
+    def stream(self, prompt: str, language: str = 'en', timeout: int = 120,
+               max_tokens: Optional[int] = None, schema: Optional[Dict] = None) -> Iterator[str]:
+        """Yield response text fragments as the provider generates them.
+
+        `timeout` bounds the whole generation: when it elapses (or the
+        connection drops) the stream simply ends, so callers keep whatever
+        was already yielded. A stream that fails before producing any output
+        fails over to the next endpoint.
+        """
+        router = get_router()
+        start = time.perf_counter()
+        try:
+            yield from self._stream_endpoints(router, prompt, language, timeout, max_tokens, schema)
+        finally:
+            record(llm_calls=1, llm_ms=(time.perf_counter() - start) * 1000)
+
+    def _stream_endpoints(self, router, prompt: str, language: str, timeout: int,
+                          max_tokens: Optional[int], schema: Optional[Dict]) -> Iterator[str]:
+        for endpoint in router.candidates(language):
+            produced = False
+            tokens = self._estimate_tokens(endpoint, prompt, language, max_tokens)
+            attempt_start = None
+            try:
+                with router.track(endpoint), get_scheduler().slot(endpoint.name, tokens):
+                    attempt_start = time.perf_counter()
+                    # Not made current: the caller's work between fragments is not part of the call
+                    stream_span = start_span('llm.stream', **self._span_attributes(endpoint, language))
+                    error = None
+                    try:
+                        for fragment in self._stream(endpoint, prompt, language, timeout, max_tokens, schema,
+                                                     stream_span):
+                            produced = True
+                            yield fragment
+                    except Exception as e:
+                        error = str(e)
+                        raise
+                    finally:
+                        end_span(stream_span, error)
+                self._observe_call(endpoint, language, 'stream', True, attempt_start)
+                router.mark_success(endpoint)
+                return
+            except Exception as e:
+                if attempt_start is not None:
+                    self._observe_call(endpoint, language, 'stream', False, attempt_start)
+                router.mark_failure(endpoint, str(e))
+                if produced:
+                    print(f"[LLM] {self.service}: stream interrupted, keeping partial output: {e}", flush=True)
+                    return
+                print(f"[LLM] {self.service}: stream on {endpoint.name} failed: {e}", flush=True)
+
+    def _stream(self, endpoint: LLMEndpoint, prompt: str, language: str, timeout: int,
+                max_tokens: Optional[int], schema: Optional[Dict], trace_span=None) -> Iterator[str]:
+        deadline = time.monotonic() + timeout
+        start = time.perf_counter()
+        model = endpoint.model_for(language)
+        if endpoint.provider == 'cloudflare':
+            url, headers, payload = self._cloudflare_request(endpoint, prompt, language, max_tokens, schema)
+            payload['stream'] = True
+            with self._post_cloudflare(endpoint, url, headers, payload, timeout, stream=True) as response:
+                for raw_line in response.iter_lines():
+                    line = raw_line.decode('utf-8')
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[len('data:'):].strip()
+                    if data == '[DONE]':
+                        break
+                    chunk = json.loads(data)
+                    if chunk.get('usage'):
+                        self._record_usage(endpoint, model, {
+                            'prompt_tokens': chunk['usage'].get('prompt_tokens'),
+                            'completion_tokens': chunk['usage'].get('completion_tokens'),
+                            'total_ms': round((time.perf_counter() - start) * 1000, 1)
+                        }, 'stream', trace_span)
+                    if chunk.get('response'):
+                        yield chunk['response']
+                    if time.monotonic() > deadline:
+                        print(f"[LLM] {self.service}: stream deadline reached, keeping partial output", flush=True)
+                        break
+        else:
+            url, payload = self._ollama_request(endpoint, prompt, language, timeout, max_tokens, schema)
+            payload['stream'] = True
+            with requests.post(url, json=payload, timeout=timeout, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('response'):
+                        yield chunk['response']
+                    if chunk.get('done'):
+                        self._record_usage(endpoint, model, self._ollama_timings(chunk), 'stream', trace_span)
+                        break
+                    if time.monotonic() > deadline:
+                        print(f"[LLM] {self.service}: stream deadline reached, keeping partial output", flush=True)
+                        break
+
+    def _call(self, prompt: str, language: str, timeout: int,
+              max_tokens: Optional[int], schema: Optional[Dict] = None):
+        """Run one call, or join the identical call already in flight.
+
+        The leader's usage travels with its result, so followers account the
+        tokens of that call and not of whatever else the leader's client ran.
+        """
+        started = time.perf_counter()
+
+        def run():
+            result, usage = self._call_endpoints(prompt, language, timeout, max_tokens, schema)
+            return result, usage, threading.get_ident()
+
+        result, usage, leader = self._flights.do(flight_key(prompt, language, max_tokens, schema), run)
+        if leader != threading.get_ident() and usage:
+            self._record_shared_usage(usage, started)
+        return result
+
+    def _record_shared_usage(self, usage: Dict, started: float) -> Dict:
+        """Account a result shared from an identical in-flight call like a call of our own."""
+        record(prompt_tokens=usage.get('prompt_tokens') or 0, completion_tokens=usage.get('completion_tokens') or 0)
+        LLM_CALL_DURATION.observe(
+            time.perf_counter() - started, provider=usage['provider'], model=usage['model'],
+            service=self.service, mode='shared', outcome='ok'
+        )
+        return dict(usage, service=self.service, shared=True)
+
+    def _call_endpoints(self, prompt: str, language: str, timeout: int,
+                        max_tokens: Optional[int], schema: Optional[Dict] = None) -> Tuple[Optional[Any], Dict]:
+        """Run one call, failing over through the router's candidate endpoints.
+
+        Returns the result (None when every endpoint failed) and the usage of
+        the call that produced it; usage is passed back rather than kept on
+        the client, which threads (e.g. report sections) share.
+        """
+        router = get_router()
+        start = time.perf_counter()
+        for endpoint in router.candidates(language):
+            tokens = self._estimate_tokens(endpoint, prompt, language, max_tokens)
+            with router.track(endpoint), get_scheduler().slot(endpoint.name, tokens), \
+                    span('llm.generate', **self._span_attributes(endpoint, language)) as s:
+                attempt_start = time.perf_counter()
+                if endpoint.provider == 'cloudflare':
+                    result, usage = self._generate_with_cloudflare(endpoint, prompt, language, timeout, max_tokens, schema)
+                else:
+                    result, usage = self._generate_with_ollama(endpoint, prompt, language, timeout, max_tokens, schema)
+                self._observe_call(endpoint, language, 'generate', result is not None, attempt_start)
+                if s is not None and result is None:
+                    s.status = 'error'
+            if result is not None:
+                router.mark_success(endpoint)
+                record(llm_calls=1, llm_ms=(time.perf_counter() - start) * 1000)
+                return result, usage
+            router.mark_failure(endpoint)
+            print(f"[LLM] {self.service}: call on {endpoint.name} failed, trying next endpoint", flush=True)
+        record(llm_calls=1, llm_ms=(time.perf_counter() - start) * 1000)
+        return None, {}
+
+    def _span_attributes(self, endpoint: LLMEndpoint, language: str) -> Dict:
+        return {
+            'service': self.service, 'provider': endpoint.provider, 'endpoint': endpoint.name,
+            'model': endpoint.model_for(language), 'language': language
+        }
+
+    def _observe_call(self, endpoint: LLMEndpoint, language: str, mode: str, ok: bool, started: float):
+        LLM_CALL_DURATION.observe(
+            time.perf_counter() - started, provider=endpoint.provider, model=endpoint.model_for(language),
+            service=self.service, mode=mode, outcome='ok' if ok else 'error'
+        )
+
+    def _estimate_tokens(self, endpoint: LLMEndpoint, prompt: str, language: str, max_tokens: Optional[int]) -> int:
+        """Prompt + completion size on this endpoint's model, for tokens-per-minute accounting.
+
+        Counted with the model's tokenizer (as the prompt builder does); the
+        prompt size is logged, with a warning when it cannot fit the context.
+        """
+        model = endpoint.model_for(language)
+        counter = get_token_counter(model)
+        prefix_tokens = counter.count(static_prefix(language))
+        prompt_tokens = counter.count(prompt)
+        window = context_window(model)
+        print(
+            f"[PROMPT_TOKENS] service={self.service} endpoint={endpoint.name} model={model} "
+            f"prefix={prefix_tokens} prompt={prompt_tokens} max_output={max_tokens or '-'} context={window}",
+            flush=True
+        )
+        if prefix_tokens + prompt_tokens + (max_tokens or 0) > window:
+            print(f"[PROMPT_TOKENS] WARNING: {self.service} prompt exceeds the {window}-token context of {model}", flush=True)
+        return prefix_tokens + prompt_tokens + (max_tokens or 1024)
+
+    def _post_cloudflare(self, endpoint: LLMEndpoint, url: str, headers: Dict, payload: Dict,
+                         timeout: int, stream: bool = False):
+        """POST to Cloudflare, retrying 429 responses after Retry-After (or exponential backoff)."""
+        for attempt in range(config.LLM_MAX_RETRIES + 1):
+            response = requests.post(url, headers=headers, json=payload, timeout=timeout, stream=stream)
+            if response.status_code != 429 or attempt == config.LLM_MAX_RETRIES:
+                break
+            retry_after = response.headers.get('Retry-After', '')
+            delay = float(retry_after) if retry_after.replace('.', '', 1).isdigit() else 2 ** attempt
+            response.close()
+            # Pause every queued call to this endpoint, not just this one
+            get_scheduler().backoff(endpoint.name, delay)
+            print(f"[LLM] {self.service}: Cloudflare 429, retry {attempt + 1}/{config.LLM_MAX_RETRIES} in {delay:.1f}s", flush=True)
+            time.sleep(delay)
+        response.raise_for_status()
+        return response
+
+    def _cloudflare_request(self, endpoint: LLMEndpoint, prompt: str, language: str,
+                            max_tokens: Optional[int], schema: Optional[Dict]):
+        if not config.CLOUDFLARE_ACCOUNT_ID or not config.CLOUDFLARE_API_TOKEN:
+            raise ValueError("Cloudflare credentials not configured")
+
+        model = endpoint.model_for(language)
+        url = f"https://api.cloudflare.com/client/v4/accounts/{config.CLOUDFLARE_ACCOUNT_ID}/ai/run/{model}"
+
+        headers = {
+            "Authorization": f"Bearer {config.CLOUDFLARE_API_TOKEN}",
+            "Content-Type": "application/json"
+        }
+
+        payload = {
+            "messages": [
+                {"role": "system", "content": static_prefix(language)},
+                {"role": "user", "content": prompt}
+            ]
+        }
+        if schema:
+            payload["response_format"] = {"type": "json_schema", "json_schema": schema}
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        return url, headers, payload
+
+    def _generate_with_cloudflare(self, endpoint: LLMEndpoint, prompt: str, language: str, timeout: int,
+                                  max_tokens: Optional[int], schema: Optional[Dict]) -> Tuple[Optional[Any], Dict]:
+        start = time.perf_counter()
+        try:
+            url, headers, payload = self._cloudflare_request(endpoint, prompt, language, max_tokens, schema)
+            response = self._post_cloudflare(endpoint, url, headers, payload, timeout)
+            result = response.json()
+            if result.get("success"):
+                usage = result["result"].get("usage") or {}
+                usage = self._record_usage(endpoint, endpoint.model_for(language), {
+                    'prompt_tokens': usage.get('prompt_tokens'),
+                    'completion_tokens': usage.get('completion_tokens'),
+                    'total_ms': round((time.perf_counter() - start) * 1000, 1)
+                })
+                # In JSON mode the response may already be a decoded object
+                return result["result"]["response"], usage
+            print(f"[LLM] {self.service}: Cloudflare error: {result.get('errors')}", flush=True)
+        except Exception as e:
+            print(f"[LLM] {self.service}: Cloudflare call error: {e}", flush=True)
+        return None, {}
+
+    def _ollama_request(self, endpoint: LLMEndpoint, prompt: str, language: str, timeout: int,
+                        max_tokens: Optional[int], schema: Optional[Dict]):
+        prefix = static_prefix(language)
+        model = endpoint.model_for(language)
+        payload = {
+            'model': model,
+            'stream': False,
+            'keep_alive': config.OLLAMA_KEEP_ALIVE
+        }
+
+        prefix_context = self._get_prefix_context(endpoint, model, prefix, timeout) if config.OLLAMA_PREFIX_CONTEXT else None
+        if prefix_context:
+            payload['context'] = prefix_context
+            payload['prompt'] = prompt
+        else:
+            payload['prompt'] = f"{prefix}\n\n{prompt}"
+
+        if schema:
+            payload['format'] = schema
+        # Ollama silently truncates prompts longer than num_ctx, so size it to the budgeted window
+        payload['options'] = {'num_ctx': context_window(model)}
+        if max_tokens:
+            payload['options']['num_predict'] = max_tokens
+        return f'{endpoint.url}/api/generate', payload
+
+    def _generate_with_ollama(self, endpoint: LLMEndpoint, prompt: str, language: str, timeout: int,
+                              max_tokens: Optional[int], schema: Optional[Dict]) -> Tuple[Optional[str], Dict]:
+        url, payload = self._ollama_request(endpoint, prompt, language, timeout, max_tokens, schema)
+
+        try:
+            response = requests.post(url, json=payload, timeout=timeout)
+            if response.status_code == 200:
+                result = response.json()
+                usage = self._record_usage(endpoint, payload['model'], self._ollama_timings(result))
+                return result.get('response', ''), usage
+            print(f"[LLM] {self.service}: Ollama error on {endpoint.name}: Status {response.status_code}, Response: {response.text[:500]}", flush=True)
+        except Exception as e:
+            print(f"[LLM] {self.service}: Ollama call error on {endpoint.name}: {e}", flush=True)
+        return None, {}
+
+    def _get_prefix_context(self, endpoint: LLMEndpoint, model: str, prefix: str, timeout: int) -> Optional[list]:
+        """Prefill the static prefix once per endpoint and model and return its token context."""
+        key = (endpoint.url, model, hashlib.sha256(prefix.encode('utf-8')).hexdigest())
+        with self._prefix_lock:
+            if key in self._prefix_contexts:
+                return self._prefix_contexts[key]
+            if self._prefix_failures.get(key, 0) > time.monotonic():
+                return None
+        # The lock only guards the cache; the prefill call itself is coalesced per key
+        return self._prefix_flights.do(
+            flight_key(*key), lambda: self._prefill_prefix(key, endpoint, model, prefix, timeout)
+        )
+
+    def _prefill_prefix(self, key: tuple, endpoint: LLMEndpoint, model: str, prefix: str,
+                        timeout: int) -> Optional[list]:
+        context = None
+        try:
+            response = requests.post(
+                f'{endpoint.url}/api/generate',
+                json={
+                    'model': model,
+                    'prompt': prefix,
+                    'stream': False,
+                    'keep_alive': config.OLLAMA_KEEP_ALIVE,
+                    'options': {'num_predict': 0, 'num_ctx': context_window(model)}
+                },
+                timeout=timeout
+            )
+            if response.status_code == 200:
+                result = response.json()
+                context = result.get('context')
+                if context:
+                    self._record_usage(endpoint, model, self._ollama_timings(result), 'prefix_prefill')
+            else:
+                print(f"[LLM] {self.service}: prefix prefill returned {response.status_code}, sending full prompt", flush=True)
+        except Exception as e:
+            print(f"[LLM] {self.service}: prefix prefill failed, sending full prompt: {e}", flush=True)
+
+        with self._prefix_lock:
+            if context:
+                self._prefix_contexts[key] = context
+                self._prefix_failures.pop(key, None)
+            else:
+                # Calls in the meantime send the full prompt instead of each retrying the prefill
+                self._prefix_failures[key] = time.monotonic() + PREFIX_RETRY_AFTER
+        return context
+
+    @staticmethod
+    def _ollama_timings(result: Dict) -> Dict:
+        # Ollama reports durations in nanoseconds
+        def ms(key):
+            return round(result[key] / 1e6, 1) if result.get(key) is not None else None
+
+        return {
+            'prompt_tokens': result.get('prompt_eval_count'),
+            'completion_tokens': result.get('eval_count'),
+            'prompt_eval_ms': ms('prompt_eval_duration'),
+            'eval_ms': ms('eval_duration'),
+            'load_ms': ms('load_duration'),
+            'total_ms': ms('total_duration')
+        }
+
+    def _record_usage(self, endpoint: LLMEndpoint, model: str, usage: Dict, call: str = 'generate',
+                      trace_span=None) -> Dict:
+        """Account a call's token usage to the calling thread's profile and span; returns the usage record."""
+        record(prompt_tokens=usage.get('prompt_tokens') or 0, completion_tokens=usage.get('completion_tokens') or 0)
+        active = trace_span or current_span()
+        if active is not None and active.name.startswith('llm.'):
+            active.set(prompt_tokens=usage.get('prompt_tokens'), completion_tokens=usage.get('completion_tokens'))
+        if config.LLM_TIMING_LOG:
+            details = ' '.join(f"{k}={v}" for k, v in usage.items() if v is not None)
+            print(
+                f"[LLM_TIMING] service={self.service} call={call} provider={endpoint.provider} "
+                f"endpoint={endpoint.name} model={model} {details}",
+                flush=True
+            )
+        return {'provider': endpoint.provider, 'endpoint': endpoint.name, 'model': model, 'service': self.service,
+                **usage}
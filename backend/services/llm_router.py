@@ -0,0 +1,211 @@
+"""Routing of LLM calls across several Ollama / Cloudflare endpoints.
+
+Endpoints come from LLM_ENDPOINTS (a JSON list), e.g.
+
+    [{"name": "llm-en", "provider": "ollama", "url": "http://llm-en:11434", "languages": ["en"]},
+     {"name": "llm-pl", "provider": "ollama", "url": "http://llm-pl:11434", "languages": ["pl"]},
+     {"name": "cloudflare", "provider": "cloudflare", "priority": 1}]
+
+Without it a single endpoint is built from LLM_PROVIDER / OLLAMA_* as before.
+Calls go to the endpoint with the fewest outstanding requests among the
+healthy endpoints of the lowest priority tier that serve the language; the
+remaining endpoints are tried in order when a call fails.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import requests
+
+import config
+from .llm_scheduler import get_scheduler
+
+
+class LLMEndpoint:
+    """One inference server (or the Cloudflare account) and its live routing state."""
+
+    def __init__(self, name: str, provider: str, url: str = '', model: Optional[str] = None,
+                 languages: Optional[List[str]] = None, priority: int = 0,
+                 concurrency: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.name = name
+        self.provider = provider
+        self.url = url.rstrip('/')
+        self.model = model
+        self.languages = languages
+        self.priority = priority
+        if provider == 'cloudflare':
+            self.concurrency = concurrency or config.LLM_CONCURRENCY_CLOUDFLARE
+            self.tokens_per_minute = tokens_per_minute if tokens_per_minute is not None else config.LLM_TPM_CLOUDFLARE
+        else:
+            self.concurrency = concurrency or config.LLM_CONCURRENCY_OLLAMA
+            self.tokens_per_minute = tokens_per_minute if tokens_per_minute is not None else config.LLM_TPM_OLLAMA
+
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.last_error: Optional[str] = None
+
+    def serves(self, language: str) -> bool:
+        return not self.languages or language in self.languages
+
+    def model_for(self, language: str) -> str:
+        if self.model:
+            return self.model
+        if self.provider == 'cloudflare':
+            return config.CLOUDFLARE_MODEL_EN if language == 'en' else config.CLOUDFLARE_MODEL_PL
+        return config.OLLAMA_MODEL
+
+    def is_healthy(self, now: Optional[float] = None) -> bool:
+        return (now or time.monotonic()) >= self.down_until
+
+
+class LLMRouter:
+    """Picks endpoints by language, priority tier and least outstanding requests."""
+
+    def __init__(self, endpoints: List[LLMEndpoint], max_failures: int = 2, cooldown: float = 30.0):
+        self.endpoints = endpoints
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._health_thread: Optional[threading.Thread] = None
+
+    def candidates(self, language: str) -> List[LLMEndpoint]:
+        """Endpoints to try for a call, best first.
+
+        Healthy endpoints come first ordered by (priority, outstanding); endpoints
+        in cooldown are kept at the end as a last resort.
+        """
+        now = time.monotonic()
+        with self._lock:
+            serving = [e for e in self.endpoints if e.serves(language)] or list(self.endpoints)
+            healthy = sorted((e for e in serving if e.is_healthy(now)), key=lambda e: (e.priority, e.outstanding))
+            down = sorted((e for e in serving if not e.is_healthy(now)), key=lambda e: e.down_until)
+            return healthy + down
+
+    @contextmanager
+    def track(self, endpoint: LLMEndpoint):
+        """Count a call (queued or running) against an endpoint's outstanding requests."""
+        with self._lock:
+            endpoint.outstanding += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+
+    def mark_success(self, endpoint: LLMEndpoint):
+        with self._lock:
+            endpoint.consecutive_failures = 0
+            endpoint.down_until = 0.0
+
+    def mark_failure(self, endpoint: LLMEndpoint, error: str = ''):
+        with self._lock:
+            endpoint.consecutive_failures += 1
+            endpoint.last_error = error or endpoint.last_error
+            if endpoint.consecutive_failures >= self.max_failures:
+                endpoint.down_until = time.monotonic() + self.cooldown
+                print(f"[LLM_ROUTER] Endpoint {endpoint.name} taken out of rotation for {self.cooldown:.0f}s", flush=True)
+
+    def check_health(self):
+        """Probe Ollama endpoints and update their state. Cloudflare relies on call failures."""
+        for endpoint in self.endpoints:
+            if endpoint.provider != 'ollama':
+                continue
+            try:
+                response = requests.get(f"{endpoint.url}/api/tags", timeout=5)
+                healthy = response.status_code == 200
+                error = '' if healthy else f"health check status {response.status_code}"
+            except Exception as e:
+                healthy, error = False, f"health check failed: {e}"
+
+            was_down = not endpoint.is_healthy()
+            if healthy:
+                self.mark_success(endpoint)
+                if was_down:
+                    print(f"[LLM_ROUTER] Endpoint {endpoint.name} back in rotation", flush=True)
+            else:
+                with self._lock:
+                    endpoint.last_error = error
+                    endpoint.consecutive_failures = max(endpoint.consecutive_failures, self.max_failures)
+                    endpoint.down_until = time.monotonic() + self.cooldown
+
+    def start_health_checks(self, interval: int):
+        if interval <= 0 or self._health_thread is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.check_health()
+
+        self._health_thread = threading.Thread(target=loop, daemon=True, name='llm-health-check')
+        self._health_thread.start()
+
+    def status(self) -> List[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                'name': e.name,
+                'provider': e.provider,
+                'url': e.url or None,
+                'languages': e.languages,
+                'priority': e.priority,
+                'healthy': e.is_healthy(now),
+                'outstanding': e.outstanding,
+                'consecutive_failures': e.consecutive_failures,
+                'down_for_s': round(max(0.0, e.down_until - now), 1),
+                'last_error': e.last_error
+            } for e in self.endpoints]
+
+
+def load_endpoints() -> List[LLMEndpoint]:
+    """Build endpoints from LLM_ENDPOINTS, or the single legacy provider when unset."""
+    ollama_url = f'http://{config.OLLAMA_HOST}:{config.OLLAMA_PORT}'
+
+    if config.LLM_ENDPOINTS:
+        endpoints = []
+        for i, spec in enumerate(json.loads(config.LLM_ENDPOINTS)):
+            provider = spec.get('provider', 'ollama')
+            endpoints.append(LLMEndpoint(
+                name=spec.get('name', f"{provider}-{i}"),
+                provider=provider,
+                url=spec.get('url', ollama_url if provider == 'ollama' else ''),
+                model=spec.get('model'),
+                languages=spec.get('languages'),
+                priority=spec.get('priority', 0),
+                concurrency=spec.get('concurrency'),
+                tokens_per_minute=spec.get('tokens_per_minute')
+            ))
+        return endpoints
+
+    ollama = LLMEndpoint('ollama', 'ollama', url=ollama_url)
+    cloudflare = LLMEndpoint('cloudflare', 'cloudflare')
+    has_cloudflare = bool(config.CLOUDFLARE_ACCOUNT_ID and config.CLOUDFLARE_API_TOKEN)
+
+    if config.LLM_PROVIDER == 'cloudflare':
+        ollama.priority = 1
+        return [cloudflare, ollama] if config.LLM_FAILOVER else [cloudflare]
+    cloudflare.priority = 1
+    return [ollama, cloudflare] if config.LLM_FAILOVER and has_cloudflare else [ollama]
+
+
+_router: Optional[LLMRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> LLMRouter:
+    """Return the process-wide router, created from config on first use."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            endpoints = load_endpoints()
+            scheduler = get_scheduler()
+            for endpoint in endpoints:
+                scheduler.configure(endpoint.name, endpoint.concurrency, endpoint.tokens_per_minute)
+            _router = LLMRouter(endpoints, config.LLM_ENDPOINT_MAX_FAILURES, config.LLM_ENDPOINT_COOLDOWN)
+            if len(endpoints) > 1:
+                _router.start_health_checks(config.LLM_HEALTH_CHECK_INTERVAL)
+            print(f"[LLM_ROUTER] Endpoints: {', '.join(e.name for e in endpoints)}", flush=True)
+        return _router
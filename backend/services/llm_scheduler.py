@@ -0,0 +1,240 @@
+"""Process-wide scheduler for LLM calls.
+
+Every LLMClient call goes through `get_scheduler().slot(...)`, keyed by the
+endpoint (provider) it is routed to. The scheduler enforces per-endpoint
+concurrency and tokens-per-minute limits, serves the
+interactive class before batch work, and round-robins between jobs within a
+class so one large job cannot starve the others.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import config
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+PRIORITIES = (INTERACTIVE, BATCH)
+
+_context = threading.local()
+
+
+@contextmanager
+def llm_context(job_key: Optional[str] = None, priority: str = BATCH, step: Optional[int] = None):
+    """Tag LLM calls made by the current thread with a job and priority class.
+
+    `step` tells pipeline steps of the same job running in parallel apart
+    (for their profiles); scheduling only looks at the job and priority.
+    """
+    previous = (getattr(_context, 'job_key', None), getattr(_context, 'priority', BATCH), getattr(_context, 'step', None))
+    _context.job_key, _context.priority, _context.step = job_key, priority, step
+    try:
+        yield
+    finally:
+        _context.job_key, _context.priority, _context.step = previous
+
+
+def current_context() -> Dict:
+    return {
+        'job_key': getattr(_context, 'job_key', None),
+        'priority': getattr(_context, 'priority', BATCH),
+        'step': getattr(_context, 'step', None)
+    }
+
+
+class _Ticket:
+    __slots__ = ('job_key', 'tokens', 'enqueued_at')
+
+    def __init__(self, job_key: str, tokens: int):
+        self.job_key = job_key
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+
+
+class _ProviderQueue:
+    """Waiting tickets, capacity and metrics for one provider."""
+
+    def __init__(self, concurrency: int, tokens_per_minute: int):
+        self.concurrency = max(1, concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self.tokens = float(tokens_per_minute)
+        self.refilled_at = time.monotonic()
+        self.paused_until = 0.0
+        self.active = 0
+        # priority -> job_key -> deque of tickets (OrderedDict order is the round-robin order)
+        self.waiting = {p: OrderedDict() for p in PRIORITIES}
+        self.admitted = {p: 0 for p in PRIORITIES}
+        self.wait_times = {p: deque(maxlen=500) for p in PRIORITIES}
+        self.rate_limited = 0
+
+    def head(self) -> Optional[_Ticket]:
+        for priority in PRIORITIES:
+            jobs = self.waiting[priority]
+            if jobs:
+                return next(iter(jobs.values()))[0]
+        return None
+
+    def enqueue(self, ticket: _Ticket, priority: str):
+        self.waiting[priority].setdefault(ticket.job_key, deque()).append(ticket)
+
+    def dequeue_head(self, priority: str):
+        jobs = self.waiting[priority]
+        job_key, tickets = next(iter(jobs.items()))
+        tickets.popleft()
+        if tickets:
+            # Next ticket of this job goes behind the other jobs
+            jobs.move_to_end(job_key)
+        else:
+            del jobs[job_key]
+
+    def refill(self, now: float):
+        if self.tokens_per_minute > 0:
+            elapsed = now - self.refilled_at
+            self.tokens = min(self.tokens_per_minute, self.tokens + elapsed * self.tokens_per_minute / 60.0)
+        self.refilled_at = now
+
+    def delay_for(self, ticket: _Ticket, now: float) -> float:
+        """Seconds until the head ticket can start (0 if it can start now)."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.active >= self.concurrency:
+            return float('inf')
+        if self.tokens_per_minute > 0 and self.tokens < ticket.tokens:
+            return (ticket.tokens - self.tokens) * 60.0 / self.tokens_per_minute
+        return 0.0
+
+
+class LLMScheduler:
+    """Admission control for LLM calls, shared by all threads of a worker process."""
+
+    def __init__(self, limits: Dict[str, Dict]):
+        self._limits = limits
+        self._queues: Dict[str, _ProviderQueue] = {}
+        self._cond = threading.Condition()
+
+    def configure(self, provider: str, concurrency: int, tokens_per_minute: int = 0):
+        """Set limits for a provider or endpoint before its first call."""
+        with self._cond:
+            self._limits[provider] = {'concurrency': concurrency, 'tokens_per_minute': tokens_per_minute}
+            self._queues.pop(provider, None)
+
+    def _queue(self, provider: str) -> _ProviderQueue:
+        if provider not in self._queues:
+            limits = self._limits.get(provider, {})
+            self._queues[provider] = _ProviderQueue(
+                limits.get('concurrency', 1), limits.get('tokens_per_minute', 0)
+            )
+        return self._queues[provider]
+
+    @contextmanager
+    def slot(self, provider: str, estimated_tokens: int = 0):
+        """Block until the call may run, then hold a concurrency slot for its duration."""
+        self.acquire(provider, estimated_tokens)
+        try:
+            yield
+        finally:
+            self.release(provider)
+
+    def acquire(self, provider: str, estimated_tokens: int = 0) -> float:
+        """Wait for a slot; returns the time spent queued in seconds."""
+        ctx = current_context()
+        priority = ctx['priority'] if ctx['priority'] in PRIORITIES else BATCH
+        job_key = ctx['job_key'] or f"thread-{threading.get_ident()}"
+
+        with self._cond:
+            queue = self._queue(provider)
+            if queue.tokens_per_minute > 0:
+                # A single call larger than the whole budget would never be admitted
+                estimated_tokens = min(estimated_tokens, queue.tokens_per_minute)
+            ticket = _Ticket(job_key, estimated_tokens)
+            queue.enqueue(ticket, priority)
+
+            while True:
+                now = time.monotonic()
+                queue.refill(now)
+                if queue.head() is ticket:
+                    delay = queue.delay_for(ticket, now)
+                    if delay == 0:
+                        break
+                else:
+                    delay = float('inf')
+                self._cond.wait(None if delay == float('inf') else delay)
+
+            queue.dequeue_head(priority)
+            queue.active += 1
+            if queue.tokens_per_minute > 0:
+                queue.tokens -= ticket.tokens
+            waited = time.monotonic() - ticket.enqueued_at
+            queue.admitted[priority] += 1
+            queue.wait_times[priority].append(waited)
+            # The next ticket may be admissible too (free slots, different head)
+            self._cond.notify_all()
+
+        if waited > 1:
+            print(f"[LLM_SCHEDULER] {provider} {priority} call for {job_key} waited {waited:.1f}s", flush=True)
+        return waited
+
+    def release(self, provider: str):
+        with self._cond:
+            self._queue(provider).active -= 1
+            self._cond.notify_all()
+
+    def backoff(self, provider: str, seconds: float):
+        """Hold every queued call for a provider, e.g. after a 429 with Retry-After."""
+        with self._cond:
+            queue = self._queue(provider)
+            queue.paused_until = max(queue.paused_until, time.monotonic() + seconds)
+            queue.rate_limited += 1
+            self._cond.notify_all()
+        print(f"[LLM_SCHEDULER] {provider} rate limited, pausing for {seconds:.1f}s", flush=True)
+
+    def metrics(self) -> Dict:
+        """Queue depth, admitted counts and wait-time statistics per provider and priority."""
+        with self._cond:
+            result = {}
+            for provider, queue in self._queues.items():
+                classes = {}
+                for priority in PRIORITIES:
+                    waits = sorted(queue.wait_times[priority])
+                    classes[priority] = {
+                        'queued': sum(len(t) for t in queue.waiting[priority].values()),
+                        'queued_jobs': len(queue.waiting[priority]),
+                        'admitted': queue.admitted[priority],
+                        'wait_avg_ms': round(sum(waits) / len(waits) * 1000, 1) if waits else 0,
+                        'wait_p95_ms': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0,
+                        'wait_max_ms': round(waits[-1] * 1000, 1) if waits else 0
+                    }
+                result[provider] = {
+                    'active': queue.active,
+                    'concurrency': queue.concurrency,
+                    'tokens_per_minute': queue.tokens_per_minute,
+                    'tokens_available': round(queue.tokens) if queue.tokens_per_minute > 0 else None,
+                    'paused_for_s': round(max(0.0, queue.paused_until - time.monotonic()), 1),
+                    'rate_limited': queue.rate_limited,
+                    'priorities': classes
+                }
+            return result
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """Return the process-wide scheduler, created from config on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler({
+                'ollama': {
+                    'concurrency': config.LLM_CONCURRENCY_OLLAMA,
+                    'tokens_per_minute': config.LLM_TPM_OLLAMA
+                },
+                'cloudflare': {
+                    'concurrency': config.LLM_CONCURRENCY_CLOUDFLARE,
+                    'tokens_per_minute': config.LLM_TPM_CLOUDFLARE
+                }
+            })
+        return _scheduler
@@ -0,0 +1,111 @@
+"""JSON schemas for structured LLM output and a minimal validator."""
+from typing import Any, Dict
+
+
+class SchemaValidationError(ValueError):
+    """Raised when LLM output does not match the expected schema."""
+
+
+FACTS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'facts': {'type': 'array', 'items': {'type': 'string'}}
+    },
+    'required': ['facts']
+}
+
+PREDICTIONS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'predictions': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'prediction': {'type': 'string'},
+                    'source_fact_ids': {'type': 'array', 'items': {'type': 'integer'}}
+                },
+                'required': ['prediction', 'source_fact_ids']
+            }
+        }
+    },
+    'required': ['predictions']
+}
+
+UNKNOWNS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'unknowns': {'type': 'array', 'items': {'type': 'string'}}
+    },
+    'required': ['unknowns']
+}
+
+FUSED_EXTRACTION_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'facts': FACTS_SCHEMA['properties']['facts'],
+        'predictions': PREDICTIONS_SCHEMA['properties']['predictions'],
+        'unknowns': UNKNOWNS_SCHEMA['properties']['unknowns']
+    },
+    'required': ['facts', 'predictions', 'unknowns']
+}
+
+RECOMMENDATION_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'action': {'type': 'string'},
+        'responsible_entity': {'type': 'string'},
+        'timeline': {'type': 'string'},
+        'expected_outcome': {'type': 'string'},
+        'priority': {'type': 'string'}
+    },
+    'required': ['action', 'responsible_entity', 'timeline', 'expected_outcome', 'priority']
+}
+
+REPORT_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'time_horizon': {'type': 'string'},
+        'summary': {'type': 'string'},
+        'positive_scenario': {'type': 'string'},
+        'negative_scenario': {'type': 'string'},
+        'recommendations': {'type': 'array', 'items': RECOMMENDATION_SCHEMA}
+    },
+    'required': ['summary', 'positive_scenario', 'negative_scenario', 'recommendations']
+}
+
+# One schema per independently generated report section
+REPORT_SECTION_SCHEMAS = {
+    name: {'type': 'object', 'properties': {name: REPORT_SCHEMA['properties'][name]}, 'required': [name]}
+    for name in ('summary', 'positive_scenario', 'negative_scenario', 'recommendations')
+}
+
+_TYPE_CHECKS = {
+    'object': lambda v: isinstance(v, dict),
+    'array': lambda v: isinstance(v, list),
+    'string': lambda v: isinstance(v, str),
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'boolean': lambda v: isinstance(v, bool),
+}
+
+
+def validate(data: Any, schema: Dict, path: str = '$') -> Any:
+    """Validate data against the subset of JSON Schema used in this module."""
+    expected = schema.get('type')
+    if expected and not _TYPE_CHECKS[expected](data):
+        raise SchemaValidationError(f"{path}: expected {expected}, got {type(data).__name__}")
+
+    if expected == 'object':
+        for key in schema.get('required', []):
+            if key not in data:
+                raise SchemaValidationError(f"{path}: missing required key '{key}'")
+        for key, sub_schema in schema.get('properties', {}).items():
+            if key in data:
+                validate(data[key], sub_schema, f"{path}.{key}")
+
+    if expected == 'array' and 'items' in schema:
+        for i, item in enumerate(data):
+            validate(item, schema['items'], f"{path}[{i}]")
+
+    return data
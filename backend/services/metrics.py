@@ -0,0 +1,334 @@
+"""Prometheus-style metrics served by GET /metrics.
+
+A small in-process registry (counters, gauges, histograms with labels)
+rendered in the Prometheus text exposition format, so no client library is
+needed.
+
+Every worker process has its own registry. With METRICS_DIR set (gunicorn.conf.py
+sets it for the gunicorn workers), each worker writes a snapshot of its samples
+there every METRICS_FLUSH_INTERVAL seconds and on every scrape, and the worker
+answering a scrape renders the sum over all workers: counters and histograms
+include workers that have exited, gauges only live ones. Gauges created with
+`aggregate=False` (e.g. counts read from the database, already global) are
+computed by the answering worker alone. Without METRICS_DIR every sample
+carries a `pid` label instead, so series of different workers do not get mixed up.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import config
+
+# Seconds; LLM calls and renders take far longer than API requests
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LLM_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180, 300)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: Iterable[Tuple[str, str]] = (),
+                   pid: bool = True) -> str:
+    pairs = list(zip(names, values)) + list(extra) + ([('pid', os.getpid())] if pid else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _Metric:
+    kind = ''
+    # Whether samples are summed over workers (see the module docstring)
+    aggregate = True
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def render(self, values: Optional[Dict[Tuple, object]] = None) -> List[str]:
+        """Lines for these samples (merged over workers), or for this worker's own with a pid label."""
+        pid = values is None
+        samples = self._samples(self.collect() if pid else values, pid)
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + samples
+
+    def collect(self) -> Dict[Tuple, object]:
+        """This worker's samples: label values -> value."""
+        with self._lock:
+            return {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+
+    @staticmethod
+    def merge(values: List[object]):
+        return sum(values)
+
+    def _samples(self, values: Dict[Tuple, object], pid: bool) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, k, pid=pid)} {_format_value(v)}" for k, v in sorted(values.items())]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Gauge set directly, or computed at scrape time by a callback returning {label values: value}."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 callback: Optional[Callable[[], Dict[Tuple, float]]] = None, aggregate: bool = True):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple, float] = {}
+        self.callback = callback
+        self.aggregate = aggregate
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def collect(self) -> Dict[Tuple, object]:
+        if self.callback is None:
+            return super().collect()
+        try:
+            return {tuple(str(v) for v in key): value for key, value in self.callback().items()}
+        except Exception as e:
+            print(f"[METRICS] Could not collect {self.name}: {e}", flush=True)
+            return {}
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = REQUEST_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # label values -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        return self._values.get(self._key(labels), [0])[-1]
+
+    @staticmethod
+    def merge(values: List[object]):
+        return [sum(column) for column in zip(*values)]
+
+    def _samples(self, values: Dict[Tuple, object], pid: bool) -> List[str]:
+        lines = []
+        for key, series in sorted(values.items()):
+            for bound, count in zip(self.buckets, series):
+                le = (('le', _format_value(float(bound))),)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le, pid)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key, pid=pid)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key, pid=pid)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self, directory: Optional[str] = None):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self.directory = directory
+        self._flusher: Optional[threading.Thread] = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Tuple[str, ...] = (), callback=None,
+              aggregate: bool = True) -> Gauge:
+        return self.register(Gauge(name, documentation, labels, callback, aggregate))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = REQUEST_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        merged = self._merge_workers(metrics) if self.directory else {}
+        lines = []
+        for metric in metrics:
+            if not self.directory:
+                lines.extend(metric.render())
+            else:
+                lines.extend(metric.render(merged[metric.name] if metric.aggregate else metric.collect()))
+        return '\n'.join(lines) + '\n'
+
+    # Sharing between worker processes
+    def flush(self):
+        """Write this worker's samples to METRICS_DIR for the other workers' scrapes."""
+        with self._lock:
+            metrics = [m for m in self._metrics.values() if m.aggregate]
+        snapshot = {
+            'pid': os.getpid(),
+            'metrics': {m.name: [[list(k), v] for k, v in m.collect().items()] for m in metrics}
+        }
+        path = os.path.join(self.directory, f'worker-{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    def start_sharing(self, interval: float):
+        """Flush every `interval` seconds in a background thread (once per process)."""
+        if not self.directory or self._flusher is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        def loop():
+            while True:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"[METRICS] Could not write samples: {e}", flush=True)
+                time.sleep(interval)
+
+        self._flusher = threading.Thread(target=loop, daemon=True, name='metrics-flush')
+        self._flusher.start()
+
+    def _merge_workers(self, metrics: List[_Metric]) -> Dict[str, Dict[Tuple, object]]:
+        os.makedirs(self.directory, exist_ok=True)
+        self.flush()
+        per_metric: Dict[str, Dict[Tuple, List[object]]] = {m.name: {} for m in metrics}
+        kinds = {m.name: m.kind for m in metrics}
+        for path in glob.glob(os.path.join(self.directory, 'worker-*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = snapshot['pid'] == os.getpid() or _pid_alive(snapshot['pid'])
+            for name, samples in snapshot['metrics'].items():
+                # Counts of exited workers still happened; their gauges no longer hold
+                if name not in per_metric or (kinds[name] == 'gauge' and not alive):
+                    continue
+                for key, value in samples:
+                    per_metric[name].setdefault(tuple(key), []).append(value)
+        by_name = {m.name: m for m in metrics}
+        return {
+            name: {key: by_name[name].merge(values) for key, values in samples.items()}
+            for name, samples in per_metric.items()
+        }
+
+
+REGISTRY = Registry(config.METRICS_DIR or None)
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route', ('method', 'route', 'status')
+)
+HTTP_REQUEST_DB_QUERIES = REGISTRY.histogram(
+    'http_request_db_queries', 'Database queries per HTTP request', ('route',), COUNT_BUCKETS
+)
+HTTP_REQUEST_DB_DURATION = REGISTRY.histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries per HTTP request', ('route',)
+)
+DB_QUERY_DURATION = REGISTRY.histogram(
+    'db_query_duration_seconds', 'Database query latency (requests and background jobs)', ('context',)
+)
+LLM_CALL_DURATION = REGISTRY.histogram(
+    'llm_call_duration_seconds', 'LLM call latency per endpoint attempt',
+    ('provider', 'model', 'service', 'mode', 'outcome'), LLM_BUCKETS
+)
+LLM_PARSE_RESULTS = REGISTRY.counter(
+    'llm_parse_results_total', 'Parsing of LLM responses by outcome (ok, repaired, fallback, empty)', ('parser', 'outcome')
+)
+LINK_FETCH_DURATION = REGISTRY.histogram(
+    'link_fetch_duration_seconds', 'Plain HTTP fetches of links by outcome (ok, escalated to the browser, error)',
+    ('tier', 'outcome'), REQUEST_BUCKETS
+)
+PLAYWRIGHT_RENDER_DURATION = REGISTRY.histogram(
+    'playwright_render_duration_seconds', 'Playwright page render time', ('outcome',), LLM_BUCKETS
+)
+CONVERSION_DURATION = REGISTRY.histogram(
+    'content_conversion_duration_seconds', 'File / URL to markdown conversion time', ('source_type', 'outcome'), LLM_BUCKETS
+)
+LINK_REFRESH_CHECKS = REGISTRY.counter(
+    'link_refresh_checks_total', 'Re-checks of link sources by outcome (not_modified, unchanged, changed, baseline, failed)',
+    ('outcome',)
+)
+BACKGROUND_JOBS = REGISTRY.gauge(
+    'background_jobs', 'Processing jobs, link refreshes and report tasks running or queued', ('kind', 'state')
+)
+
+_request = threading.local()
+
+
+def begin_request():
+    _request.started = time.perf_counter()
+    _request.db_queries = 0
+    _request.db_seconds = 0.0
+
+
+def end_request(method: str, route: str, status: int):
+    started = getattr(_request, 'started', None)
+    if started is None:
+        return
+    HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method=method, route=route, status=status)
+    HTTP_REQUEST_DB_QUERIES.observe(_request.db_queries, route=route)
+    HTTP_REQUEST_DB_DURATION.observe(_request.db_seconds, route=route)
+    _request.started = None
+
+
+def observe_db_query(seconds: float):
+    in_request = getattr(_request, 'started', None) is not None
+    if in_request:
+        _request.db_queries += 1
+        _request.db_seconds += seconds
+    DB_QUERY_DURATION.observe(seconds, context='request' if in_request else 'background')
@@ -1,143 +1,98 @@
 """Prediction extraction service using LLM."""
-import requests
 import json
 import re
-from typing import List, Dict, Tuple
+from typing import Dict, Iterator, List
 import config
-
-
-ATLANTIS_CONTEXT = """
-Nazwa państwa: Atlantis
-Istotne cechy położenia geograficznego: dostęp do Morza Bałtyckiego, kilka dużych żeglownych rzek, ograniczone zasoby wody pitnej
-Liczba ludności: 28 mln
-Klimat: umiarkowany
-Silne strony gospodarki: przemysł ciężki, motoryzacyjny, spożywczy, chemiczny, ICT, ambicje odgrywania istotnej roli w zakresie OZE, przetwarzania surowców krytycznych oraz budowy ponadnarodowej infrastruktury AI (m.in. big data centers, giga fabryki AI, komputery kwantowe)
-Liczebność armii: 150 tys. zawodowych żołnierzy
-Stopnień cyfryzacji społeczeństwa: powyżej średniej europejskiej
-Waluta: inna niż euro
-Kluczowe relacje dwustronne: Niemcy, Francja, Finlandia, Ukraina, USA, Japonia
-Potencjalne zagrożenia polityczne i gospodarcze: niestabilność w UE, rozpad UE na grupy „różnych prędkości" pod względem tempa rozwoju oraz zainteresowania głębszą integracją; negatywna kampania wizerunkowa ze strony kilku aktorów państwowych wymierzona przeciw rządowi lub społeczeństwu Atlantis; zakłócenia w dostawach paliw węglowodorowych z USA, Skandynawii, Zatoki Perskiej (wynikające z potencjalnych zmian w polityce wewnętrznej krajów eksporterów lub problemów w transporcie, np. ataki Hutich na gazowce na Morzu Czerwonym); narażenie na spowolnienie rozwoju sektora ICT z powodu embarga na wysokozaawansowane procesory
-Potencjalne zagrożenie militarne: zagrożenie atakiem zbrojnym jednego z sąsiadów; trwające od wielu lat ataki hybrydowe co najmniej jednego sąsiada, w tym w obszarze infrastruktury krytycznej i cyberprzestrzeni
-Kamienie milowe w rozwoju politycznym i gospodarczym: demokracja parlamentarna od 130 lat; okres stagnacji gospodarczej w latach 1930-1950 oraz 1980-1990; członkostwo w UE i NATO od roku 1997; 25. gospodarka świata wg PKB
-"""
+from .llm_client import LLMClient
+from .llm_schemas import PREDICTIONS_SCHEMA
+from .metrics import LLM_PARSE_RESULTS
+from .prompt_budget import CONTENT_SEPARATOR, PromptBuilder
+from .stream_parsers import iter_json_array_items
 
 
 class PredictionService:
     """Handles LLM-based prediction extraction."""
 
+    def __init__(self):
+        self.llm_client = LLMClient('prediction_extraction')
+
     def extract_predictions(self, text: str, language: str = 'en', facts_context: str = '') -> List[str]:
         """Extract predictions from text using LLM."""
         print(f"[PREDICTION_EXTRACTION] Calling LLM ({config.LLM_PROVIDER}) for prediction extraction...", flush=True)
-        if config.LLM_PROVIDER == 'cloudflare':
-            return self._extract_with_cloudflare(text, language, facts_context)
-        else:
-            return self._extract_with_ollama(text, language, facts_context)
+        predictions_text = self.llm_client.generate(
+            self._build_prompt(text, language, facts_context), language, timeout=120
+        )
+        if not predictions_text:
+            return []
+        return self._parse_predictions(predictions_text, language)
 
     def extract_predictions_with_sources(self, text: str, language: str = 'en', facts_list: List[Dict] = None) -> List[Dict]:
         """Extract predictions with their source facts."""
         print(f"[PREDICTION_EXTRACTION] Extracting predictions with sources...", flush=True)
-        if config.LLM_PROVIDER == 'cloudflare':
-            return self._extract_with_sources_cloudflare(text, language, facts_list or [])
-        else:
-            return self._extract_with_sources_ollama(text, language, facts_list or [])
-
-    def _extract_with_cloudflare(self, text: str, language: str, facts_context: str = '') -> List[str]:
-        """Extract predictions using Cloudflare Workers AI."""
-        if not config.CLOUDFLARE_ACCOUNT_ID or not config.CLOUDFLARE_API_TOKEN:
-            print("ERROR: Cloudflare credentials not configured")
-            return []
-
-        model = config.CLOUDFLARE_MODEL_EN if language == 'en' else config.CLOUDFLARE_MODEL_PL
-
-        url = f"https://api.cloudflare.com/client/v4/accounts/{config.CLOUDFLARE_ACCOUNT_ID}/ai/run/{model}"
-
-        headers = {
-            "Authorization": f"Bearer {config.CLOUDFLARE_API_TOKEN}",
-            "Content-Type": "application/json"
-        }
+        sorted_facts = self._sort_facts_by_wage(facts_list or [])
+        prompt = self._build_sourced_prompt(text, language, sorted_facts, config.LLM_STRUCTURED_OUTPUT)
 
-        system_message = (
-            f"You are an expert analyst for the hypothetical country Atlantis. {ATLANTIS_CONTEXT}\n\n"
-            "Extract predictions from the text. Return ONLY predictions related to Atlantis.\n"
-            "Format:\n- prediction 1\n- prediction 2\n- prediction 3" if language == 'en' else
-            f"Jesteś ekspertem analitykiem dla hipotetycznego państwa Atlantis. {ATLANTIS_CONTEXT}\n\n"
-            "Wyodrębnij predykcje z tekstu. Zwróć TYLKO predykcje związane z Atlantis.\n"
-            "Format:\n- predykcja 1\n- predykcja 2\n- predykcja 3"
-        )
-
-        prompt = self._build_prompt(text, language, facts_context)
-
-        payload = {
-            "messages": [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ]
-        }
-
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-
-            result = response.json()
-
-            if result.get("success"):
-                predictions_text = result["result"]["response"]
-                return self._parse_predictions(predictions_text, language)
-            else:
-                print(f"Cloudflare AI error: {result.get('errors')}")
+        if config.LLM_STRUCTURED_OUTPUT:
+            result = self.llm_client.generate_json(prompt, PREDICTIONS_SCHEMA, language=language, timeout=120)
+            if not result:
                 return []
+            return self._resolve_sources(result['predictions'], sorted_facts)
 
-        except Exception as e:
-            print(f"Cloudflare AI extraction error: {e}")
+        response_text = self.llm_client.generate(prompt, language, timeout=120)
+        if not response_text:
             return []
+        return self._parse_sourced_predictions(response_text, sorted_facts)
+
+    def stream_predictions_with_sources(self, text: str, language: str = 'en', facts_list: List[Dict] = None) -> Iterator[Dict]:
+        """Yield predictions with their source facts as each JSON element completes."""
+        print(f"[PREDICTION_EXTRACTION] Streaming predictions with sources...", flush=True)
+        sorted_facts = self._sort_facts_by_wage(facts_list or [])
+        prompt = self._build_sourced_prompt(text, language, sorted_facts, config.LLM_STRUCTURED_OUTPUT)
+        fragments = self.llm_client.stream(
+            prompt, language, timeout=120,
+            schema=PREDICTIONS_SCHEMA if config.LLM_STRUCTURED_OUTPUT else None
+        )
 
-    def _extract_with_ollama(self, text: str, language: str, facts_context: str = '') -> List[str]:
-        """Extract predictions using local Ollama LLM."""
-        prompt = self._build_prompt(text, language, facts_context)
+        # Both the structured object and the bare array put predictions in the first array
+        for item in iter_json_array_items(fragments, decode=self._decode_element):
+            yield from self._resolve_sources([item], sorted_facts)
 
+    def _decode_element(self, element: str):
         try:
-            response = requests.post(
-                f'http://{config.OLLAMA_HOST}:{config.OLLAMA_PORT}/api/generate',
-                json={'model': config.OLLAMA_MODEL, 'prompt': prompt, 'stream': False},
-                timeout=120
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                predictions_text = result.get('response', '')
-                return self._parse_predictions(predictions_text, language)
-            else:
-                print(f"Ollama extraction error: Status {response.status_code}, Response: {response.text}")
-                return []
-
-        except Exception as e:
-            print(f"Ollama extraction error: {e}")
-
-        return []
+            return json.loads(element)
+        except json.JSONDecodeError:
+            return json.loads(self._repair_json(element))
 
     def _build_prompt(self, text: str, language: str, facts_context: str = '') -> str:
-        """Build extraction prompt."""
-        facts_section = f"\n\nKnown facts (sorted by wage/importance - prioritize higher-wage facts):\n{facts_context}\n" if facts_context else ""
-
+        """Build extraction prompt (appended after the shared static prefix), fitted to the token budget."""
+        builder = PromptBuilder('prediction_extraction', language)
+        facts = [line for line in facts_context.split('\n') if line.strip()]
         if language == 'en':
-            return (
-                f"Context: You are analyzing information for the hypothetical country Atlantis.\n\n{ATLANTIS_CONTEXT}{facts_section}\n"
+            facts_header = "Known facts (sorted by wage/importance - prioritize higher-wage facts):\n"
+            instructions = (
                 f"Extract predictions from the following text that are relevant to Atlantis.\n"
                 f"If facts are provided with wages, prioritize facts with higher wage values.\n"
                 f"Return ONLY the predictions as a bullet list. Do NOT include any titles, headers, or phrases like "
                 f'"Here are the predictions:", "There are no predictions", etc.\n'
-                f"If there are no predictions, return nothing (empty response).\n\n{text}"
+                f"If there are no predictions, return nothing (empty response).\n\n"
             )
         else:
-            return (
-                f"Kontekst: Analizujesz informacje dla hipotetycznego państwa Atlantis.\n\n{ATLANTIS_CONTEXT}{facts_section}\n"
+            facts_header = "Znane fakty (posortowane wg wagi - priorytetyzuj fakty o wyższej wadze):\n"
+            instructions = (
                 f"Wyodrębnij predykcje z następującego tekstu, które są istotne dla Atlantis.\n"
                 f"Jeśli fakty mają podaną wagę, priorytetyzuj fakty o wyższej wadze.\n"
                 f"Zwróć TYLKO predykcje jako listę punktowaną. NIE dodawaj żadnych tytułów, nagłówków ani fraz takich jak "
                 f'"Oto predykcje:", "Brak predykcji", itp.\n'
-                f"Jeśli nie ma predykcji, zwróć pustą odpowiedź.\n\n{text}"
+                f"Jeśli nie ma predykcji, zwróć pustą odpowiedź.\n\n"
             )
 
+        if facts:
+            builder.add_items('facts', facts, priority=1, header=facts_header)
+            builder.add_text('facts_end', "\n\n")
+        builder.add_text('instructions', instructions)
+        builder.add_parts('text', text.split(CONTENT_SEPARATOR), priority=2)
+        return builder.build()
+
     def _parse_predictions(self, predictions_text: str, language: str) -> List[str]:
         """Parse predictions from LLM response."""
         print(f"[PREDICTION_PARSING] Raw LLM response: {predictions_text[:200]}...", flush=True)
@@ -177,63 +132,9 @@ class PredictionService:
             reverse=True
         )
 
-    def _extract_with_sources_cloudflare(self, text: str, language: str, facts_list: List[Dict]) -> List[Dict]:
-        """Extract predictions with source facts using Cloudflare."""
-        if not config.CLOUDFLARE_ACCOUNT_ID or not config.CLOUDFLARE_API_TOKEN:
-            return []
-
-        model = config.CLOUDFLARE_MODEL_EN if language == 'en' else config.CLOUDFLARE_MODEL_PL
-        url = f"https://api.cloudflare.com/client/v4/accounts/{config.CLOUDFLARE_ACCOUNT_ID}/ai/run/{model}"
-
-        headers = {
-            "Authorization": f"Bearer {config.CLOUDFLARE_API_TOKEN}",
-            "Content-Type": "application/json"
-        }
-
-        sorted_facts = self._sort_facts_by_wage(facts_list)
-        prompt = self._build_sourced_prompt(text, language, sorted_facts)
-
-        payload = {
-            "messages": [
-                {"role": "system", "content": self._get_sourced_system_prompt(language)},
-                {"role": "user", "content": prompt}
-            ]
-        }
-
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-            result = response.json()
-            if result.get("success"):
-                return self._parse_sourced_predictions(result["result"]["response"], sorted_facts)
-        except Exception as e:
-            print(f"Cloudflare sourced extraction error: {e}")
-        return []
-
-    def _extract_with_sources_ollama(self, text: str, language: str, facts_list: List[Dict]) -> List[Dict]:
-        """Extract predictions with source facts using Ollama."""
-        sorted_facts = self._sort_facts_by_wage(facts_list)
-        prompt = self._build_sourced_prompt(text, language, sorted_facts)
-        system_prompt = self._get_sourced_system_prompt(language)
-        full_prompt = f"{system_prompt}\n\n{prompt}"
-
-        try:
-            response = requests.post(
-                f'http://{config.OLLAMA_HOST}:{config.OLLAMA_PORT}/api/generate',
-                json={'model': config.OLLAMA_MODEL, 'prompt': full_prompt, 'stream': False},
-                timeout=120
-            )
-            if response.status_code == 200:
-                result = response.json()
-                return self._parse_sourced_predictions(result.get('response', ''), sorted_facts)
-        except Exception as e:
-            print(f"Ollama sourced extraction error: {e}")
-        return []
-
-    def _get_sourced_system_prompt(self, language: str) -> str:
+    def _get_sourced_instructions(self, language: str) -> str:
         if language == 'en':
             return (
-                f"You are an expert strategic analyst for Atlantis. {ATLANTIS_CONTEXT}\n\n"
                 "Your task: Generate predictions/forecasts about future events that could affect Atlantis.\n"
                 "Based on the facts provided, INFER what might happen in the future.\n"
                 "A prediction can be: potential threats, opportunities, trends, scenarios, consequences.\n\n"
@@ -241,11 +142,9 @@ class PredictionService:
                 "reliable/important sources and should be PRIORITIZED in your analysis. Give more weight to "
                 "predictions derived from high-wage facts.\n\n"
                 "You MUST generate at least 3-5 predictions. Be creative but logical.\n"
-                "Return a JSON array: [{\"prediction\": \"prediction text\", \"source_fact_ids\": [0, 1]}]\n"
-                "source_fact_ids are the indices of facts that support this prediction."
+                "source_fact_ids are the indices of facts that support each prediction."
             )
         return (
-            f"Jesteś ekspertem analitykiem strategicznym dla Atlantis. {ATLANTIS_CONTEXT}\n\n"
             "Zadanie: Wygeneruj predykcje/prognozy dotyczące przyszłych wydarzeń dla Atlantis.\n"
             "Na podstawie faktów WYWNIOSKUJ co może się wydarzyć w przyszłości.\n"
             "Predykcja może dotyczyć: zagrożeń, szans, trendów, scenariuszy, konsekwencji.\n\n"
@@ -253,43 +152,66 @@ class PredictionService:
             "wiarygodnych/ważnych źródeł i powinny być PRIORYTETYZOWANE w analizie. Nadaj większą wagę "
             "predykcjom opartym na faktach o wysokiej wadze.\n\n"
             "MUSISZ wygenerować co najmniej 3-5 predykcji. Bądź kreatywny ale logiczny.\n"
-            "Zwróć tablicę JSON: [{\"prediction\": \"tekst\", \"source_fact_ids\": [0, 1]}]"
+            "source_fact_ids to indeksy faktów wspierających daną predykcję."
         )
 
-    def _build_sourced_prompt(self, text: str, language: str, facts_list: List[Dict]) -> str:
+    def _build_sourced_prompt(self, text: str, language: str, facts_list: List[Dict], structured: bool = False) -> str:
+        """Build the sourced prediction prompt, packing facts (by wage) and context into the token budget.
+
+        Facts keep their indices, so any that do not fit are simply never cited.
+        """
         def format_fact(i: int, f: Dict) -> str:
             wage = f.get('wage')
             wage_str = f" (wage: {wage})" if wage is not None else ""
             return f"[{i}]{wage_str} {f.get('fact', f.get('value', ''))}"
 
-        facts_str = "\n".join([format_fact(i, f) for i, f in enumerate(facts_list)])
+        facts = [format_fact(i, f) for i, f in enumerate(facts_list)]
 
         print(f"[PREDICTION_PROMPT] Facts count: {len(facts_list)}, sorted by wage", flush=True)
         print(f"[PREDICTION_PROMPT] Text length: {len(text)}", flush=True)
 
+        builder = PromptBuilder('prediction_extraction', language)
+        builder.add_text('instructions', f"{self._get_sourced_instructions(language)}\n\n")
         if language == 'en':
-            return (
-                f"KNOWN FACTS about the situation (sorted by WAGE - higher = more important, use indices 0-{len(facts_list)-1}):\n{facts_str}\n\n"
-                f"ADDITIONAL CONTEXT:\n{text[:8000]}\n\n"
-                "Based on the facts above, GENERATE predictions about what could happen to Atlantis.\n"
+            builder.add_text('facts_header', f"KNOWN FACTS about the situation (sorted by WAGE - higher = more important, use indices 0-{len(facts_list)-1}):\n")
+            builder.add_items('facts', facts, priority=1)
+            builder.add_text('context_header', "\n\nADDITIONAL CONTEXT:\n")
+            builder.add_parts('context', text.split(CONTENT_SEPARATOR), priority=2)
+            builder.add_text('task', (
+                "\n\nBased on the facts above, GENERATE predictions about what could happen to Atlantis.\n"
                 "PRIORITIZE facts with higher wage values - they come from more reliable sources.\n"
                 "Think about: political consequences, economic impacts, security threats, opportunities.\n"
                 "For each prediction, reference the fact indices that support it.\n"
                 "Generate 3-5 diverse predictions covering different aspects.\n"
-                "RESPOND WITH ONLY A JSON ARRAY:\n"
-                "[{\"prediction\": \"specific future event or trend\", \"source_fact_ids\": [0, 2]}]"
-            )
-        return (
-            f"ZNANE FAKTY dotyczące sytuacji (posortowane wg WAGI - wyższa = ważniejsza, użyj indeksów 0-{len(facts_list)-1}):\n{facts_str}\n\n"
-            f"DODATKOWY KONTEKST:\n{text[:8000]}\n\n"
-            "Na podstawie faktów WYGENERUJ predykcje o tym co może się wydarzyć dla Atlantis.\n"
+                + (
+                    "RESPOND WITH A JSON OBJECT:\n"
+                    "{\"predictions\": [{\"prediction\": \"specific future event or trend\", \"source_fact_ids\": [0, 2]}]}"
+                    if structured else
+                    "RESPOND WITH ONLY A JSON ARRAY:\n"
+                    "[{\"prediction\": \"specific future event or trend\", \"source_fact_ids\": [0, 2]}]"
+                )
+            ))
+            return builder.build()
+
+        builder.add_text('facts_header', f"ZNANE FAKTY dotyczące sytuacji (posortowane wg WAGI - wyższa = ważniejsza, użyj indeksów 0-{len(facts_list)-1}):\n")
+        builder.add_items('facts', facts, priority=1)
+        builder.add_text('context_header', "\n\nDODATKOWY KONTEKST:\n")
+        builder.add_parts('context', text.split(CONTENT_SEPARATOR), priority=2)
+        builder.add_text('task', (
+            "\n\nNa podstawie faktów WYGENERUJ predykcje o tym co może się wydarzyć dla Atlantis.\n"
             "PRIORYTETYZUJ fakty o wyższej wadze - pochodzą z bardziej wiarygodnych źródeł.\n"
             "Pomyśl o: konsekwencjach politycznych, wpływie ekonomicznym, zagrożeniach, szansach.\n"
             "Dla każdej predykcji podaj indeksy faktów źródłowych.\n"
             "Wygeneruj 3-5 różnorodnych predykcji obejmujących różne aspekty.\n"
-            "ODPOWIEDZ TYLKO TABLICĄ JSON:\n"
-            "[{\"prediction\": \"konkretne przyszłe wydarzenie lub trend\", \"source_fact_ids\": [0, 2]}]"
-        )
+            + (
+                "ODPOWIEDZ OBIEKTEM JSON:\n"
+                "{\"predictions\": [{\"prediction\": \"konkretne przyszłe wydarzenie lub trend\", \"source_fact_ids\": [0, 2]}]}"
+                if structured else
+                "ODPOWIEDZ TYLKO TABLICĄ JSON:\n"
+                "[{\"prediction\": \"konkretne przyszłe wydarzenie lub trend\", \"source_fact_ids\": [0, 2]}]"
+            )
+        ))
+        return builder.build()
 
     def _repair_json(self, json_str: str) -> str:
         """Attempt to repair malformed JSON from LLM."""
@@ -329,6 +251,7 @@ class PredictionService:
         json_match = re.search(r'\[[\s\S]*\]', response_text)
         if not json_match:
             print(f"[PREDICTION_PARSING] No JSON array found in response", flush=True)
+            LLM_PARSE_RESULTS.inc(parser='sourced_predictions', outcome='empty')
             return []
 
         json_str = json_match.group()
@@ -337,22 +260,32 @@ class PredictionService:
         # Try direct parse first
         try:
             predictions_data = json.loads(json_str)
+            outcome = 'ok'
         except json.JSONDecodeError as e:
             print(f"[PREDICTION_PARSING] Initial JSON parse failed: {e}", flush=True)
             # Try repair
             repaired = self._repair_json(json_str)
             try:
                 predictions_data = json.loads(repaired)
+                outcome = 'repaired'
                 print(f"[PREDICTION_PARSING] Repaired JSON parsed successfully", flush=True)
             except json.JSONDecodeError as e2:
                 print(f"[PREDICTION_PARSING] Repair failed: {e2}", flush=True)
+                LLM_PARSE_RESULTS.inc(parser='sourced_predictions', outcome='fallback')
                 # Last resort: try to extract predictions manually
                 return self._extract_predictions_fallback(response_text, facts_list)
 
         if not isinstance(predictions_data, list):
             print(f"[PREDICTION_PARSING] Parsed JSON is not a list", flush=True)
+            LLM_PARSE_RESULTS.inc(parser='sourced_predictions', outcome='empty')
             return []
 
+        LLM_PARSE_RESULTS.inc(parser='sourced_predictions', outcome=outcome)
+
+        return self._resolve_sources(predictions_data, facts_list)
+
+    def _resolve_sources(self, predictions_data: List[Dict], facts_list: List[Dict]) -> List[Dict]:
+        """Map source_fact_ids to fact dicts, dropping invalid indices and short predictions."""
         results = []
         for item in predictions_data:
             if not isinstance(item, dict):
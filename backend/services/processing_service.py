@@ -1,5 +1,15 @@
 """Processing orchestrator - coordinates all processing services."""
-from typing import Dict
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Optional
+
+import httpx
+import psycopg2
+import requests
+
 from .job_service import JobService
 from .step_service import StepService
 from .scraper_service import ScraperService
@@ -9,29 +19,85 @@ from .content_converter_service import ContentConverterService
 from .prediction_service import PredictionService
 from .unknown_service import UnknownService
 from .report_generation_service import ReportGenerationService
+from .fused_extraction_service import FusedExtractionService
+from .link_refresh_service import LinkRefreshService
+from .prompt_budget import CONTENT_SEPARATOR
+from .llm_scheduler import current_context, llm_context
+from .instrumentation import mark_item, profile_step
+from .step_executor import PipelineStep, StepExecutor
 from repositories.node_repository import NodeRepository
+from tracing import current_span, span, use_span
+from repositories.report_section_repository import ReportSectionRepository
+from repositories.job_report_repository import JobReportRepository
+import config
+
+
+# Failures worth another attempt: the network (link fetches, LLM endpoints) or the database went away
+TRANSIENT_ERRORS = (
+    requests.ConnectionError, requests.Timeout, httpx.TransportError,
+    psycopg2.OperationalError, ConnectionError, TimeoutError
+)
+
+
+class JobRetry(Exception):
+    """An attempt failed with a transient error; the job is 'retrying' and should run again after `delay` seconds."""
+
+    def __init__(self, attempt: int, delay: int):
+        super().__init__(f"Attempt {attempt} failed, retry in {delay}s")
+        self.attempt = attempt
+        self.delay = delay
+
+
+@contextmanager
+def _first(results, limit: int):
+    """The first `limit` results; a streamed generator is closed afterwards, ending its LLM call."""
+    try:
+        yield islice(results, limit)
+    finally:
+        if hasattr(results, 'close'):
+            results.close()
 
 
 class ProcessingService:
     """Orchestrates the multi-step processing workflow."""
 
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, connection_factory=None):
         self.conn = db_connection
+        # Opens a new connection; lets independent pipeline steps run in parallel
+        self.connection_factory = connection_factory
         self.job_service = JobService(db_connection)
         self.step_service = StepService(db_connection)
         self.scraper_service = ScraperService(db_connection)
         self.fact_extraction_service = FactExtractionService()
         self.fact_storage_service = FactStorageService(db_connection)
         self.content_converter = ContentConverterService()
+        self.link_refresh_service = LinkRefreshService(db_connection, self.content_converter)
         self.prediction_service = PredictionService()
         self.unknown_service = UnknownService()
-        self.report_service = ReportGenerationService()
+        self.report_service = ReportGenerationService(ReportSectionRepository(db_connection), connection_factory)
+        self.fused_extraction_service = FusedExtractionService()
         self.node_repository = NodeRepository(db_connection)
+        self.job_report_repository = JobReportRepository(db_connection)
 
     # Delegate to JobService
     def create_job(self, items):
         return self.job_service.create_job(items)
 
+    def create_jobs_bulk(self, specs):
+        return self.job_service.create_jobs_bulk(specs)
+
+    def add_items(self, job_uuid, items):
+        """Add items to a job; its steps are reopened so the next run processes only the new items."""
+        added = self.job_service.add_items(job_uuid, items)
+        self.step_service.reopen_steps(job_uuid)
+        return added
+
+    def claim_job(self, job_uuid, force=False):
+        return self.job_service.claim_job(job_uuid, force)
+
+    def release_job(self, job_uuid, status):
+        return self.job_service.release_job(job_uuid, status)
+
     def get_job_status(self, job_uuid):
         return self.job_service.get_job_status(job_uuid)
 
@@ -41,12 +107,15 @@ class ProcessingService:
     def update_job_status(self, job_uuid, status, error_message=None):
         return self.job_service.update_job_status(job_uuid, status, error_message)
 
+    def get_processing_config(self, job_uuid):
+        return self.job_service.get_processing_config(job_uuid)
+
     def update_item_status(self, item_id, status, processed_content=None, error_message=None):
         return self.job_service.update_item_status(item_id, status, processed_content, error_message)
 
     # Delegate to StepService
-    def get_job_steps(self, job_uuid):
-        return self.step_service.get_job_steps(job_uuid)
+    def get_job_steps(self, job_uuid, full_metadata=True):
+        return self.step_service.get_job_steps(job_uuid, full_metadata)
 
     # Delegate to FactStorageService
     def get_extracted_facts(self, job_uuid, validated_only=False):
@@ -56,15 +125,40 @@ class ProcessingService:
         return self.fact_storage_service.validate_and_store_fact(fact_id, embedding)
 
     # Processing orchestration
+    def run_job(self, job_uuid: str, processing_config: Optional[Dict] = None) -> Optional[int]:
+        """Run one attempt of a job; returns the delay in seconds before retrying it, or None.
+
+        An attempt that fails with a transient error (TRANSIENT_ERRORS) before
+        JOB_MAX_ATTEMPTS leaves the job 'retrying' with the time of its next
+        attempt stored, which the scheduler loop picks up (resume does not).
+        Every attempt resumes the job: completed steps and items are skipped.
+        Without a configuration the one the job was last started with is used.
+        """
+        if processing_config is None:
+            processing_config = self.job_service.get_processing_config(job_uuid) or {}
+        try:
+            self.process_job(job_uuid, processing_config)
+        except JobRetry as e:
+            print(f"[JOB {job_uuid}] Attempt {e.attempt} failed ({e.__cause__}), retrying in {e.delay}s", flush=True)
+            return e.delay
+        return None
+
     def process_job(self, job_uuid: str, processing_config: Dict):
-        """Execute the processing workflow for a job."""
-        step_number = 1
+        """Execute the processing workflow for a job.
+
+        Steps (and, in extraction, items) completed by an earlier attempt are
+        skipped; a step that was interrupted is re-run after removing what it
+        had stored, so running a job again never duplicates its output.
+        """
         language = processing_config.get('language', 'en')
-        time_horizon = processing_config.get('time_horizon', '1 year')
+        time_horizons = self._time_horizons(processing_config)
+        extraction_mode = processing_config.get('extraction_mode', config.EXTRACTION_MODE)
 
         print(f"[JOB {job_uuid}] Starting processing with config: {processing_config}", flush=True)
 
+        attempt = 0
         try:
+            attempt = self.job_service.start_attempt(job_uuid, processing_config)
             self.job_service.update_job_status(job_uuid, 'processing')
             self.conn.commit()
 
@@ -73,59 +167,212 @@ class ProcessingService:
                 print(f"[JOB {job_uuid}] ERROR: Job not found", flush=True)
                 return
 
+            # Item summaries only; each step loads an item's content when it gets to it
             items = job_status['items']
-            print(f"[JOB {job_uuid}] Found {len(items)} items to process", flush=True)
+            print(f"[JOB {job_uuid}] Found {len(items)} items to process (attempt {attempt})", flush=True)
+
+            steps = {step['step_number']: step for step in self.step_service.get_job_steps(job_uuid)}
+
+            # Validation, prediction and unknown extraction only need the extracted facts and
+            # run in parallel when a connection factory gives each step its own connection
+            run = self._on_own_connection
+            pipeline = [
+                PipelineStep(1, 'fact extraction', lambda results: run(
+                    ProcessingService._run_extraction, job_uuid, items, language, extraction_mode, steps)),
+                PipelineStep(2, 'validation', lambda results: run(
+                    ProcessingService._run_validation, job_uuid, results[1], steps), depends_on=(1,)),
+                PipelineStep(3, 'prediction extraction', lambda results: run(
+                    ProcessingService._run_reasoning, job_uuid, 3, items, language, extraction_mode, steps),
+                    depends_on=(1,)),
+                PipelineStep(4, 'unknown extraction', lambda results: run(
+                    ProcessingService._run_reasoning, job_uuid, 4, items, language, extraction_mode, steps),
+                    depends_on=(1,)),
+                PipelineStep(5, 'report generation', lambda results: run(
+                    ProcessingService._run_report, job_uuid, language, time_horizons, steps),
+                    depends_on=(2, 3, 4)),
+            ]
+            workers = config.PIPELINE_STEP_WORKERS if self.connection_factory else 1
+            StepExecutor(pipeline, workers).run()
 
-            # Step 1: Fact Extraction
-            print(f"[JOB {job_uuid}] === STEP 1: FACT EXTRACTION ===", flush=True)
-            fact_ids = self._extract_facts(
-                job_uuid, items, language, step_number
-            )
+            self.job_service.update_job_status(job_uuid, 'completed')
             self.conn.commit()
-            print(f"[JOB {job_uuid}] STEP 1 COMPLETE: Extracted {len(fact_ids)} facts", flush=True)
-            step_number += 1
+            print(f"[JOB {job_uuid}] === JOB COMPLETED SUCCESSFULLY ===", flush=True)
 
-            # Step 2: Validation
-            print(f"[JOB {job_uuid}] === STEP 2: VALIDATION ===", flush=True)
-            self._validate_facts(job_uuid, fact_ids, step_number)
-            self.conn.commit()
-            print(f"[JOB {job_uuid}] STEP 2 COMPLETE: Validated {len(fact_ids)} facts", flush=True)
-            step_number += 1
-            
-            # Step 3: Prediction Extraction
-            print(f"[JOB {job_uuid}] === STEP 3: PREDICTION EXTRACTION ===", flush=True)
-            self._extract_predictions(job_uuid, items, language, step_number)
+        except Exception as e:
+            retry = isinstance(e, TRANSIENT_ERRORS) and attempt < config.JOB_MAX_ATTEMPTS
+            print(f"[JOB {job_uuid}] === JOB FAILED{' (will retry)' if retry else ''}: {str(e)} ===", flush=True)
+            self.conn.rollback()
+            if retry:
+                delay = config.JOB_RETRY_DELAY * 2 ** max(attempt - 1, 0)
+                self.job_service.schedule_retry(job_uuid, delay, str(e))
+                self.conn.commit()
+                raise JobRetry(attempt, delay) from e
+            self.job_service.update_job_status(job_uuid, 'failed', str(e))
             self.conn.commit()
-            print(f"[JOB {job_uuid}] STEP 3 COMPLETE: Predictions extracted", flush=True)
-            step_number += 1
+            raise
 
-            # Step 4: Unknown Extraction
-            print(f"[JOB {job_uuid}] === STEP 4: UNKNOWN EXTRACTION ===", flush=True)
-            self._extract_unknowns(job_uuid, items, language, step_number)
-            self.conn.commit()
-            print(f"[JOB {job_uuid}] STEP 4 COMPLETE: Unknowns extracted", flush=True)
-            step_number += 1
+    def _on_own_connection(self, step_method, *args):
+        """Run a step method on a service with its own connection, as steps may run in parallel."""
+        if self.connection_factory is None:
+            return step_method(self, *args)
+        conn = self.connection_factory()
+        try:
+            return step_method(ProcessingService(conn, self.connection_factory), *args)
+        finally:
+            conn.close()
 
-            # Step 5: Report Generation
-            print(f"[JOB {job_uuid}] === STEP 5: REPORT GENERATION ===", flush=True)
-            self._generate_report(job_uuid, language, step_number, time_horizon)
+    def _run_extraction(self, job_uuid: str, items: list, language: str, extraction_mode: str, steps: Dict) -> list:
+        """Step 1; returns the ids of the extracted facts."""
+        step_number = 1
+        print(f"[JOB {job_uuid}] === STEP 1: FACT EXTRACTION ({extraction_mode}) ===", flush=True)
+        if self._step_done(steps, step_number):
+            fact_ids = self.fact_storage_service.get_step_fact_ids(steps[step_number]['id'])
+        else:
+            with self._profiled_step(job_uuid, step_number):
+                if extraction_mode == 'fused':
+                    fact_ids = self._extract_fused(job_uuid, items, language, step_number, steps.get(step_number))
+                else:
+                    fact_ids = self._extract_facts(
+                        job_uuid, items, language, step_number, steps.get(step_number)
+                    )
             self.conn.commit()
-            print(f"[JOB {job_uuid}] STEP 5 COMPLETE: Report generated", flush=True)
-            step_number += 1
+        print(f"[JOB {job_uuid}] STEP 1 COMPLETE: Extracted {len(fact_ids)} facts", flush=True)
+        return fact_ids
 
-            self.job_service.update_job_status(job_uuid, 'completed')
+    def _run_validation(self, job_uuid: str, fact_ids: list, steps: Dict):
+        """Step 2 (already validated facts are skipped)."""
+        step_number = 2
+        print(f"[JOB {job_uuid}] === STEP 2: VALIDATION ===", flush=True)
+        if not self._step_done(steps, step_number):
+            with self._profiled_step(job_uuid, step_number):
+                self._validate_facts(job_uuid, fact_ids, step_number)
             self.conn.commit()
-            print(f"[JOB {job_uuid}] === JOB COMPLETED SUCCESSFULLY ===", flush=True)
+        print(f"[JOB {job_uuid}] STEP 2 COMPLETE: Validated {len(fact_ids)} facts", flush=True)
+
+    def _run_reasoning(self, job_uuid: str, step_number: int, items: list, language: str,
+                       extraction_mode: str, steps: Dict):
+        """Step 3 (predictions) or 4 (unknowns); covered by step 1 in fused mode.
+
+        Only items the step has not processed before are used (all of them on
+        the first run, the added ones after POST /api/jobs/<id>/items), so
+        nodes from earlier runs are kept. Re-running an interrupted batch first
+        drops the nodes it had stored; a step without any checkpoint (restarted
+        after a link source changed) drops all of its nodes and re-derives them.
+        """
+        task, sources, extract = {
+            3: ('prediction_extraction', ['prediction_extraction', 'prediction_extraction_fallback'],
+                self._extract_predictions),
+            4: ('unknown_extraction', ['unknown_extraction'], self._extract_unknowns),
+        }[step_number]
+        print(f"[JOB {job_uuid}] === STEP {step_number}: {task.replace('_', ' ').upper()} ===", flush=True)
+        if not self._step_done(steps, step_number):
+            previous_step = steps.get(step_number)
+            done_items = self._completed_items(previous_step)
+            new_items = [item for item in items if item['id'] not in done_items]
+            with self._profiled_step(job_uuid, step_number):
+                if extraction_mode == 'fused':
+                    self._skip_step(job_uuid, step_number, 'reasoning', task)
+                elif not new_items:
+                    self._skip_step(job_uuid, step_number, 'reasoning', task, 'no_new_items')
+                else:
+                    batch = hashlib.sha256(','.join(str(item['id']) for item in new_items).encode()).hexdigest()[:16]
+                    if previous_step:
+                        self.node_repository.delete_job_nodes(job_uuid, sources, batch=batch if done_items else None)
+                    extract(job_uuid, new_items, language, step_number, batch)
+            self.conn.commit()
+        print(f"[JOB {job_uuid}] STEP {step_number} COMPLETE: {task.replace('_', ' ').capitalize()} done", flush=True)
+
+    def _run_report(self, job_uuid: str, language: str, time_horizons: list, steps: Dict):
+        """Step 5 (reports are upserted, sections cached by input)."""
+        step_number = 5
+        print(f"[JOB {job_uuid}] === STEP 5: REPORT GENERATION ===", flush=True)
+        if not self._step_done(steps, step_number):
+            with self._profiled_step(job_uuid, step_number):
+                self._generate_report(job_uuid, language, step_number, time_horizons)
+            self.conn.commit()
+        print(f"[JOB {job_uuid}] STEP 5 COMPLETE: Reports generated for {time_horizons}", flush=True)
+
+    @staticmethod
+    def _step_done(steps: Dict, step_number: int) -> bool:
+        """Whether an earlier attempt completed (or skipped) the step."""
+        done = steps.get(step_number, {}).get('status') in ('completed', 'skipped')
+        if done:
+            print(f"[STEP {step_number}] Already completed in an earlier attempt, skipping", flush=True)
+        return done
+
+    @contextmanager
+    def _profiled_step(self, job_uuid: str, step_number: int):
+        """Profile and trace a step; the profile is stored in its metadata, also when the step fails."""
+        with span(f"step {step_number}", step_number=step_number), profile_step(step_number) as profile:
+            try:
+                yield profile
+            except Exception as e:
+                # The failed transaction must be rolled back before the step can be updated
+                self.conn.rollback()
+                try:
+                    self.step_service.fail_step(job_uuid, step_number, str(e))
+                except Exception as fail_error:
+                    print(f"[STEP {step_number}] Could not mark step failed: {fail_error}", flush=True)
+                    self.conn.rollback()
+                raise
+            finally:
+                profile.finish()
+                try:
+                    self.step_service.save_profile(job_uuid, step_number, profile.result)
+                except Exception as e:
+                    print(f"[PROFILE] Could not store profile of step {step_number}: {e}", flush=True)
+                    self.conn.rollback()
+        print(
+            f"[PROFILE] Step {step_number}: wall={profile.result['wall_ms']}ms llm={profile.result['llm_ms']}ms "
+            f"db={profile.result['db_ms']}ms conversion={profile.result['conversion_ms']}ms",
+            flush=True
+        )
 
+    def _load_item(self, item: Dict) -> Dict:
+        """The item summary with its content, loaded from the database for this item only."""
+        stored = self.job_service.get_item_content(item['id'])
+        if not stored:
+            raise ValueError(f"Item {item['id']} not found")
+        return dict(item, content=stored['content'], blob_hash=stored['blob_hash'])
+
+    def _prefetch_links(self, job_uuid: str, step_id: int, items: list):
+        """Fetch the links among items concurrently, before the items are converted one by one.
+
+        Recorded in scraped_data; links with a snapshot are not fetched. Links
+        that fail here are fetched again (or rendered) when converted.
+        """
+        if config.LINK_FETCH_MODE == 'browser':
+            return
+        link_ids = [item['id'] for item in items if item.get('type') == 'link']
+        urls = self.link_refresh_service.urls_to_fetch(job_uuid, link_ids) if link_ids else []
+        if not urls:
+            return
+        start = time.perf_counter()
+        try:
+            fetched = self.scraper_service.scrape_urls(job_uuid, step_id, urls)
         except Exception as e:
-            print(f"[JOB {job_uuid}] === JOB FAILED: {str(e)} ===", flush=True)
+            print(f"[JOB {job_uuid}] Prefetching {len(urls)} links failed, fetching them one by one: {e}", flush=True)
             self.conn.rollback()
-            self.job_service.update_job_status(job_uuid, 'failed', str(e))
-            self.conn.commit()
-            raise
-
-    def _extract_facts(self, job_uuid: str, items: list, language: str, step_number: int) -> list:
-        """Extract facts from content."""
+            return
+        self.content_converter.prefetch(fetched)
+        failed = sum(1 for result in fetched.values() if result['error'])
+        print(f"[JOB {job_uuid}] Prefetched {len(fetched)} links ({failed} failed) in "
+              f"{(time.perf_counter() - start) * 1000:.0f}ms", flush=True)
+
+    def _convert_item(self, item: Dict) -> list:
+        """Convert one item like convert_items_to_text; links use their snapshot instead of a new render."""
+        loaded = self._load_item(item)
+        if loaded['type'] == 'link':
+            return [self.link_refresh_service.convert_link(loaded)]
+        return self.content_converter.convert_items_to_text([loaded])
+
+    def _extract_facts(self, job_uuid: str, items: list, language: str, step_number: int,
+                       previous_step: Optional[Dict] = None) -> list:
+        """Extract facts from content.
+
+        `previous_step` is the step row of an interrupted earlier attempt: items
+        it completed are skipped, facts of the item it was working on are dropped.
+        """
         print(f"[STEP {step_number}] Starting fact extraction for {len(items)} items", flush=True)
         step_id = self.step_service.create_step(
             job_uuid, step_number, 'extraction',
@@ -138,36 +385,58 @@ class ProcessingService:
         fact_ids = []
         total_facts = 0
 
+        done_items = self._completed_items(previous_step)
+        self._prefetch_links(job_uuid, step_id, [item for item in items if item['id'] not in done_items])
         for idx, item in enumerate(items):
             item_id = item['id']
-            item_type = item.get('item_type', 'unknown')
+            if item_id in done_items:
+                print(f"[STEP {step_number}] Item {item_id} already extracted in an earlier attempt, skipping", flush=True)
+                continue
+            if previous_step:
+                self._discard_partial_item(job_uuid, step_id, item_id, ['fact_extraction'])
+            mark_item(item_id)
+            item_type = item['type']
             wage = item.get('wage')
             print(f"[STEP {step_number}] Processing item {idx+1}/{len(items)}: id={item_id}, type={item_type}", flush=True)
 
-            converted_items = self.content_converter.convert_items_to_text([item])
+            converted_items = self._convert_item(item)
             if not converted_items or not converted_items[0].get('conversion_success', True):
                 print(f"[STEP {step_number}] Item {item_id} conversion failed, skipping", flush=True)
                 continue
 
-            content = converted_items[0]['content'][:10000]
+            # The fact extraction prompt builder fits the content to the model's token budget
+            content = converted_items[0]['content']
             print(f"[STEP {step_number}] Item {item_id} content length: {len(content)} chars", flush=True)
 
-            facts = self.fact_extraction_service.extract_facts(content, language)
-            print(f"[STEP {step_number}] Item {item_id} extracted {len(facts)} facts", flush=True)
-            total_facts += len(facts)
-
-            for fact in facts[:20]:
-                fact_id = self.fact_storage_service.store_extracted_fact(
-                    job_uuid, step_id, fact, 'llm_extraction',
-                    content[:500], item_id, wage, 0.7, language
-                )
-                fact_ids.append(fact_id)
-                
-                # Store fact in nodes
-                self.node_repository.create_node(
-                    'fact', fact, job_uuid,
-                    {'source': 'fact_extraction', 'item_id': item_id, 'language': language}
-                )
+            if config.LLM_STREAMING:
+                # Facts are stored one by one while the LLM is still generating
+                facts = self.fact_extraction_service.stream_facts(content, language)
+            else:
+                facts = self.fact_extraction_service.extract_facts(content, language)
+
+            item_facts = 0
+            with _first(facts, 20) as first_facts:
+                for fact in first_facts:
+                    item_facts += 1
+                    fact_id = self.fact_storage_service.store_extracted_fact(
+                        job_uuid, step_id, fact, 'llm_extraction',
+                        content[:500], item_id, wage, 0.7, language
+                    )
+                    fact_ids.append(fact_id)
+
+                    # Store fact in nodes
+                    self.node_repository.create_node(
+                        'fact', fact, job_uuid,
+                        {'source': 'fact_extraction', 'item_id': item_id, 'language': language}
+                    )
+
+            print(f"[STEP {step_number}] Item {item_id} extracted {item_facts} facts", flush=True)
+            total_facts += item_facts
+            self.step_service.checkpoint_item(step_id, item_id)
+
+        if previous_step:
+            # Include the facts of items completed by the earlier attempt
+            fact_ids = self.fact_storage_service.get_step_fact_ids(step_id)
 
         self.step_service.update_step(
             step_id, 'completed',
@@ -177,6 +446,120 @@ class ProcessingService:
 
         return fact_ids
 
+    def _extract_fused(self, job_uuid: str, items: list, language: str, step_number: int,
+                       previous_step: Optional[Dict] = None) -> list:
+        """Extract facts, predictions and unknowns with one structured LLM call per chunk.
+
+        Resumes an interrupted earlier attempt like _extract_facts.
+        """
+        print(f"[STEP {step_number}] Starting fused extraction for {len(items)} items", flush=True)
+        step_id = self.step_service.create_step(
+            job_uuid, step_number, 'extraction',
+            {'item_count': len(items), 'mode': 'fused'},
+            {'language': language}
+        )
+
+        self.step_service.update_step(step_id, 'processing')
+
+        fact_ids = []
+        prediction_count = 0
+        unknown_count = 0
+        relation_count = 0
+
+        done_items = self._completed_items(previous_step)
+        self._prefetch_links(job_uuid, step_id, [item for item in items if item['id'] not in done_items])
+        for idx, item in enumerate(items):
+            item_id = item['id']
+            if item_id in done_items:
+                print(f"[STEP {step_number}] Item {item_id} already extracted in an earlier attempt, skipping", flush=True)
+                continue
+            if previous_step:
+                self._discard_partial_item(job_uuid, step_id, item_id, ['fused_extraction'])
+            mark_item(item_id)
+            wage = item.get('wage')
+            print(f"[STEP {step_number}] Processing item {idx+1}/{len(items)}: id={item_id}", flush=True)
+
+            converted_items = self._convert_item(item)
+            if not converted_items or not converted_items[0].get('conversion_success', True):
+                print(f"[STEP {step_number}] Item {item_id} conversion failed, skipping", flush=True)
+                continue
+
+            # Long content is split into FUSED_CHUNK_CHARS chunks, one fused extraction call each
+            content = converted_items[0]['content']
+            chunks = self.fused_extraction_service.chunk_text(content, config.FUSED_CHUNK_CHARS)
+
+            for chunk in chunks:
+                result = self.fused_extraction_service.extract(chunk, language)
+
+                # Fact indices returned by the LLM refer to the chunk-local facts list
+                fact_node_ids = {}
+                for fact_idx, fact in enumerate(result['facts'][:20]):
+                    if len(fact) <= 10:
+                        continue
+                    fact_id = self.fact_storage_service.store_extracted_fact(
+                        job_uuid, step_id, fact, 'llm_extraction',
+                        chunk[:500], item_id, wage, 0.7, language
+                    )
+                    fact_ids.append(fact_id)
+                    fact_node_ids[fact_idx] = self.node_repository.create_node(
+                        'fact', fact, job_uuid,
+                        {'source': 'fused_extraction', 'item_id': item_id, 'language': language}
+                    )
+
+                for pred in result['predictions'][:30]:
+                    source_node_ids = [fact_node_ids[i] for i in pred['source_fact_ids'] if i in fact_node_ids]
+                    pred_node_id = self.node_repository.create_node(
+                        'prediction', pred['prediction'], job_uuid,
+                        {'source': 'fused_extraction', 'item_id': item_id, 'language': language,
+                         'source_count': len(source_node_ids)}
+                    )
+                    prediction_count += 1
+                    for fact_node_id in source_node_ids:
+                        self.node_repository.create_relation(pred_node_id, fact_node_id, 'derived_from', 0.8)
+                        relation_count += 1
+
+                for unknown in result['unknowns'][:30]:
+                    self.node_repository.create_node(
+                        'missing_information', unknown, job_uuid,
+                        {'source': 'fused_extraction', 'item_id': item_id, 'language': language}
+                    )
+                    unknown_count += 1
+
+            self.step_service.checkpoint_item(step_id, item_id)
+
+        if previous_step:
+            fact_ids = self.fact_storage_service.get_step_fact_ids(step_id)
+
+        self.step_service.update_step(
+            step_id, 'completed',
+            {'facts_extracted': len(fact_ids), 'predictions_extracted': prediction_count,
+             'unknowns_extracted': unknown_count, 'relations_created': relation_count}
+        )
+        print(f"[STEP {step_number}] Completed fused extraction: {len(fact_ids)} facts, {prediction_count} predictions, "
+              f"{unknown_count} unknowns, {relation_count} relations", flush=True)
+
+        return fact_ids
+
+    @staticmethod
+    def _completed_items(previous_step: Optional[Dict]) -> set:
+        return set(((previous_step or {}).get('metadata') or {}).get('completed_items', []))
+
+    def _discard_partial_item(self, job_uuid: str, step_id: int, item_id: int, sources: list):
+        """Remove facts and nodes an interrupted attempt stored for an item it did not finish."""
+        self.fact_storage_service.delete_item_facts(step_id, item_id)
+        self.node_repository.delete_job_nodes(job_uuid, sources, item_id)
+
+    def _skip_step(self, job_uuid: str, step_number: int, step_type: str, task: str,
+                   reason: str = 'covered_by_fused_extraction'):
+        """Record a step that has nothing to do (e.g. fused extraction has already covered it)."""
+        step_id = self.step_service.create_step(
+            job_uuid, step_number, step_type,
+            {'task': task},
+            {'reason': reason}
+        )
+        self.step_service.update_step(step_id, 'skipped')
+        print(f"[STEP {step_number}] Skipped {task}: {reason.replace('_', ' ')}", flush=True)
+
     def _validate_facts(self, job_uuid: str, fact_ids: list, step_number: int):
         """Validate and store facts."""
         print(f"[STEP {step_number}] Starting validation for {len(fact_ids)} facts", flush=True)
@@ -197,8 +580,12 @@ class ProcessingService:
         )
         print(f"[STEP {step_number}] Completed validation: {len(fact_ids)} facts validated", flush=True)
 
-    def _extract_predictions(self, job_uuid: str, items: list, language: str, step_number: int):
-        """Extract predictions with context from extracted facts."""
+    def _extract_predictions(self, job_uuid: str, items: list, language: str, step_number: int,
+                             batch: Optional[str] = None):
+        """Extract predictions from the items' content, with all of the job's facts as context.
+
+        Nodes are tagged with `batch` (the set of items they were extracted from).
+        """
         print(f"[STEP {step_number}] Starting prediction extraction for {len(items)} items", flush=True)
         step_id = self.step_service.create_step(
             job_uuid, step_number, 'reasoning',
@@ -214,34 +601,43 @@ class ProcessingService:
         # Map by the fact text (node's 'value' field)
         fact_node_map = {f['value'][:100]: f for f in fact_nodes}
 
-        print(f"[STEP {step_number}] Using {len(facts_data[:30])} facts as context, {len(fact_nodes)} fact nodes available", flush=True)
+        print(f"[STEP {step_number}] Using {len(facts_data)} facts as context, {len(fact_nodes)} fact nodes available", flush=True)
 
         all_content = []
         for item in items:
-            converted_items = self.content_converter.convert_items_to_text([item])
+            mark_item(item['id'])
+            converted_items = self._convert_item(item)
             if converted_items and converted_items[0].get('conversion_success', True):
-                all_content.append(converted_items[0]['content'][:5000])
+                all_content.append(converted_items[0]['content'])
+        mark_item(None)
 
-        combined_content = "\n\n---\n\n".join(all_content)
+        combined_content = CONTENT_SEPARATOR.join(all_content)
 
         # Try to extract predictions with sources first
-        predictions_with_sources = self.prediction_service.extract_predictions_with_sources(
-            combined_content, language, facts_data[:30]
-        )
+        if config.LLM_STREAMING:
+            sourced = self.prediction_service.stream_predictions_with_sources(
+                combined_content, language, facts_data
+            )
+        else:
+            sourced = self.prediction_service.extract_predictions_with_sources(
+                combined_content, language, facts_data
+            )
 
         prediction_count = 0
         relation_count = 0
+        predictions_with_sources = []
 
-        if predictions_with_sources:
-            print(f"[STEP {step_number}] Got {len(predictions_with_sources)} predictions with sources", flush=True)
-            for pred_data in predictions_with_sources[:30]:
+        with _first(sourced, 30) as first_predictions:
+            for pred_data in first_predictions:
+                predictions_with_sources.append(pred_data)
                 pred_text = pred_data.get('prediction', '')
                 source_facts = pred_data.get('source_facts', [])
 
                 if pred_text and len(pred_text.strip()) > 10:
                     pred_node_id = self.node_repository.create_node(
                         'prediction', pred_text, job_uuid,
-                        {'source': 'prediction_extraction', 'language': language, 'source_count': len(source_facts)}
+                        {'source': 'prediction_extraction', 'language': language, 'source_count': len(source_facts),
+                         'batch': batch}
                     )
                     prediction_count += 1
 
@@ -256,12 +652,18 @@ class ProcessingService:
                             print(f"[RELATION] Created derived_from: prediction -> fact", flush=True)
                         else:
                             print(f"[RELATION] No matching fact node for: {fact_text[:50]}...", flush=True)
+
+        if predictions_with_sources:
+            print(f"[STEP {step_number}] Got {len(predictions_with_sources)} predictions with sources", flush=True)
+        elif config.LLM_STRUCTURED_OUTPUT:
+            # Schema-validated output is authoritative: an empty list is an answer, not a parse failure
+            print(f"[STEP {step_number}] Structured output returned no predictions, skipping fallback", flush=True)
         else:
             # Fallback: use old method and link all predictions to all facts
             print(f"[STEP {step_number}] Sourced extraction failed, using fallback method", flush=True)
             # Sort facts by wage (highest first) for fallback too
             sorted_facts = sorted(
-                facts_data[:30],
+                facts_data,
                 key=lambda f: f.get('wage') if f.get('wage') is not None else 0,
                 reverse=True
             )
@@ -277,7 +679,7 @@ class ProcessingService:
                     if pred and len(pred.strip()) > 10:
                         pred_node_id = self.node_repository.create_node(
                             'prediction', pred, job_uuid,
-                            {'source': 'prediction_extraction_fallback', 'language': language}
+                            {'source': 'prediction_extraction_fallback', 'language': language, 'batch': batch}
                         )
                         prediction_count += 1
 
@@ -291,6 +693,7 @@ class ProcessingService:
             else:
                 print(f"[STEP {step_number}] No predictions extracted from either method", flush=True)
 
+        self.step_service.checkpoint_items(step_id, [item['id'] for item in items])
         self.step_service.update_step(
             step_id, 'completed',
             {'predictions_extracted': prediction_count, 'relations_created': relation_count}
@@ -298,8 +701,9 @@ class ProcessingService:
         print(f"[STEP {step_number}] Completed prediction extraction: {prediction_count} predictions, {relation_count} relations created", flush=True)
         print(f"[STEP {step_number}] Prediction summary: LLM returned {len(predictions_with_sources)} predictions with sources", flush=True)
 
-    def _extract_unknowns(self, job_uuid: str, items: list, language: str, step_number: int):
-        """Extract unknowns with context from extracted facts."""
+    def _extract_unknowns(self, job_uuid: str, items: list, language: str, step_number: int,
+                          batch: Optional[str] = None):
+        """Extract unknowns from the items' content, with all of the job's facts as context."""
         print(f"[STEP {step_number}] Starting unknown extraction for {len(items)} items", flush=True)
         step_id = self.step_service.create_step(
             job_uuid, step_number, 'reasoning',
@@ -310,45 +714,66 @@ class ProcessingService:
         self.step_service.update_step(step_id, 'processing')
 
         facts_data = self.fact_storage_service.get_extracted_facts(job_uuid, validated_only=False)
-        facts_context = "\n".join([f"- {f['fact']}" for f in facts_data[:30]])
-        print(f"[STEP {step_number}] Using {len(facts_data[:30])} facts as context", flush=True)
+        facts_context = "\n".join([f"- {f['fact']}" for f in facts_data])
+        print(f"[STEP {step_number}] Using {len(facts_data)} facts as context", flush=True)
 
         all_content = []
         for item in items:
-            converted_items = self.content_converter.convert_items_to_text([item])
+            mark_item(item['id'])
+            converted_items = self._convert_item(item)
             if converted_items and converted_items[0].get('conversion_success', True):
-                all_content.append(converted_items[0]['content'][:5000])
+                all_content.append(converted_items[0]['content'])
+        mark_item(None)
 
-        combined_content = "\n\n---\n\n".join(all_content)
+        combined_content = CONTENT_SEPARATOR.join(all_content)
         print(f"[STEP {step_number}] Combined content length: {len(combined_content)} chars", flush=True)
 
-        unknowns = self.unknown_service.extract_unknowns(combined_content, language, facts_context)
-        print(f"[STEP {step_number}] LLM returned {len(unknowns) if unknowns else 0} unknowns", flush=True)
-
-        if not unknowns:
-            print(f"[STEP {step_number}] No unknowns extracted, skipping node creation", flush=True)
+        if config.LLM_STREAMING:
+            unknowns = self.unknown_service.stream_unknowns(combined_content, language, facts_context)
+        else:
+            unknowns = self.unknown_service.extract_unknowns(combined_content, language, facts_context)
+            print(f"[STEP {step_number}] LLM returned {len(unknowns) if unknowns else 0} unknowns", flush=True)
 
         unknown_count = 0
-        for unknown in unknowns[:30]:
-            if unknown and len(unknown.strip()) > 10:
-                self.node_repository.create_node(
-                    'missing_information', unknown, job_uuid,
-                    {'source': 'unknown_extraction', 'language': language}
-                )
-                unknown_count += 1
+        with _first(unknowns or [], 30) as first_unknowns:
+            for unknown in first_unknowns:
+                if unknown and len(unknown.strip()) > 10:
+                    self.node_repository.create_node(
+                        'missing_information', unknown, job_uuid,
+                        {'source': 'unknown_extraction', 'language': language, 'batch': batch}
+                    )
+                    unknown_count += 1
 
+        if not unknown_count:
+            print(f"[STEP {step_number}] No unknowns extracted", flush=True)
+
+        self.step_service.checkpoint_items(step_id, [item['id'] for item in items])
         self.step_service.update_step(
             step_id, 'completed',
             {'unknowns_extracted': unknown_count}
         )
         print(f"[STEP {step_number}] Completed unknown extraction: {unknown_count} unknowns stored", flush=True)
 
-    def _generate_report(self, job_uuid: str, language: str, step_number: int, time_horizon: str = '1 year'):
-        """Generate final analytical report."""
-        print(f"[STEP {step_number}] Starting report generation (time_horizon: {time_horizon})", flush=True)
+    @staticmethod
+    def _time_horizons(processing_config: Dict) -> list:
+        """Horizons to report on: `time_horizons` (list) or the single `time_horizon`."""
+        horizons = processing_config.get('time_horizons') or [processing_config.get('time_horizon', '1 year')]
+        if isinstance(horizons, str):
+            horizons = [horizons]
+        return list(dict.fromkeys(horizons))
+
+    def _generate_report(self, job_uuid: str, language: str, step_number: int, time_horizons: list):
+        """Generate the final analytical report for each time horizon.
+
+        Nodes and relations are loaded once and shared; the per-horizon reports
+        are generated in parallel (each on its own connection) and stored in
+        job_reports. The first horizon
+        is also saved on the job as its default report.
+        """
+        print(f"[STEP {step_number}] Starting report generation (time_horizons: {time_horizons})", flush=True)
         step_id = self.step_service.create_step(
             job_uuid, step_number, 'report_generation',
-            {'task': 'final_report', 'time_horizon': time_horizon},
+            {'task': 'final_report', 'time_horizons': time_horizons},
             {'language': language}
         )
 
@@ -368,18 +793,43 @@ class ProcessingService:
                     all_relations.append(rel)
                     seen.add(str(rel['id']))
 
-        print(f"[STEP {step_number}] Generating report with {len(facts)} facts, {len(predictions)} predictions, {len(unknowns)} unknowns, {len(all_relations)} relations", flush=True)
+        print(f"[STEP {step_number}] Generating {len(time_horizons)} report(s) with {len(facts)} facts, {len(predictions)} predictions, {len(unknowns)} unknowns, {len(all_relations)} relations", flush=True)
+
+        # Worker threads do not inherit the scheduler's thread-local job/priority or the trace
+        ctx = current_context()
+        parent = current_span()
 
-        report = self.report_service.generate_report(facts, predictions, unknowns, all_relations, language, time_horizon)
+        def generate(time_horizon):
+            with llm_context(**ctx), use_span(parent), \
+                    span('report', time_horizon=time_horizon, language=language):
+                if self.connection_factory is None:
+                    return self.report_service.generate_report(
+                        facts, predictions, unknowns, all_relations, language, time_horizon, job_uuid=job_uuid
+                    )
+                # The section cache is read and written per horizon, so each gets its own connection
+                conn = self.connection_factory()
+                try:
+                    return ReportGenerationService(ReportSectionRepository(conn), self.connection_factory).generate_report(
+                        facts, predictions, unknowns, all_relations, language, time_horizon, job_uuid=job_uuid
+                    )
+                finally:
+                    conn.close()
 
-        # Save report directly to the job table
+        # Without a connection factory all horizons share self.conn and run one after another
+        workers = config.REPORT_HORIZON_WORKERS if self.connection_factory else 1
+        with ThreadPoolExecutor(max_workers=min(len(time_horizons), workers)) as pool:
+            reports = list(pool.map(generate, time_horizons))
+
+        for time_horizon, report in zip(time_horizons, reports):
+            self.job_report_repository.save_report(job_uuid, time_horizon, language, report)
+
+        # Save the first horizon to the job table as well (default report of the job)
         from repositories.job_repository import JobRepository
         job_repo = JobRepository(self.conn)
-        job_repo.save_report(job_uuid, report)
+        job_repo.save_report(job_uuid, reports[0])
 
         self.step_service.update_step(
             step_id, 'completed',
-            {'report_generated': True}
+            {'report_generated': True, 'time_horizons': time_horizons}
         )
-        print(f"[STEP {step_number}] Report generated and saved to job", flush=True)
-
+        print(f"[STEP {step_number}] Reports generated and saved for {time_horizons}", flush=True)
@@ -0,0 +1,252 @@
+"""Token-budget-aware prompt assembly.
+
+Prompts are built from sections with priorities. The builder counts tokens
+with the tokenizer of the model the call will be routed to and packs
+sections (and list items within a section) in priority order until the
+model's context budget is used up, instead of slicing by characters.
+
+Models are mapped to a Hugging Face tokenizer: the default models
+(OLLAMA_MODEL, the Cloudflare models) through DEFAULT_TOKENIZERS, others
+through LLM_TOKENIZERS (a `tokenizer.json` path or tokenizer id). Only a
+model without a tokenizer, or whose tokenizer cannot be loaded (e.g. no
+network to download it), falls back to a conservative chars-per-token
+estimate.
+"""
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import config
+from .llm_router import get_router
+from .prompts import static_prefix
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:  # optional dependency
+    Tokenizer = None
+
+# Tokenizers of the model families in use, by model name prefix; all sizes of a family share
+# one tokenizer, so an ungated small repository is enough (only its tokenizer.json is downloaded)
+DEFAULT_TOKENIZERS = {
+    'qwen3': 'Qwen/Qwen3-8B',
+    'llama3.1': 'unsloth/Meta-Llama-3.1-8B-Instruct',
+    '@cf/meta/llama-3.1-': 'unsloth/Meta-Llama-3.1-8B-Instruct',
+}
+# Conservative for Polish text, which tokenizes denser than English
+CHARS_PER_TOKEN = 3.5
+# Tokens reserved for chat template / role markers added by the server
+TEMPLATE_OVERHEAD_TOKENS = 64
+# Separator between the contents of several items in one prompt
+CONTENT_SEPARATOR = "\n\n---\n\n"
+
+
+class TokenCounter:
+    """Counts and truncates text in model tokens."""
+
+    def __init__(self, tokenizer=None, name: str = 'estimate'):
+        self.tokenizer = tokenizer
+        self.name = name
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+        return int(len(text) / CHARS_PER_TOKEN) + 1
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Return the longest prefix of text that fits in max_tokens."""
+        if max_tokens <= 0:
+            return ''
+        # Never tokenize far more than could fit
+        text = text[:int(max_tokens * CHARS_PER_TOKEN * 3)]
+        if self.tokenizer is None:
+            return text[:int(max_tokens * CHARS_PER_TOKEN)]
+        encoding = self.tokenizer.encode(text, add_special_tokens=False)
+        if len(encoding.ids) <= max_tokens:
+            return text
+        return text[:encoding.offsets[max_tokens - 1][1]]
+
+
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model: str) -> TokenCounter:
+    """Return the token counter for a model, loading its tokenizer once."""
+    with _counters_lock:
+        if model in _counters:
+            return _counters[model]
+
+        counter = TokenCounter()
+        source = tokenizer_source(model)
+        if source and Tokenizer is not None:
+            try:
+                tokenizer = Tokenizer.from_file(source) if os.path.exists(source) else Tokenizer.from_pretrained(source)
+                counter = TokenCounter(tokenizer, source)
+            except Exception as e:
+                print(f"[PROMPT_BUDGET] Could not load tokenizer {source} for {model}, estimating: {e}", flush=True)
+        elif source:
+            print(f"[PROMPT_BUDGET] 'tokenizers' not installed, estimating tokens for {model}", flush=True)
+        else:
+            print(f"[PROMPT_BUDGET] No tokenizer known for {model} (see LLM_TOKENIZERS), estimating tokens", flush=True)
+
+        _counters[model] = counter
+        return counter
+
+
+def tokenizer_source(model: str) -> Optional[str]:
+    """The configured tokenizer of a model, else the default one of its family."""
+    configured = json.loads(config.LLM_TOKENIZERS or '{}').get(model)
+    if configured:
+        return configured
+    prefixes = [prefix for prefix in DEFAULT_TOKENIZERS if model.startswith(prefix)]
+    return DEFAULT_TOKENIZERS[max(prefixes, key=len)] if prefixes else None
+
+
+def context_window(model: str) -> int:
+    return int(json.loads(config.LLM_CONTEXT_WINDOWS or '{}').get(model, config.LLM_CONTEXT_TOKENS))
+
+
+def routed_model(language: str) -> Dict:
+    """Model and smallest context window among the endpoints a call may be routed to."""
+    candidates = get_router().candidates(language)
+    models = [e.model_for(language) for e in candidates]
+    return {'model': models[0], 'context_window': min(context_window(m) for m in models)}
+
+
+class _Section:
+    def __init__(self, name: str, priority: int, text: str = '', header: str = '',
+                 items: Optional[List[str]] = None, parts: Optional[List[str]] = None, separator: str = '\n'):
+        self.name = name
+        self.priority = priority
+        self.text = text
+        self.header = header
+        self.items = items
+        self.parts = parts
+        self.separator = separator
+        self.rendered = ''
+        self.tokens = 0
+        self.items_used = 0
+
+
+class PromptBuilder:
+    """Packs prompt sections into the context budget of the routed model.
+
+    Sections are rendered in the order they were added; budget is handed out
+    by priority (0 = always included, higher numbers are dropped or trimmed
+    first). Text sections are truncated to what is left, list sections keep
+    as many leading items as fit.
+    """
+
+    def __init__(self, service: str, language: str, max_output_tokens: int = 1024):
+        self.service = service
+        self.language = language
+        routed = routed_model(language)
+        self.model = routed['model']
+        self.context_window = routed['context_window']
+        self.counter = get_token_counter(self.model)
+        self.max_output_tokens = max_output_tokens
+        self.sections: List[_Section] = []
+        self.stats: Dict = {}
+
+    def add_text(self, name: str, text: str, priority: int = 0) -> 'PromptBuilder':
+        self.sections.append(_Section(name, priority, text=text))
+        return self
+
+    def add_items(self, name: str, items: List[str], priority: int = 1, header: str = '',
+                  separator: str = '\n') -> 'PromptBuilder':
+        self.sections.append(_Section(name, priority, header=header, items=list(items), separator=separator))
+        return self
+
+    def add_parts(self, name: str, parts: List[str], priority: int = 1,
+                  separator: str = CONTENT_SEPARATOR) -> 'PromptBuilder':
+        """Several texts (e.g. one per item) sharing a section's budget fairly; each is truncated to its share."""
+        self.sections.append(_Section(name, priority, parts=[p for p in parts if p], separator=separator))
+        return self
+
+    def budget(self) -> int:
+        """Tokens left for the sections; ValueError when the prefix and output reserve alone exceed the context."""
+        prefix_tokens = self.counter.count(static_prefix(self.language))
+        budget = self.context_window - prefix_tokens - self.max_output_tokens - TEMPLATE_OVERHEAD_TOKENS
+        if budget <= 0:
+            raise ValueError(
+                f"{self.service}: context window of {self.model} ({self.context_window} tokens) has no room for a "
+                f"prompt after the {prefix_tokens}-token prefix and {self.max_output_tokens} output tokens"
+            )
+        return budget
+
+    def build(self) -> str:
+        budget = self.budget()
+        remaining = budget
+
+        for section in sorted(self.sections, key=lambda s: s.priority):
+            if section.parts is not None:
+                section.rendered = self._fit_parts(section, remaining)
+                section.tokens = self.counter.count(section.rendered)
+            elif section.items is None:
+                section.rendered = self._fit_text(section.text, remaining)
+                section.tokens = self.counter.count(section.rendered)
+            else:
+                header_tokens = self.counter.count(section.header)
+                if section.items and header_tokens < remaining:
+                    used = header_tokens
+                    kept = []
+                    for item in section.items:
+                        item_tokens = self.counter.count(item + section.separator)
+                        if used + item_tokens > remaining:
+                            break
+                        kept.append(item)
+                        used += item_tokens
+                    section.rendered = section.header + section.separator.join(kept) if kept else ''
+                    section.tokens = used if kept else 0
+                    section.items_used = len(kept)
+            remaining -= section.tokens
+
+        prompt = ''.join(s.rendered for s in self.sections)
+        self.stats = {
+            'model': self.model,
+            'tokenizer': self.counter.name,
+            'context_window': self.context_window,
+            'budget': budget,
+            'used': budget - remaining,
+            'sections': {s.name: self._section_stats(s) for s in self.sections}
+        }
+        details = ' '.join(
+            f"{name}={info['tokens']}" + (f"({info['items']})" if 'items' in info else '(truncated)' if info['truncated'] else '')
+            for name, info in self.stats['sections'].items()
+        )
+        print(
+            f"[PROMPT_BUDGET] service={self.service} model={self.model} tokenizer={self.counter.name} "
+            f"used={self.stats['used']}/{budget} {details}",
+            flush=True
+        )
+        return prompt
+
+    @staticmethod
+    def _section_stats(section: _Section) -> Dict:
+        if section.items is not None:
+            return {'tokens': section.tokens, 'items': f"{section.items_used}/{len(section.items)}"}
+        full = section.separator.join(section.parts) if section.parts is not None else section.text
+        return {'tokens': section.tokens, 'truncated': section.rendered != full}
+
+    def _fit_text(self, text: str, max_tokens: int) -> str:
+        # Skip counting texts that obviously cannot fit
+        if len(text) <= max_tokens * CHARS_PER_TOKEN * 3 and self.counter.count(text) <= max_tokens:
+            return text
+        return self.counter.truncate(text, max_tokens)
+
+    def _fit_parts(self, section: _Section, max_tokens: int) -> str:
+        """Give each part an equal share; budget unused by short parts goes to the longer ones."""
+        parts = section.parts
+        if not parts:
+            return ''
+        available = max_tokens - self.counter.count(section.separator) * (len(parts) - 1)
+        sizes = {i: self.counter.count(p[:int(available * CHARS_PER_TOKEN * 3) + 1]) for i, p in enumerate(parts)}
+        fitted = {}
+        for left, i in enumerate(sorted(sizes, key=sizes.get)):
+            share = max(0, available // (len(parts) - left))
+            fitted[i] = parts[i] if sizes[i] <= share else self.counter.truncate(parts[i], share)
+            available -= min(sizes[i], share)
+        return section.separator.join(fitted[i] for i in range(len(parts)) if fitted[i])
@@ -0,0 +1,38 @@
+"""Shared prompt prefix for all LLM services.
+
+Every prompt starts with the same static prefix (analyst role + Atlantis context)
+so that the provider can reuse the prefilled KV cache across calls. Keep this
+text byte-identical: any per-call data must go after it.
+"""
+
+
+ATLANTIS_CONTEXT = """
+Nazwa państwa: Atlantis
+Istotne cechy położenia geograficznego: dostęp do Morza Bałtyckiego, kilka dużych żeglownych rzek, ograniczone zasoby wody pitnej
+Liczba ludności: 28 mln
+Klimat: umiarkowany
+Silne strony gospodarki: przemysł ciężki, motoryzacyjny, spożywczy, chemiczny, ICT, ambicje odgrywania istotnej roli w zakresie OZE, przetwarzania surowców krytycznych oraz budowy ponadnarodowej infrastruktury AI (m.in. big data centers, giga fabryki AI, komputery kwantowe)
+Liczebność armii: 150 tys. zawodowych żołnierzy
+Stopnień cyfryzacji społeczeństwa: powyżej średniej europejskiej
+Waluta: inna niż euro
+Kluczowe relacje dwustronne: Niemcy, Francja, Finlandia, Ukraina, USA, Japonia
+Potencjalne zagrożenia polityczne i gospodarcze: niestabilność w UE, rozpad UE na grupy „różnych prędkości" pod względem tempa rozwoju oraz zainteresowania głębszą integracją; negatywna kampania wizerunkowa ze strony kilku aktorów państwowych wymierzona przeciw rządowi lub społeczeństwu Atlantis; zakłócenia w dostawach paliw węglowodorowych z USA, Skandynawii, Zatoki Perskiej (wynikające z potencjalnych zmian w polityce wewnętrznej krajów eksporterów lub problemów w transporcie, np. ataki Hutich na gazowce na Morzu Czerwonym); narażenie na spowolnienie rozwoju sektora ICT z powodu embarga na wysokozaawansowane procesory
+Potencjalne zagrożenie militarne: zagrożenie atakiem zbrojnym jednego z sąsiadów; trwające od wielu lat ataki hybrydowe co najmniej jednego sąsiada, w tym w obszarze infrastruktury krytycznej i cyberprzestrzeni
+Kamienie milowe w rozwoju politycznym i gospodarczym: demokracja parlamentarna od 130 lat; okres stagnacji gospodarczej w latach 1930-1950 oraz 1980-1990; członkostwo w UE i NATO od roku 1997; 25. gospodarka świata wg PKB
+"""
+
+_STATIC_PREFIXES = {
+    'en': (
+        "You are an expert strategic analyst for the hypothetical country Atlantis.\n\n"
+        f"ATLANTIS CONTEXT:\n{ATLANTIS_CONTEXT}"
+    ),
+    'pl': (
+        "Jesteś ekspertem analitykiem strategicznym dla hipotetycznego państwa Atlantis.\n\n"
+        f"KONTEKST ATLANTIS:\n{ATLANTIS_CONTEXT}"
+    ),
+}
+
+
+def static_prefix(language: str) -> str:
+    """Return the cacheable prompt prefix for a language."""
+    return _STATIC_PREFIXES['en' if language == 'en' else 'pl']
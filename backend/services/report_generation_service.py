@@ -1,59 +1,98 @@
 """Report generation service - creates final analysis report."""
-import requests
+import hashlib
 import json
-from typing import List, Dict
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
 import config
-from .prediction_service import ATLANTIS_CONTEXT
+from .llm_client import LLMClient
+from .llm_scheduler import current_context, llm_context
+from .llm_schemas import REPORT_SCHEMA, REPORT_SECTION_SCHEMAS
+from .metrics import LLM_PARSE_RESULTS
+from .prompt_budget import PromptBuilder
+from .single_flight import SingleFlight
+from repositories.report_section_repository import ReportSectionRepository
+from tracing import current_span, span, use_span
+
+# Sections being generated, keyed by input hash (shared by concurrent report requests)
+_section_flights = SingleFlight('report_section')
+
+REPORT_SECTIONS = ('summary', 'positive_scenario', 'negative_scenario', 'recommendations')
+
+# Node groups each section is written from; a section is only regenerated when these change
+SECTION_INPUTS = {
+    'summary': ('facts', 'predictions', 'unknowns'),
+    'positive_scenario': ('facts', 'predictions', 'relations'),
+    'negative_scenario': ('facts', 'predictions', 'unknowns', 'relations'),
+    'recommendations': ('facts', 'predictions', 'unknowns'),
+}
+
+# Bump when section prompts change so cached sections are regenerated
+SECTION_PROMPT_VERSION = 1
+
+DATA_LABELS = {
+    'pl': {'facts': "ZEBRANE FAKTY:", 'predictions': "PREDYKCJE/PROGNOZY:",
+           'unknowns': "BRAKUJĄCE INFORMACJE:", 'relations': "POWIĄZANIA MIĘDZY ELEMENTAMI:"},
+    'en': {'facts': "COLLECTED FACTS:", 'predictions': "PREDICTIONS/FORECASTS:",
+           'unknowns': "MISSING INFORMATION:", 'relations': "RELATIONSHIPS:"},
+}
+
+# Packing priority of each data group when the prompt exceeds the token budget
+DATA_PRIORITIES = {'facts': 1, 'predictions': 1, 'unknowns': 2, 'relations': 3}
 
 
 class ReportGenerationService:
-    """Generates structured JSON report."""
+    """Generates structured JSON report.
+
+    With a section repository and a job, the report is built from independently
+    cached sections (see `_generate_sectioned`); otherwise one prompt produces
+    the whole report. With a `connection_factory`, each section is stored by
+    the worker that generated it on a connection of its own, which lets
+    identical sections be coalesced across gunicorn workers.
+    """
+
+    def __init__(self, section_repository=None, connection_factory=None):
+        self.llm_client = LLMClient('report_generation')
+        self.section_repository = section_repository
+        self.connection_factory = connection_factory
 
     def generate_report(self, facts: List[Dict], predictions: List[Dict],
                         unknowns: List[Dict], relations: List[Dict],
-                        language: str = 'pl', time_horizon: str = '1 year') -> Dict:
+                        language: str = 'pl', time_horizon: str = '1 year',
+                        job_uuid: Optional[str] = None) -> Dict:
         """Generate complete analysis report as structured JSON."""
         print(f"[REPORT] Generating report with {len(facts)} facts, {len(predictions)} predictions, {len(unknowns)} unknowns, time_horizon: {time_horizon}", flush=True)
 
-        if config.LLM_PROVIDER == 'cloudflare':
-            return self._generate_with_cloudflare(facts, predictions, unknowns, relations, language, time_horizon)
-        else:
-            return self._generate_with_ollama(facts, predictions, unknowns, relations, language, time_horizon)
+        if job_uuid and self.section_repository is not None and config.REPORT_SECTIONS:
+            return self._generate_sectioned(job_uuid, facts, predictions, unknowns, relations, language, time_horizon)
+
+        if config.LLM_STRUCTURED_OUTPUT:
+            return self._generate_structured(facts, predictions, unknowns, relations, language, time_horizon)
+
+        prompt = self._build_full_prompt(facts, predictions, unknowns, relations, language, time_horizon)
+        print(f"[REPORT] Calling {config.LLM_PROVIDER} for report generation", flush=True)
+        raw = self.llm_client.generate(prompt, language, timeout=300, max_tokens=4096)
+        if raw is None:
+            return self._fallback_response(facts, predictions, unknowns, relations)
+
+        print(f"[REPORT] Got response of {len(raw)} chars", flush=True)
+        return self._parse_json_response(raw, facts, predictions, unknowns, relations)
 
     def _build_full_prompt(self, facts: List[Dict], predictions: List[Dict],
                            unknowns: List[Dict], relations: List[Dict],
                            language: str, time_horizon: str = '1 year') -> str:
-        facts_str = "\n".join([f"- {f.get('fact', f.get('value', ''))}" for f in facts[:50]])
-        predictions_str = "\n".join([f"- {p.get('value', p.get('prediction', ''))}" for p in predictions[:30]])
-        unknowns_str = "\n".join([f"- {u.get('value', u.get('unknown', ''))}" for u in unknowns[:20]])
+        """Build the report prompt, packing nodes into the token budget.
 
-        relations_str = ""
-        for r in relations[:30]:
-            rel_type = r.get('relation_type', 'related')
-            from_val = str(r.get('from_value', ''))[:50]
-            to_val = str(r.get('to_value', ''))[:50]
-            relations_str += f"- [{rel_type}] {from_val}... -> {to_val}...\n"
+        Facts and predictions are packed first, then unknowns, then relations.
+        """
+        data = self._data_lines(facts, predictions, unknowns, relations)
 
         if language == 'pl':
-            return f"""KONTEKST ATLANTIS:
-{ATLANTIS_CONTEXT}
-
-HORYZONT CZASOWY ANALIZY: {time_horizon}
+            head = f"""HORYZONT CZASOWY ANALIZY: {time_horizon}
 WAŻNE: Wszystkie scenariusze i rekomendacje MUSZĄ być opracowane z uwzględnieniem tego horyzontu czasowego. Rozważ co może się wydarzyć w ciągu {time_horizon}.
 
-ZEBRANE FAKTY:
-{facts_str}
-
-PREDYKCJE/PROGNOZY:
-{predictions_str}
-
-BRAKUJĄCE INFORMACJE:
-{unknowns_str}
-
-POWIĄZANIA MIĘDZY ELEMENTAMI:
-{relations_str}
-
-Na podstawie powyższych danych wygeneruj raport analityczny w formacie JSON z następującą strukturą:
+"""
+            tail = f"""Na podstawie powyższych danych wygeneruj raport analityczny w formacie JSON z następującą strukturą:
 {{
   "time_horizon": "{time_horizon}",
   "summary": "Streszczenie danych (max 150 słów) - przejrzyste, user-friendly",
@@ -75,25 +114,11 @@ WAŻNE:
 - Podaj KTO konkretnie powinien działać, CO dokładnie zrobić, KIEDY
 - Odpowiedz TYLKO poprawnym JSON-em, bez żadnego dodatkowego tekstu."""
         else:
-            return f"""ATLANTIS CONTEXT:
-{ATLANTIS_CONTEXT}
-
-TIME HORIZON FOR ANALYSIS: {time_horizon}
+            head = f"""TIME HORIZON FOR ANALYSIS: {time_horizon}
 IMPORTANT: All scenarios and recommendations MUST be developed considering this time horizon. Consider what could happen within {time_horizon}.
 
-COLLECTED FACTS:
-{facts_str}
-
-PREDICTIONS/FORECASTS:
-{predictions_str}
-
-MISSING INFORMATION:
-{unknowns_str}
-
-RELATIONSHIPS:
-{relations_str}
-
-Based on the above data, generate an analytical report in JSON format with this structure:
+"""
+            tail = f"""Based on the above data, generate an analytical report in JSON format with this structure:
 {{
   "time_horizon": "{time_horizon}",
   "summary": "Data summary (max 150 words) - clear, user-friendly",
@@ -115,79 +140,232 @@ IMPORTANT:
 - Specify WHO exactly should act, WHAT exactly to do, WHEN
 - Reply with ONLY valid JSON, no additional text."""
 
-    def _generate_with_cloudflare(self, facts: List[Dict], predictions: List[Dict],
-                                   unknowns: List[Dict], relations: List[Dict],
-                                   language: str, time_horizon: str = '1 year') -> Dict:
-        if not config.CLOUDFLARE_ACCOUNT_ID or not config.CLOUDFLARE_API_TOKEN:
-            return {'error': 'Cloudflare not configured'}
-
-        model = config.CLOUDFLARE_MODEL_PL if language == 'pl' else config.CLOUDFLARE_MODEL_EN
-        url = f"https://api.cloudflare.com/client/v4/accounts/{config.CLOUDFLARE_ACCOUNT_ID}/ai/run/{model}"
-
-        headers = {
-            "Authorization": f"Bearer {config.CLOUDFLARE_API_TOKEN}",
-            "Content-Type": "application/json"
-        }
-
-        prompt = self._build_full_prompt(facts, predictions, unknowns, relations, language, time_horizon)
+        builder = PromptBuilder('report_generation', language, max_output_tokens=4096)
+        builder.add_text('head', head)
+        self._add_data(builder, language, data, ('facts', 'predictions', 'unknowns', 'relations'))
+        builder.add_text('tail', f"\n\n{tail}")
+        return builder.build()
 
-        payload = {
-            "messages": [
-                {"role": "system", "content": "You are a strategic analyst. Output only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": 4096
+    def _data_lines(self, facts: List[Dict], predictions: List[Dict],
+                    unknowns: List[Dict], relations: List[Dict]) -> Dict[str, List[str]]:
+        return {
+            'facts': [f"- {f.get('fact', f.get('value', ''))}" for f in facts],
+            'predictions': [f"- {p.get('value', p.get('prediction', ''))}" for p in predictions],
+            'unknowns': [f"- {u.get('value', u.get('unknown', ''))}" for u in unknowns],
+            'relations': [
+                f"- [{r.get('relation_type', 'related')}] {r.get('from_value', '')} -> {r.get('to_value', '')}"
+                for r in relations
+            ]
         }
 
-        print(f"[REPORT] Calling Cloudflare model: {model}", flush=True)
-
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=180)
-            print(f"[REPORT] Cloudflare response status: {response.status_code}", flush=True)
-            if response.status_code != 200:
-                print(f"[REPORT] Cloudflare error: {response.text[:500]}", flush=True)
-            response.raise_for_status()
-            result = response.json()
-            if result.get("success"):
-                raw = result["result"]["response"]
-                print(f"[REPORT] Got response of {len(raw)} chars", flush=True)
-                return self._parse_json_response(raw, facts, predictions, unknowns, relations)
+    def _add_data(self, builder: PromptBuilder, language: str, data: Dict[str, List[str]], groups: tuple):
+        """Add labelled node lists; the first label has no leading blank line."""
+        labels = DATA_LABELS['pl' if language == 'pl' else 'en']
+        for i, group in enumerate(groups):
+            separator = '' if i == 0 else '\n\n'
+            builder.add_text(f"{group}_label", f"{separator}{labels[group]}\n")
+            builder.add_items(group, data[group], priority=DATA_PRIORITIES[group])
+
+    # Sectioned generation
+    def _generate_sectioned(self, job_uuid: str, facts: List[Dict], predictions: List[Dict],
+                            unknowns: List[Dict], relations: List[Dict],
+                            language: str, time_horizon: str) -> Dict:
+        """Build the report from cached sections, regenerating only stale ones in parallel."""
+        inputs = {'facts': facts, 'predictions': predictions, 'unknowns': unknowns, 'relations': relations}
+        hashes = {name: self._section_hash(name, inputs, language, time_horizon) for name in REPORT_SECTIONS}
+        cached = self.section_repository.get_sections(job_uuid, list(hashes.values()))
+
+        report = {'time_horizon': time_horizon}
+        sources = {}
+        stale = []
+        for name in REPORT_SECTIONS:
+            if hashes[name] in cached:
+                report[name] = cached[hashes[name]]
+                sources[name] = 'cached'
             else:
-                print(f"[REPORT] Cloudflare API returned success=false: {result.get('errors', [])}", flush=True)
-        except Exception as e:
-            print(f"[REPORT] Cloudflare exception: {e}", flush=True)
-
-        return self._fallback_response(facts, predictions, unknowns, relations)
+                stale.append(name)
+        print(f"[REPORT] Sections cached: {len(REPORT_SECTIONS) - len(stale)}, stale: {stale}", flush=True)
+
+        if stale:
+            # Worker threads do not inherit the scheduler's thread-local job/priority or the trace
+            ctx = current_context()
+            parent = current_span()
+
+            # The repository's connection is only used on this thread; workers open their own
+            def generate(name):
+                with llm_context(**ctx), use_span(parent), span('report_section', section=name):
+                    if self.connection_factory is None:
+                        return _section_flights.do(
+                            hashes[name], lambda: self._generate_section(name, inputs, language, time_horizon)
+                        )
+                    conn = self.connection_factory()
+                    try:
+                        repository = ReportSectionRepository(conn)
+                        return _section_flights.do(
+                            hashes[name],
+                            lambda: self._generate_and_save_section(
+                                repository, job_uuid, name, hashes[name], inputs, language, time_horizon
+                            ),
+                            connection_factory=self.connection_factory,
+                            lookup=lambda: repository.get_sections(job_uuid, [hashes[name]]).get(hashes[name])
+                        )
+                    finally:
+                        conn.close()
+
+            with ThreadPoolExecutor(max_workers=min(len(stale), config.REPORT_SECTION_WORKERS)) as pool:
+                results = dict(zip(stale, pool.map(generate, stale)))
+
+            fallback = None
+            for name in stale:
+                content = results[name]
+                if content is None:
+                    fallback = fallback or self._fallback_response(facts, predictions, unknowns, relations)
+                    report[name] = fallback[name]
+                    sources[name] = 'fallback'
+                    LLM_PARSE_RESULTS.inc(parser='report_section', outcome='fallback')
+                else:
+                    if self.connection_factory is None:
+                        self.section_repository.save_section(
+                            job_uuid, name, hashes[name], language, time_horizon, content
+                        )
+                    report[name] = content
+                    LLM_PARSE_RESULTS.inc(parser='report_section', outcome='ok')
+                    sources[name] = 'generated'
+
+        report['metadata'] = self._build_metadata(facts, predictions, unknowns, relations)
+        report['metadata']['sections'] = sources
+        if 'fallback' in sources.values():
+            report['metadata']['fallback'] = True
+        return report
+
+    def _section_hash(self, name: str, inputs: Dict[str, List[Dict]], language: str, time_horizon: str) -> str:
+        key = {'section': name, 'version': SECTION_PROMPT_VERSION, 'language': language, 'time_horizon': time_horizon}
+        for group in SECTION_INPUTS[name]:
+            if group == 'relations':
+                key[group] = sorted(
+                    [str(r.get('id')), r.get('relation_type'), str(r.get('source_node_id')), str(r.get('target_node_id'))]
+                    for r in inputs[group]
+                )
+            else:
+                key[group] = sorted(
+                    [str(n.get('id')), n.get('value', n.get('fact', n.get('prediction', n.get('unknown', ''))))]
+                    for n in inputs[group]
+                )
+        return hashlib.sha256(json.dumps(key, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _generate_and_save_section(self, repository, job_uuid: str, name: str, input_hash: str,
+                                   inputs: Dict[str, List[Dict]], language: str, time_horizon: str):
+        """Generate a section and store it before its lock is released, so other processes can pick it up."""
+        content = self._generate_section(name, inputs, language, time_horizon)
+        if content is not None:
+            repository.save_section(job_uuid, name, input_hash, language, time_horizon, content)
+        return content
+
+    def _generate_section(self, name: str, inputs: Dict[str, List[Dict]], language: str, time_horizon: str):
+        """Generate one section; returns its content or None on failure."""
+        prompt = self._build_section_prompt(name, inputs, language, time_horizon)
+        max_tokens = 1536 if name == 'recommendations' else 1024
+        print(f"[REPORT] Generating section {name}", flush=True)
+
+        if config.LLM_STRUCTURED_OUTPUT:
+            result = self.llm_client.generate_json(
+                prompt, REPORT_SECTION_SCHEMAS[name], language=language, timeout=180, max_tokens=max_tokens
+            )
+            return result[name] if result else None
 
-    def _generate_with_ollama(self, facts: List[Dict], predictions: List[Dict],
-                               unknowns: List[Dict], relations: List[Dict],
-                               language: str, time_horizon: str = '1 year') -> Dict:
-        prompt = self._build_full_prompt(facts, predictions, unknowns, relations, language, time_horizon)
-        ollama_url = f'http://{config.OLLAMA_HOST}:{config.OLLAMA_PORT}/api/generate'
-        print(f"[REPORT] Calling Ollama at {ollama_url} with model {config.OLLAMA_MODEL}", flush=True)
+        raw = self.llm_client.generate(prompt, language, timeout=180, max_tokens=max_tokens)
+        if raw is None:
+            return None
+        return self._parse_section(name, raw)
 
-        try:
-            response = requests.post(
-                ollama_url,
-                json={'model': config.OLLAMA_MODEL, 'prompt': prompt, 'stream': False},
-                timeout=300
+    def _parse_section(self, name: str, raw: str):
+        cleaned = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', ' ', raw.strip())
+        start, end = cleaned.find('{'), cleaned.rfind('}') + 1
+        if start >= 0 and end > start:
+            try:
+                parsed = json.loads(cleaned[start:end])
+                value = parsed.get(name) if isinstance(parsed, dict) else None
+                if name == 'recommendations' and isinstance(value, list):
+                    return value
+                if name != 'recommendations' and isinstance(value, str) and value.strip():
+                    return value.strip()
+            except json.JSONDecodeError as e:
+                print(f"[REPORT_PARSE] Section {name} JSON parse error: {e}", flush=True)
+
+        if name != 'recommendations' and cleaned and not cleaned.startswith('{'):
+            # Plain prose is an acceptable answer for text sections
+            return cleaned
+        print(f"[REPORT_PARSE] Section {name} could not be parsed", flush=True)
+        return None
+
+    def _build_section_prompt(self, name: str, inputs: Dict[str, List[Dict]], language: str, time_horizon: str) -> str:
+        data = self._data_lines(inputs['facts'], inputs['predictions'], inputs['unknowns'], inputs['relations'])
+        if language == 'pl':
+            head = (
+                f"HORYZONT CZASOWY ANALIZY: {time_horizon}\n"
+                f"WAŻNE: Uwzględnij ten horyzont czasowy. Rozważ co może się wydarzyć w ciągu {time_horizon}.\n\n"
             )
-            print(f"[REPORT] Ollama response status: {response.status_code}", flush=True)
-            if response.status_code == 200:
-                result = response.json()
-                raw = result.get('response', '')
-                print(f"[REPORT] Got response of {len(raw)} chars", flush=True)
-                return self._parse_json_response(raw, facts, predictions, unknowns, relations)
-            else:
-                print(f"[REPORT] Ollama error response: {response.text[:500]}", flush=True)
-        except Exception as e:
-            print(f"[REPORT] Ollama exception: {e}", flush=True)
+            tasks = {
+                'summary': 'Napisz streszczenie danych (max 150 słów) - przejrzyste, user-friendly.\n'
+                           'Odpowiedz TYLKO obiektem JSON: {"summary": "..."}',
+                'positive_scenario': f'Napisz scenariusz pozytywny dla Atlantis w horyzoncie {time_horizon}. MUSISZ zawrzeć: konkretne wydarzenia (co dokładnie się stanie), aktorów (kto podejmie działania), daty/kamienie milowe, mierzalne rezultaty. Wyjaśnij łańcuch przyczynowo-skutkowy. (200-300 słów)\n'
+                                     'Odpowiedz TYLKO obiektem JSON: {"positive_scenario": "..."}',
+                'negative_scenario': f'Napisz scenariusz negatywny dla Atlantis w horyzoncie {time_horizon}. MUSISZ zawrzeć: konkretne zagrożenia (co dokładnie pójdzie źle), aktorów odpowiedzialnych, punkty krytyczne/momenty decyzyjne, potencjalne straty (liczbowe jeśli możliwe). Wyjaśnij łańcuch przyczynowo-skutkowy. (200-300 słów)\n'
+                                     'Odpowiedz TYLKO obiektem JSON: {"negative_scenario": "..."}',
+                'recommendations': 'Sformułuj konkretne i wykonalne rekomendacje - unikaj ogólników typu "wzmocnić współpracę". Podaj KTO konkretnie powinien działać, CO dokładnie zrobić, KIEDY.\n'
+                                   'Odpowiedz TYLKO obiektem JSON: {"recommendations": [{"action": "Konkretna akcja", "responsible_entity": "Kto", '
+                                   '"timeline": "Kiedy", "expected_outcome": "Oczekiwany rezultat", "priority": "wysoki/średni/niski"}]}',
+            }
+        else:
+            head = (
+                f"TIME HORIZON FOR ANALYSIS: {time_horizon}\n"
+                f"IMPORTANT: Consider this time horizon. Consider what could happen within {time_horizon}.\n\n"
+            )
+            tasks = {
+                'summary': 'Write a data summary (max 150 words) - clear, user-friendly.\n'
+                           'Reply with ONLY a JSON object: {"summary": "..."}',
+                'positive_scenario': f'Write a positive scenario for Atlantis within {time_horizon}. MUST include: specific events (what exactly will happen), actors (who will take action), dates/milestones, measurable outcomes. Explain the cause-effect chain. (200-300 words)\n'
+                                     'Reply with ONLY a JSON object: {"positive_scenario": "..."}',
+                'negative_scenario': f'Write a negative scenario for Atlantis within {time_horizon}. MUST include: specific threats (what exactly will go wrong), responsible actors, critical points/decision moments, potential losses (quantified if possible). Explain the cause-effect chain. (200-300 words)\n'
+                                     'Reply with ONLY a JSON object: {"negative_scenario": "..."}',
+                'recommendations': 'Write specific and actionable recommendations - avoid generalities like "strengthen cooperation". Specify WHO exactly should act, WHAT exactly to do, WHEN.\n'
+                                   'Reply with ONLY a JSON object: {"recommendations": [{"action": "Specific action", "responsible_entity": "Who", '
+                                   '"timeline": "When", "expected_outcome": "Expected result", "priority": "high/medium/low"}]}',
+            }
 
-        return self._fallback_response(facts, predictions, unknowns, relations)
+        builder = PromptBuilder(f'report_{name}', language, max_output_tokens=1536 if name == 'recommendations' else 1024)
+        builder.add_text('head', head)
+        self._add_data(builder, language, data, SECTION_INPUTS[name])
+        builder.add_text('task', f"\n\n{tasks[name]}")
+        return builder.build()
+
+    def _generate_structured(self, facts: List[Dict], predictions: List[Dict],
+                             unknowns: List[Dict], relations: List[Dict],
+                             language: str, time_horizon: str = '1 year') -> Dict:
+        prompt = self._build_full_prompt(facts, predictions, unknowns, relations, language, time_horizon)
+        report = self.llm_client.generate_json(
+            prompt, REPORT_SCHEMA, language=language,
+            timeout=300, max_tokens=4096
+        )
+        if not report:
+            return self._fallback_response(facts, predictions, unknowns, relations)
+
+        report.setdefault('time_horizon', time_horizon)
+        report['metadata'] = self._build_metadata(facts, predictions, unknowns, relations)
+        print(f"[REPORT] Structured report generated", flush=True)
+        return report
+
+    def _build_metadata(self, facts: List[Dict], predictions: List[Dict],
+                        unknowns: List[Dict], relations: List[Dict]) -> Dict:
+        return {
+            'facts_count': len(facts),
+            'predictions_count': len(predictions),
+            'unknowns_count': len(unknowns),
+            'relations_count': len(relations)
+        }
 
     def _parse_json_response(self, raw: str, facts: List[Dict], predictions: List[Dict],
                               unknowns: List[Dict], relations: List[Dict]) -> Dict:
-        import re
         print(f"[REPORT_PARSE] Raw response preview: {raw[:500]}", flush=True)
 
         cleaned = raw.strip()
@@ -214,6 +392,7 @@ IMPORTANT:
                         'relations_count': len(relations)
                     }
                     print(f"[REPORT_PARSE] Successfully parsed JSON report", flush=True)
+                    LLM_PARSE_RESULTS.inc(parser='report', outcome='ok')
                     return parsed
                 else:
                     print(f"[REPORT_PARSE] JSON missing required keys: {list(parsed.keys())}", flush=True)
@@ -234,11 +413,13 @@ IMPORTANT:
                         'relations_count': len(relations)
                     }
                     print(f"[REPORT_PARSE] Successfully parsed JSON with repair", flush=True)
+                    LLM_PARSE_RESULTS.inc(parser='report', outcome='repaired')
                     return parsed
             except:
                 pass
 
         print(f"[REPORT_PARSE] All parsing failed, using fallback", flush=True)
+        LLM_PARSE_RESULTS.inc(parser='report', outcome='fallback')
         return self._fallback_response(facts, predictions, unknowns, relations)
 
     def _fallback_response(self, facts: List[Dict], predictions: List[Dict],
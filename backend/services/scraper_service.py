@@ -1,86 +1,75 @@
 """Web scraping service."""
-import json
-import requests
-from typing import Dict
+from typing import Dict, List, Optional
 from bs4 import BeautifulSoup
 
+from .blob_store import BlobStore
+from .link_fetcher import LinkFetcher
+from repositories.scraped_data_repository import ScrapedDataRepository
+
 
 class ScraperService:
     """Handles web scraping operations."""
 
     def __init__(self, db_connection):
         self.conn = db_connection
+        self.scraped_data_repo = ScrapedDataRepository(db_connection)
+        self.blob_store = BlobStore()
 
     def scrape_url(self, job_uuid: str, step_id: int, url: str) -> Dict:
         """Scrape content from a URL."""
-        cur = self.conn.cursor()
-        try:
-            cur.execute(
-                """
-                INSERT INTO scraped_data (job_id, step_id, url, status)
-                VALUES (
-                    (SELECT id FROM processing_jobs WHERE job_uuid = %s),
-                    %s, %s, 'pending'
-                )
-                RETURNING id
-                """,
-                (job_uuid, step_id, url)
-            )
-            scraped_id = cur.fetchone()[0]
-            self.conn.commit()
-
-            try:
-                response = requests.get(url, timeout=30, headers={
-                    'User-Agent': 'Mozilla/5.0 (compatible; FactExtractor/1.0)'
-                })
-                response.raise_for_status()
-
-                text = self._extract_text(response.text)
-
-                cur.execute(
-                    """
-                    UPDATE scraped_data
-                    SET content = %s, content_type = %s, status = 'completed',
-                        metadata = %s
-                    WHERE id = %s
-                    """,
-                    (text, response.headers.get('Content-Type'),
-                     json.dumps({'status_code': response.status_code}), scraped_id)
-                )
-                self.conn.commit()
-
-                return {'success': True, 'content': text, 'url': url}
-
-            except Exception as e:
-                cur.execute(
-                    """
-                    UPDATE scraped_data
-                    SET status = 'failed', error_message = %s
-                    WHERE id = %s
-                    """,
-                    (str(e), scraped_id)
-                )
-                self.conn.commit()
-                return {'success': False, 'error': str(e), 'url': url}
-
-        finally:
-            cur.close()
+        fetched = self.scrape_urls(job_uuid, step_id, [url])[url]
+        if fetched['error']:
+            return {'success': False, 'error': fetched['error'], 'url': url}
+
+        with self.blob_store.open(fetched['blob_hash']) as f:
+            html = f.read().decode(fetched['encoding'] or 'utf-8', errors='replace')
+        return {'success': True, 'content': self._extract_text(html), 'url': url}
+
+    def scrape_urls(self, job_uuid: str, step_id: Optional[int], urls: List[str]) -> Dict[str, Dict]:
+        """Fetch URLs concurrently (see services/link_fetcher.py) and record them in scraped_data at once.
+
+        Bodies go to the blob store; rows reference them by `metadata.blob_hash`
+        instead of carrying the content. Returns the fetch result per URL.
+        """
+        results = LinkFetcher(self.blob_store).fetch_all(urls)
+        self.scraped_data_repo.create_scraped_data_bulk(job_uuid, step_id, [
+            {
+                'url': url,
+                'content_type': (result['headers'].get('content-type') or '').split(';')[0][:50] or None,
+                'status': 'failed' if result['error'] else 'completed',
+                'error_message': result['error'],
+                'metadata': {
+                    'status_code': result['status_code'],
+                    'http_version': result['http_version'],
+                    'bytes': result['size'],
+                    'blob_hash': result['blob_hash'],
+                    'fetch_ms': result['fetch_ms']
+                }
+            }
+            for url, result in results.items()
+        ])
+        return results
 
     def _extract_text(self, html: str) -> str:
         """Extract clean text from HTML."""
-        soup = BeautifulSoup(html, 'html.parser')
+        return visible_text(html)
+
+
+def visible_text(html: str) -> str:
+    """Text of an HTML page as a reader sees it (no scripts or styles, whitespace collapsed)."""
+    soup = BeautifulSoup(html, 'html.parser')
 
-        # Remove scripts and styles
-        for script in soup(["script", "style"]):
-            script.decompose()
+    # Remove scripts and styles
+    for script in soup(["script", "style"]):
+        script.decompose()
 
-        # Get text
-        text = soup.get_text()
+    # Get text
+    text = soup.get_text()
 
-        # Clean up whitespace
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
+    # Clean up whitespace
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    text = ' '.join(chunk for chunk in chunks if chunk)
 
-        return text
+    return text
 
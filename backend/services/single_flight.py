@@ -0,0 +1,130 @@
+"""Request coalescing (single-flight) for expensive calls.
+
+The first caller for a key runs the call; callers arriving with the same key
+while it is in flight wait for it and get the same result (or exception)
+instead of starting a duplicate Playwright render, conversion or LLM call.
+
+Coalescing is per worker process. For work whose result is persisted, pass a
+`connection_factory` and a `lookup` to also coalesce across processes: the
+leader takes a Postgres advisory lock for the key, and callers in other
+processes poll `lookup` until the leader has stored the result. The lock is
+held on a short-lived connection of its own (opened from the factory, closed
+when the call finishes, which releases the lock), so it never commits or
+leaves a session lock on a connection the caller shares with other work.
+`fn` must store its result before returning; `lookup` must not use a
+connection shared with other threads.
+"""
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import config
+
+
+def flight_key(*parts) -> str:
+    """Stable key for a call from its (JSON-serialisable) arguments."""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key within a process."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: str, fn: Callable[[], Any], connection_factory: Optional[Callable[[], Any]] = None,
+           lookup: Optional[Callable[[], Any]] = None) -> Any:
+        """Run fn for key, or wait for the identical call already in flight."""
+        if not config.SINGLE_FLIGHT:
+            return fn()
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+
+        if not leader:
+            flight.done.wait()
+            with self._lock:
+                self.shared += 1
+            print(f"[SINGLE_FLIGHT] {self.name}: shared result of in-flight call {key[:12]}", flush=True)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            if connection_factory is not None and lookup is not None and config.SINGLE_FLIGHT_ADVISORY_LOCKS:
+                flight.result = self._run_with_advisory_lock(key, fn, connection_factory, lookup)
+            else:
+                flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self.executed += 1
+                del self._flights[key]
+            flight.done.set()
+
+    def _run_with_advisory_lock(self, key: str, fn: Callable[[], Any], connection_factory: Callable[[], Any],
+                                lookup: Callable[[], Any]) -> Any:
+        lock_id = int(key[:15], 16)  # fits a signed bigint
+        lock_conn = connection_factory()
+        try:
+            lock_conn.autocommit = True
+            deadline = time.monotonic() + config.SINGLE_FLIGHT_LOCK_TIMEOUT
+            while not self._try_lock(lock_conn, lock_id):
+                # Another process is computing it; use its result once stored
+                result = lookup()
+                if result is not None:
+                    print(f"[SINGLE_FLIGHT] {self.name}: reused result stored by another process {key[:12]}", flush=True)
+                    return result
+                if time.monotonic() > deadline:
+                    print(f"[SINGLE_FLIGHT] {self.name}: gave up waiting for lock {key[:12]}, running anyway", flush=True)
+                    return fn()
+                time.sleep(0.5)
+
+            # The previous holder may have finished between our lookup and the lock
+            result = lookup()
+            return result if result is not None else fn()
+        finally:
+            # Ends the session, which releases the lock
+            lock_conn.close()
+
+    @staticmethod
+    def _try_lock(conn, lock_id: int) -> bool:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (lock_id,))
+            return cur.fetchone()[0]
+        finally:
+            cur.close()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'waiting': sum(f.waiters for f in self._flights.values()),
+                'executed': self.executed,
+                'shared': self.shared
+            }
@@ -0,0 +1,80 @@
+"""Run pipeline steps as a dependency graph.
+
+Steps whose dependencies have finished run concurrently on a small pool
+(PIPELINE_STEP_WORKERS); each step keeps its own number, so its
+processing_steps row and the UI look the same as in a sequential run. Worker
+threads get the job's `llm_context` (tagged with the step number, so
+parallel steps keep separate profiles) and the current trace span.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List
+
+from .llm_scheduler import current_context, llm_context
+from tracing import current_span, use_span
+
+
+class PipelineStep:
+    """A step: `run(results)` gets the results of the steps it depends on, by step number."""
+
+    def __init__(self, number: int, name: str, run: Callable[[Dict[int, Any]], Any], depends_on: Iterable[int] = ()):
+        self.number = number
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+
+
+class StepExecutor:
+    def __init__(self, steps: List[PipelineStep], max_workers: int = 1):
+        numbers = {step.number for step in steps}
+        for step in steps:
+            missing = set(step.depends_on) - numbers
+            if missing:
+                raise ValueError(f"Step {step.number} depends on unknown steps {sorted(missing)}")
+        self.steps = sorted(steps, key=lambda step: step.number)
+        self.max_workers = max(1, max_workers)
+
+    def run(self) -> Dict[int, Any]:
+        """Run all steps; returns their results by step number.
+
+        When a step fails, steps not started yet are dropped, running ones are
+        allowed to finish (their work is checkpointed), and the first error is raised.
+        """
+        ctx = current_context()
+        parent = current_span()
+        results: Dict[int, Any] = {}
+        pending = list(self.steps)
+        running = {}
+        error = None
+
+        def execute(step: PipelineStep):
+            with llm_context(ctx['job_key'], ctx['priority'], step=step.number), use_span(parent):
+                return step.run({number: results[number] for number in step.depends_on})
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='pipeline-step') as pool:
+            while pending or running:
+                if error is None:
+                    # Lowest step numbers first, so max_workers=1 keeps the sequential order
+                    for step in [s for s in pending if all(d in results for d in s.depends_on)]:
+                        if len(running) >= self.max_workers:
+                            break
+                        pending.remove(step)
+                        running[pool.submit(execute, step)] = step
+                else:
+                    pending = []
+                if not running:
+                    if pending:
+                        raise ValueError(f"Steps {[s.number for s in pending]} have circular dependencies")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    try:
+                        results[step.number] = future.result()
+                    except Exception as e:
+                        print(f"[PIPELINE] Step {step.number} ({step.name}) failed: {e}", flush=True)
+                        error = error or e
+
+        if error is not None:
+            raise error
+        return results
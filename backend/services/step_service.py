@@ -3,7 +3,11 @@ import json
 from datetime import datetime, timezone
 from typing import List, Dict, Optional
 
+from repositories.step_repository import StepRepository
+from tracing import traced
 
+
+@traced
 class StepService:
     """Handles processing step CRUD operations."""
 
@@ -12,10 +16,15 @@ class StepService:
 
     def __init__(self, db_connection):
         self.conn = db_connection
+        self.step_repo = StepRepository(db_connection)
 
     def create_step(self, job_uuid: str, step_number: int, step_type: str,
                    input_data: Dict, metadata: Optional[Dict] = None) -> int:
-        """Create a new processing step."""
+        """Create a processing step, or restart it when an earlier attempt of the job got to it.
+
+        A restarted step keeps its id (facts reference it) and its checkpoint
+        (metadata.completed_items).
+        """
         cur = self.conn.cursor()
         try:
             cur.execute(
@@ -25,6 +34,15 @@ class StepService:
                     (SELECT id FROM processing_jobs WHERE job_uuid = %s),
                     %s, %s, 'pending', %s, %s
                 )
+                ON CONFLICT (job_id, step_number) DO UPDATE
+                SET step_type = EXCLUDED.step_type,
+                    status = 'pending',
+                    input_data = EXCLUDED.input_data,
+                    output_data = NULL,
+                    error_message = NULL,
+                    metadata = COALESCE(processing_steps.metadata, '{}'::jsonb) || COALESCE(EXCLUDED.metadata, '{}'::jsonb),
+                    updated_at = CURRENT_TIMESTAMP,
+                    completed_at = NULL
                 RETURNING id
                 """,
                 (job_uuid, step_number, step_type, json.dumps(input_data),
@@ -56,36 +74,93 @@ class StepService:
         finally:
             cur.close()
 
-    def get_job_steps(self, job_uuid: str) -> List[Dict]:
-        """Get all steps for a job."""
+    def fail_step(self, job_uuid: str, step_number: int, error_message: str):
+        """Mark a step failed (by number, for callers that do not hold its id)."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE processing_steps
+                SET status = 'failed', error_message = %s, updated_at = %s
+                WHERE job_id = (SELECT id FROM processing_jobs WHERE job_uuid = %s)
+                  AND step_number = %s AND status NOT IN ('completed', 'skipped')
+                """,
+                (error_message, datetime.now(timezone.utc), job_uuid, step_number)
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
+
+    def checkpoint_item(self, step_id: int, item_id: int):
+        """Record that a step has finished an item, so a resumed step skips it."""
+        self.checkpoint_items(step_id, [item_id])
+
+    def checkpoint_items(self, step_id: int, item_ids: List[int]):
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE processing_steps
+                SET metadata = jsonb_set(
+                        COALESCE(metadata, '{}'::jsonb), '{completed_items}',
+                        COALESCE(metadata->'completed_items', '[]'::jsonb) || to_jsonb(%s::int[])
+                    ),
+                    updated_at = %s
+                WHERE id = %s
+                """,
+                (list(item_ids), datetime.now(timezone.utc), step_id)
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
+
+    def reopen_steps(self, job_uuid: str, item_ids: Optional[List[int]] = None,
+                     restart_steps: Optional[List[int]] = None):
+        """Set a job's steps back to pending, keeping their checkpoints, so new items get processed.
+
+        `item_ids` are removed from the checkpoints, so these items (e.g. link
+        sources that changed) are processed again. Steps in `restart_steps` lose
+        their whole checkpoint and process all of the job's items again.
+        """
         cur = self.conn.cursor()
         try:
             cur.execute(
                 """
-                SELECT id, step_number, step_type, status, input_data, output_data,
-                       error_message, metadata, created_at, completed_at
-                FROM processing_steps
+                UPDATE processing_steps
+                SET status = 'pending', completed_at = NULL, updated_at = %s,
+                    metadata = CASE
+                               WHEN step_number = ANY(COALESCE(%s::int[], '{}')) THEN metadata - 'completed_items'
+                               WHEN %s::int[] IS NULL OR metadata->'completed_items' IS NULL THEN metadata
+                               ELSE jsonb_set(metadata, '{completed_items}', COALESCE((
+                                   SELECT jsonb_agg(done)
+                                   FROM jsonb_array_elements(metadata->'completed_items') done
+                                   WHERE NOT (done::text::int = ANY(%s::int[]))
+                               ), '[]'::jsonb)) END
                 WHERE job_id = (SELECT id FROM processing_jobs WHERE job_uuid = %s)
-                ORDER BY step_number
                 """,
-                (job_uuid,)
+                (datetime.now(timezone.utc), restart_steps, item_ids, item_ids, job_uuid)
             )
-            rows = cur.fetchall()
-            return [
-                {
-                    'id': row[0],
-                    'step_number': row[1],
-                    'step_type': row[2],
-                    'status': row[3],
-                    'input_data': row[4],
-                    'output_data': row[5],
-                    'error_message': row[6],
-                    'metadata': row[7],
-                    'created_at': row[8].isoformat() if row[8] else None,
-                    'completed_at': row[9].isoformat() if row[9] else None
-                }
-                for row in rows
-            ]
+            self.conn.commit()
         finally:
             cur.close()
 
+    def get_job_steps(self, job_uuid: str, full_metadata: bool = True) -> List[Dict]:
+        """Get all steps for a job (see StepRepository.get_steps_by_job_uuid)."""
+        return self.step_repo.get_steps_by_job_uuid(job_uuid, full_metadata)
+
+    def save_profile(self, job_uuid: str, step_number: int, profile: Dict):
+        """Store a step's timing/resource profile under metadata.profile."""
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                """
+                UPDATE processing_steps
+                SET metadata = COALESCE(metadata, '{}'::jsonb) || jsonb_build_object('profile', %s::jsonb)
+                WHERE job_id = (SELECT id FROM processing_jobs WHERE job_uuid = %s)
+                  AND step_number = %s
+                """,
+                (json.dumps(profile), job_uuid, step_number)
+            )
+            self.conn.commit()
+        finally:
+            cur.close()
@@ -0,0 +1,101 @@
+"""Incremental parsers for streamed LLM output."""
+import json
+from typing import Any, Callable, Iterable, Iterator, List
+
+
+def iter_lines(fragments: Iterable[str]) -> Iterator[str]:
+    """Re-assemble streamed text fragments into complete lines.
+
+    The trailing line is yielded when the stream ends, even without a newline,
+    so a truncated response still produces its last (partial) line.
+    """
+    buffer = ''
+    for fragment in fragments:
+        buffer += fragment
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            yield line
+    if buffer:
+        yield buffer
+
+
+class JsonArrayStreamParser:
+    """Emits the raw text of each element of the first JSON array as soon as it is complete.
+
+    Works for a bare array (`[{...}, {...}]`) as well as an array nested in an
+    object (`{"facts": ["...", "..."]}`). Nested arrays inside an element are
+    part of that element. Anything before the first `[` (markdown fences,
+    preamble) is ignored.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._array_depth = None
+        self._in_string = False
+        self._escaped = False
+        self._element: List[str] = []
+        self._done = False
+
+    def feed(self, text: str) -> List[str]:
+        completed = []
+        for ch in text:
+            if self._done:
+                break
+
+            if self._in_string:
+                self._append(ch)
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._append(ch)
+            elif ch in '[{':
+                if ch == '[' and self._array_depth is None:
+                    self._array_depth = self._depth + 1
+                else:
+                    self._append(ch)
+                self._depth += 1
+            elif ch in ']}':
+                self._depth -= 1
+                if self._array_depth is not None and self._depth == self._array_depth - 1:
+                    # Closing bracket of the tracked array
+                    self._flush(completed)
+                    self._done = True
+                else:
+                    self._append(ch)
+            elif ch == ',' and self._array_depth is not None and self._depth == self._array_depth:
+                self._flush(completed)
+            else:
+                self._append(ch)
+        return completed
+
+    def _append(self, ch: str):
+        if self._array_depth is not None and self._depth >= self._array_depth:
+            self._element.append(ch)
+
+    def _flush(self, completed: List[str]):
+        element = ''.join(self._element).strip()
+        self._element = []
+        if element:
+            completed.append(element)
+
+
+def iter_json_array_items(fragments: Iterable[str], decode: Callable[[str], Any] = json.loads) -> Iterator[Any]:
+    """Decode elements of the first JSON array in a text stream as they complete.
+
+    Elements that fail to decode are skipped; a truncated stream yields every
+    element that was closed before it ended.
+    """
+    parser = JsonArrayStreamParser()
+    for fragment in fragments:
+        for element in parser.feed(fragment):
+            try:
+                yield decode(element)
+            except (json.JSONDecodeError, ValueError) as e:
+                print(f"[STREAM_PARSING] Skipping malformed array element: {e}", flush=True)
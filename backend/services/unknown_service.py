@@ -1,139 +1,112 @@
 """Unknown information extraction service using LLM."""
-import requests
-from typing import List
+from typing import Iterator, List, Optional
 import config
-
-
-ATLANTIS_CONTEXT = """
-Nazwa państwa: Atlantis
-Istotne cechy położenia geograficznego: dostęp do Morza Bałtyckiego, kilka dużych żeglownych rzek, ograniczone zasoby wody pitnej
-Liczba ludności: 28 mln
-Klimat: umiarkowany
-Silne strony gospodarki: przemysł ciężki, motoryzacyjny, spożywczy, chemiczny, ICT, ambicje odgrywania istotnej roli w zakresie OZE, przetwarzania surowców krytycznych oraz budowy ponadnarodowej infrastruktury AI (m.in. big data centers, giga fabryki AI, komputery kwantowe)
-Liczebność armii: 150 tys. zawodowych żołnierzy
-Stopnień cyfryzacji społeczeństwa: powyżej średniej europejskiej
-Waluta: inna niż euro
-Kluczowe relacje dwustronne: Niemcy, Francja, Finlandia, Ukraina, USA, Japonia
-Potencjalne zagrożenia polityczne i gospodarcze: niestabilność w UE, rozpad UE na grupy „różnych prędkości" pod względem tempa rozwoju oraz zainteresowania głębszą integracją; negatywna kampania wizerunkowa ze strony kilku aktorów państwowych wymierzona przeciw rządowi lub społeczeństwu Atlantis; zakłócenia w dostawach paliw węglowodorowych z USA, Skandynawii, Zatoki Perskiej (wynikające z potencjalnych zmian w polityce wewnętrznej krajów eksporterów lub problemów w transporcie, np. ataki Hutich na gazowce na Morzu Czerwonym); narażenie na spowolnienie rozwoju sektora ICT z powodu embarga na wysokozaawansowane procesory
-Potencjalne zagrożenie militarne: zagrożenie atakiem zbrojnym jednego z sąsiadów; trwające od wielu lat ataki hybrydowe co najmniej jednego sąsiada, w tym w obszarze infrastruktury krytycznej i cyberprzestrzeni
-Kamienie milowe w rozwoju politycznym i gospodarczym: demokracja parlamentarna od 130 lat; okres stagnacji gospodarczej w latach 1930-1950 oraz 1980-1990; członkostwo w UE i NATO od roku 1997; 25. gospodarka świata wg PKB
-"""
+from .llm_client import LLMClient
+from .llm_schemas import UNKNOWNS_SCHEMA
+from .prompt_budget import CONTENT_SEPARATOR, PromptBuilder
+from .stream_parsers import iter_json_array_items, iter_lines
 
 
 class UnknownService:
     """Handles LLM-based unknown/missing information extraction."""
 
+    def __init__(self):
+        self.llm_client = LLMClient('unknown_extraction')
+
     def extract_unknowns(self, text: str, language: str = 'en', facts_context: str = '') -> List[str]:
         """Extract missing information from text using LLM."""
         print(f"[UNKNOWN_EXTRACTION] Calling LLM ({config.LLM_PROVIDER}) for unknown extraction...", flush=True)
-        if config.LLM_PROVIDER == 'cloudflare':
-            return self._extract_with_cloudflare(text, language, facts_context)
-        else:
-            return self._extract_with_ollama(text, language, facts_context)
-
-    def _extract_with_cloudflare(self, text: str, language: str, facts_context: str = '') -> List[str]:
-        """Extract unknowns using Cloudflare Workers AI."""
-        if not config.CLOUDFLARE_ACCOUNT_ID or not config.CLOUDFLARE_API_TOKEN:
-            print("ERROR: Cloudflare credentials not configured")
-            return []
+        if config.LLM_STRUCTURED_OUTPUT:
+            return self._extract_structured(text, language, facts_context)
 
-        model = config.CLOUDFLARE_MODEL_EN if language == 'en' else config.CLOUDFLARE_MODEL_PL
-
-        url = f"https://api.cloudflare.com/client/v4/accounts/{config.CLOUDFLARE_ACCOUNT_ID}/ai/run/{model}"
-
-        headers = {
-            "Authorization": f"Bearer {config.CLOUDFLARE_API_TOKEN}",
-            "Content-Type": "application/json"
-        }
-
-        system_message = (
-            f"You are an expert analyst for the hypothetical country Atlantis. {ATLANTIS_CONTEXT}\n\n"
-            "Identify missing information or unknowns that would be important for Atlantis.\n"
-            "Format:\n- missing info 1\n- missing info 2\n- missing info 3" if language == 'en' else
-            f"Jesteś ekspertem analitykiem dla hipotetycznego państwa Atlantis. {ATLANTIS_CONTEXT}\n\n"
-            "Zidentyfikuj brakujące informacje lub niewiadome, które byłyby ważne dla Atlantis.\n"
-            "Format:\n- brak info 1\n- brak info 2\n- brak info 3"
+        unknowns_text = self.llm_client.generate(
+            self._build_prompt(text, language, facts_context), language, timeout=120
         )
-
-        prompt = self._build_prompt(text, language, facts_context)
-
-        payload = {
-            "messages": [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ]
-        }
-
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-
-            result = response.json()
-
-            if result.get("success"):
-                unknowns_text = result["result"]["response"]
-                return self._parse_unknowns(unknowns_text)
-            else:
-                print(f"Cloudflare AI error: {result.get('errors')}")
-                return []
-
-        except Exception as e:
-            print(f"Cloudflare AI extraction error: {e}")
+        if not unknowns_text:
             return []
-
-    def _extract_with_ollama(self, text: str, language: str, facts_context: str = '') -> List[str]:
-        """Extract unknowns using local Ollama LLM."""
-        prompt = self._build_prompt(text, language, facts_context)
-
-        try:
-            response = requests.post(
-                f'http://{config.OLLAMA_HOST}:{config.OLLAMA_PORT}/api/generate',
-                json={'model': config.OLLAMA_MODEL, 'prompt': prompt, 'stream': False},
-                timeout=120
+        return self._parse_unknowns(unknowns_text)
+
+    def stream_unknowns(self, text: str, language: str = 'en', facts_context: str = '') -> Iterator[str]:
+        """Yield unknowns one by one while the LLM is still generating."""
+        print(f"[UNKNOWN_EXTRACTION] Streaming unknowns from LLM ({config.LLM_PROVIDER})...", flush=True)
+        if config.LLM_STRUCTURED_OUTPUT:
+            fragments = self.llm_client.stream(
+                self._build_prompt(text, language, facts_context, structured=True), language,
+                timeout=120, schema=UNKNOWNS_SCHEMA
             )
+            for unknown in iter_json_array_items(fragments):
+                if isinstance(unknown, str) and len(unknown.strip()) > 10:
+                    yield unknown.strip()
+            return
+
+        fragments = self.llm_client.stream(self._build_prompt(text, language, facts_context), language, timeout=120)
+        for line in iter_lines(fragments):
+            unknown = self._parse_unknown_line(line)
+            if unknown:
+                yield unknown
+
+    def _extract_structured(self, text: str, language: str, facts_context: str = '') -> List[str]:
+        """Extract unknowns with schema-constrained JSON output."""
+        result = self.llm_client.generate_json(
+            self._build_prompt(text, language, facts_context, structured=True), UNKNOWNS_SCHEMA,
+            language=language, timeout=120
+        )
+        if not result:
+            return []
+        unknowns = [u.strip() for u in result['unknowns'] if len(u.strip()) > 10]
+        print(f"[UNKNOWN_PARSING] Structured output: {len(unknowns)} unknowns", flush=True)
+        return unknowns
 
-            if response.status_code == 200:
-                result = response.json()
-                unknowns_text = result.get('response', '')
-                return self._parse_unknowns(unknowns_text)
-            else:
-                print(f"Ollama extraction error: Status {response.status_code}, Response: {response.text}")
-                return []
-
-        except Exception as e:
-            print(f"Ollama extraction error: {e}")
-
-        return []
+    def _build_prompt(self, text: str, language: str, facts_context: str = '', structured: bool = False) -> str:
+        """Build extraction prompt (appended after the shared static prefix), fitted to the token budget.
 
-    def _build_prompt(self, text: str, language: str, facts_context: str = '') -> str:
-        """Build extraction prompt."""
-        facts_section = f"\n\nKnown facts:\n{facts_context}\n" if facts_context else ""
-        
+        Item contents separated by CONTENT_SEPARATOR share the text budget evenly.
+        """
+        builder = PromptBuilder('unknown_extraction', language)
+        facts = [line for line in facts_context.split('\n') if line.strip()]
         if language == 'en':
-            return (
-                f"Context: You are analyzing information for the hypothetical country Atlantis.\n\n{ATLANTIS_CONTEXT}{facts_section}\n"
-                f"Based on the following text, identify what information is missing or unknown that would be important for Atlantis:\n\n{text}\n\n"
+            facts_header = "Known facts:\n"
+            task = "Based on the following text, identify what information is missing or unknown that would be important for Atlantis:\n\n"
+            output_format = (
+                'Respond with a JSON object: {"unknowns": ["missing info 1", "missing info 2"]}'
+                if structured else
                 "Format:\n- missing info 1\n- missing info 2\n- missing info 3"
             )
         else:
-            return (
-                f"Kontekst: Analizujesz informacje dla hipotetycznego państwa Atlantis.\n\n{ATLANTIS_CONTEXT}{facts_section}\n"
-                f"Na podstawie następującego tekstu zidentyfikuj, jakie informacje brakują lub są nieznane, a które byłyby ważne dla Atlantis:\n\n{text}\n\n"
+            facts_header = "Znane fakty:\n"
+            task = "Na podstawie następującego tekstu zidentyfikuj, jakie informacje brakują lub są nieznane, a które byłyby ważne dla Atlantis:\n\n"
+            output_format = (
+                'Odpowiedz obiektem JSON: {"unknowns": ["brak info 1", "brak info 2"]}'
+                if structured else
                 "Format:\n- brak info 1\n- brak info 2\n- brak info 3"
             )
 
+        if facts:
+            builder.add_items('facts', facts, priority=1, header=facts_header)
+            builder.add_text('facts_end', "\n\n")
+        builder.add_text('task', task)
+        builder.add_parts('text', text.split(CONTENT_SEPARATOR), priority=2)
+        builder.add_text('output_format', f"\n\n{output_format}")
+        return builder.build()
+
     def _parse_unknowns(self, unknowns_text: str) -> List[str]:
         """Parse unknowns from LLM response."""
         print(f"[UNKNOWN_PARSING] Raw LLM response: {unknowns_text[:200]}...", flush=True)
-        lines = unknowns_text.split('\n')
         unknowns = []
 
-        for line in lines:
-            line = line.strip()
-            if line and (line.startswith('-') or line.startswith('*') or line.startswith('•')):
-                cleaned = line.lstrip('-*•').strip()
-                if cleaned and len(cleaned) > 10:
-                    unknowns.append(cleaned)
+        for line in unknowns_text.split('\n'):
+            cleaned = self._parse_unknown_line(line)
+            if cleaned:
+                unknowns.append(cleaned)
 
         print(f"[UNKNOWN_PARSING] Extracted {len(unknowns)} unknowns", flush=True)
         return unknowns
+
+    def _parse_unknown_line(self, line: str) -> Optional[str]:
+        """Return the bullet text of a single response line, or None if it is not an unknown."""
+        line = line.strip()
+        if line and (line.startswith('-') or line.startswith('*') or line.startswith('•')):
+            cleaned = line.lstrip('-*•').strip()
+            if cleaned and len(cleaned) > 10:
+                return cleaned
+        return None
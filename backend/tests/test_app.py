@@ -5,6 +5,7 @@ from unittest.mock import Mock, patch
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import app as app_module
 from app import app
 
 
@@ -22,12 +23,14 @@ def test_health_endpoint(client):
     assert data['status'] == 'healthy'
 
 
+@patch('app.queue_job')
 @patch('app.get_db_connection')
 @patch('app.ProcessingService')
-def test_submit_job(mock_service, mock_db, client):
+def test_submit_job(mock_service, mock_db, mock_queue_job, client):
     mock_service_instance = Mock()
     mock_service.return_value = mock_service_instance
     mock_service_instance.create_job.return_value = 'test-uuid-123'
+    mock_service_instance.run_job.return_value = None
 
     response = client.post('/api/submit', json={
         'items': [{'type': 'text', 'content': 'Test', 'wage': 50}],
@@ -36,6 +39,7 @@ def test_submit_job(mock_service, mock_db, client):
     assert response.status_code == 201
     data = response.get_json()
     assert data['job_uuid'] == 'test-uuid-123'
+    assert mock_queue_job.call_args.args[:2] == ('test-uuid-123', {'enable_fact_extraction': True})
 
 
 def test_submit_job_no_items(client):
@@ -84,6 +88,30 @@ def test_get_job_details(mock_service, mock_db, client):
     assert 'job' in data
     assert 'steps' in data
     assert 'facts' in data
+    # Step profiles are left to /api/jobs/<uuid>/profile
+    mock_service_instance.get_job_steps.assert_called_once_with('test-uuid', full_metadata=False)
+
+
+@patch('app.NodeRepository')
+@patch('app.get_db_connection')
+@patch('app.ProcessingService')
+def test_job_list_serves_aggregate_counts_only(mock_service, mock_db, mock_node_repo, client):
+    mock_service.return_value.get_all_jobs.return_value = [
+        {'job_uuid': 'job-1', 'status': 'completed', 'total_items': 2, 'completed_items': 2, 'failed_items': 0}
+    ]
+    mock_node_repo.return_value.get_graph_counts.return_value = {
+        'job-1': {'node_counts': {'fact': 3, 'prediction': 1, 'missing_information': 0, 'total': 4},
+                  'relation_count': 2}
+    }
+
+    response = client.get('/api/jobs')
+    assert response.status_code == 200
+    job = response.get_json()['jobs'][0]
+    assert job['node_counts']['total'] == 4 and job['relation_count'] == 2
+    assert 'scraped_data' not in job and 'extracted_facts' not in job
+    # One aggregate read for all jobs instead of per-node relation queries
+    mock_node_repo.return_value.get_graph_counts.assert_called_once_with(['job-1'])
+    mock_node_repo.return_value.get_node_relations.assert_not_called()
 
 
 @patch('app.get_db_connection')
@@ -97,3 +125,225 @@ def test_get_job_details_not_found(mock_service, mock_db, client):
     assert response.status_code == 404
 
 
+
+
+@patch('app.report_executor')
+@patch('app.ReportTaskRepository')
+@patch('app.get_db_connection')
+@patch('app.ProcessingService')
+def test_report_regeneration_is_queued_and_coalesced(mock_service, mock_db, mock_task_repo, mock_executor, client):
+    mock_service.return_value.get_job_status.return_value = {'job_uuid': 'job-1', 'report': {'time_horizon': '1 year'}}
+    task = {'task_uuid': 'task-1', 'status': 'pending'}
+    mock_task_repo.return_value.create_or_get_active.side_effect = [(task, True), (task, False)]
+
+    first = client.get('/api/jobs/job-1/report?regenerate=true&language=en')
+    second = client.get('/api/jobs/job-1/report?regenerate=true&language=en')
+
+    assert first.status_code == 202 and second.status_code == 202
+    assert first.get_json()['status_url'] == '/api/jobs/job-1/report/tasks/task-1'
+    assert first.headers['Location'].endswith('/api/jobs/job-1/report/tasks/task-1')
+    mock_task_repo.return_value.create_or_get_active.assert_called_with('job-1', 'en', '1 year', 900)
+    mock_executor.submit.assert_called_once()
+
+
+@patch('app._db_max_connections', return_value=100)
+@patch('app._db_connection_counts', return_value={('active',): 2, ('idle',): 5})
+@patch('app._job_status_counts', return_value={('completed',): 3})
+def test_metrics_endpoint(mock_counts, mock_connections, mock_max_connections, client):
+    client.get('/health')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"' in body
+    assert 'processing_jobs{status="completed"' in body
+    assert '# TYPE llm_call_duration_seconds histogram' in body
+    assert 'db_connections{state="idle"' in body and 'db_max_connections' in body
+
+
+@patch('app.get_db_connection')
+@patch('app.ItemRepository')
+def test_item_content_is_decoded_and_ranged(mock_item_repo, mock_db, client):
+    mock_item_repo.return_value.get_item_content.return_value = {
+        'id': 7, 'type': 'file', 'content': 'aGVsbG8gd29ybGQ=', 'blob_hash': None, 'content_hash': 'abc'
+    }
+
+    response = client.get('/api/items/7/content', headers={'Range': 'bytes=0-4'})
+    assert response.status_code == 206
+    assert response.data == b'hello'
+    assert response.headers['Content-Range'] == 'bytes 0-4/11'
+
+    response = client.get('/api/items/7/content', headers={'If-None-Match': '"abc"'})
+    assert response.status_code == 304
+
+
+@patch('app.ProcessingService')
+@patch('app.get_db_connection')
+def test_multipart_submit_streams_files_to_blob_store(mock_db, mock_service, client, tmp_path, monkeypatch):
+    import io
+    import json
+    import config
+    monkeypatch.setattr(config, 'BLOB_DIR', str(tmp_path))
+    mock_service.return_value.create_job.return_value = 'job-1'
+
+    response = client.post('/api/submit/multipart', content_type='multipart/form-data', data={
+        'items': json.dumps([{'type': 'text', 'content': 'Note'}, {'type': 'file', 'file': 'report', 'wage': 80}]),
+        'report': (io.BytesIO(b'%PDF-1.4 report'), 'report.pdf'),
+        'extra': (io.BytesIO(b'%PDF-1.4 extra'), 'extra.pdf'),
+    })
+    assert response.status_code == 201
+
+    items = mock_service.return_value.create_job.call_args[0][0]
+    assert items[0] == {'type': 'text', 'content': 'Note'}
+    assert items[1]['wage'] == 80 and items[2]['type'] == 'file'
+    stored = {f for _, _, names in os.walk(tmp_path) for f in names}
+    assert stored == {items[1]['blob_hash'], items[2]['blob_hash']}
+
+
+@patch('app.bulk_job_executor')
+@patch('app.ProcessingService')
+@patch('app.get_db_connection')
+def test_bulk_submit_is_idempotent_and_ordered(mock_db, mock_service, mock_executor, client):
+    mock_service.return_value.create_jobs_bulk.return_value = [
+        {'job_uuid': 'job-1', 'idempotency_key': 'batch-7:1', 'created': True},
+        {'job_uuid': 'job-0', 'idempotency_key': 'own-key', 'created': False},
+    ]
+    body = (
+        '{"items": [{"type": "text", "content": "First"}], "processing": {"language": "en"}}\n'
+        '{"items": [{"type": "text", "content": "Second"}], "processing": {"language": "en"}, "idempotency_key": "own-key"}\n'
+    )
+
+    response = client.post('/api/submit/bulk', data=body, content_type='application/x-ndjson',
+                           headers={'Idempotency-Key': 'batch-7'})
+    assert response.status_code == 201
+    assert [j['job_uuid'] for j in response.get_json()['jobs']] == ['job-1', 'job-0']
+
+    specs = mock_service.return_value.create_jobs_bulk.call_args[0][0]
+    assert [s['idempotency_key'] for s in specs] == ['batch-7:1', 'own-key']
+    # The job that already existed is not processed again
+    assert mock_executor.submit.call_count == 1
+    assert mock_executor.submit.call_args[0][1] == 'job-1'
+
+
+def test_bulk_submit_rejects_invalid_lines(client):
+    response = client.post('/api/submit/bulk', data='{"items": []}\n', content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert 'Line 1' in response.get_json()['error']
+
+
+@patch('app.queue_job')
+@patch('app.ProcessingService')
+@patch('app.get_db_connection')
+def test_add_items_processes_only_the_new_items(mock_db, mock_service, mock_queue_job, client):
+    service = mock_service.return_value
+    service.get_job_status.return_value = {'job_uuid': 'job-1', 'status': 'completed'}
+    service.claim_job.return_value = 'completed'
+    service.add_items.return_value = 1
+    service.get_processing_config.return_value = {'language': 'en'}
+
+    response = client.post('/api/jobs/job-1/items', json={
+        'items': [{'type': 'link', 'content': 'https://example.com/new-article'}]
+    })
+    assert response.status_code == 202
+    assert response.get_json()['report_stale'] is True
+    service.add_items.assert_called_once_with('job-1', [{'type': 'link', 'content': 'https://example.com/new-article'}])
+    mock_queue_job.assert_called_once_with('job-1', {'language': 'en'}, None)
+    # The claimed job stays processing for the run that was started
+    service.release_job.assert_not_called()
+
+
+@patch('app.ProcessingService')
+@patch('app.get_db_connection')
+def test_add_items_without_processing_releases_the_job(mock_db, mock_service, client):
+    service = mock_service.return_value
+    service.get_job_status.return_value = {'job_uuid': 'job-1', 'status': 'completed'}
+    service.claim_job.return_value = 'completed'
+    service.add_items.return_value = 1
+    service.get_processing_config.return_value = None
+
+    response = client.post('/api/jobs/job-1/items', json={'items': [{'type': 'text', 'content': 'More'}]})
+    assert response.status_code == 201
+    service.release_job.assert_called_once_with('job-1', 'completed')
+
+
+@patch('app.ProcessingService')
+@patch('app.get_db_connection')
+def test_add_items_rejects_job_in_progress(mock_db, mock_service, client):
+    mock_service.return_value.get_job_status.return_value = {'job_uuid': 'job-1', 'status': 'processing'}
+    # Another request or run holds the job
+    mock_service.return_value.claim_job.return_value = None
+    response = client.post('/api/jobs/job-1/items', json={'items': [{'type': 'text', 'content': 'More'}]})
+    assert response.status_code == 409
+    mock_service.return_value.add_items.assert_not_called()
+
+
+@patch('app.refresh_executor')
+@patch('app.RefreshTaskRepository')
+@patch('app.JobRepository')
+@patch('app.get_db_connection')
+def test_refresh_is_queued_with_a_status_url(mock_db, mock_job_repo, mock_task_repo, mock_executor, client):
+    mock_job_repo.return_value.get_job_by_uuid.return_value = {'job_uuid': 'job-1', 'status': 'completed'}
+    mock_job_repo.return_value.claim_job.return_value = 'completed'
+    mock_task_repo.return_value.create_task.return_value = {'task_uuid': 'task-1', 'status': 'pending'}
+
+    response = client.post('/api/jobs/job-1/refresh')
+    assert response.status_code == 202
+    assert response.get_json()['status_url'] == '/api/jobs/job-1/refresh/tasks/task-1'
+    assert mock_executor.submit.call_args.args[1:] == ('task-1', 'job-1', 'completed')
+
+
+@patch('app.refresh_executor')
+@patch('app.JobRepository')
+@patch('app.get_db_connection')
+def test_refresh_rejects_job_in_progress(mock_db, mock_job_repo, mock_executor, client):
+    mock_job_repo.return_value.get_job_by_uuid.return_value = {'job_uuid': 'job-1', 'status': 'processing'}
+    mock_job_repo.return_value.claim_job.return_value = None
+
+    response = client.post('/api/jobs/job-1/refresh')
+    assert response.status_code == 409
+    mock_executor.submit.assert_not_called()
+
+
+@patch('app.queue_job')
+@patch('app.ProcessingService')
+@patch('app.get_db_connection')
+def test_resume_claims_the_job_before_starting_a_run(mock_db, mock_service, mock_queue_job, client):
+    service = mock_service.return_value
+    service.get_job_status.return_value = {'job_uuid': 'job-1', 'status': 'failed'}
+    service.get_processing_config.return_value = {'language': 'en'}
+    service.get_job_steps.return_value = []
+
+    service.claim_job.return_value = 'failed'
+    assert client.post('/api/jobs/job-1/resume').status_code == 202
+    service.claim_job.assert_called_once_with('job-1', False)
+    assert mock_queue_job.call_count == 1
+
+    # A concurrent resume (or a due retry) holds the job now
+    service.claim_job.return_value = None
+    assert client.post('/api/jobs/job-1/resume').status_code == 409
+    assert mock_queue_job.call_count == 1
+
+
+@patch('app.queue_job')
+@patch('app.JobRepository')
+@patch('app.get_db_connection')
+def test_due_retries_are_claimed_and_queued_with_their_stored_config(mock_db, mock_job_repo, mock_queue_job):
+    mock_job_repo.return_value.claim_due_retries.return_value = ['job-1', 'job-2']
+
+    app_module.queue_due_retries()
+
+    assert [c.args for c in mock_queue_job.call_args_list] == [('job-1', None, None), ('job-2', None, None)]
+
+
+@patch('app._metrics_conn', None)
+@patch('app.get_db_connection')
+def test_metrics_queries_reuse_one_connection(mock_get_db_connection):
+    conn = mock_get_db_connection.return_value
+    conn.closed = 0
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [('completed', 3)]
+
+    app_module._job_status_counts()
+    app_module._db_connection_counts()
+
+    mock_get_db_connection.assert_called_once()
+    conn.close.assert_not_called()
@@ -0,0 +1,57 @@
+import base64
+import hashlib
+import io
+import os
+import sys
+from unittest.mock import Mock
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.blob_store import BlobStore
+from services.job_service import JobService
+
+
+def test_blobs_are_content_addressed_and_deduplicated(tmp_path):
+    store = BlobStore(str(tmp_path))
+    data = b'%PDF-1.4 example' * 1000
+
+    blob_hash, size = store.put_bytes(data)
+    assert blob_hash == hashlib.sha256(data).hexdigest()
+    assert size == len(data)
+
+    # Same bytes streamed in chunks map to the same single blob
+    assert store.put_stream(io.BytesIO(data)) == (blob_hash, size)
+    files = [f for _, _, names in os.walk(tmp_path) for f in names]
+    assert files == [blob_hash]
+
+    with store.open(blob_hash) as f:
+        assert f.read() == data
+    with store.map(blob_hash) as mapped:
+        assert mapped[:8] == b'%PDF-1.4'
+
+
+def test_rejects_paths_that_are_not_hashes(tmp_path):
+    with pytest.raises(ValueError):
+        BlobStore(str(tmp_path)).path('../../etc/passwd')
+
+
+def test_blobs_of_items_that_were_not_stored_are_removed(tmp_path):
+    store = BlobStore(str(tmp_path))
+    shared_hash, _ = store.put_bytes(b'already stored')
+    service = JobService(Mock())
+    service.blob_store = store
+    service.job_repo = Mock()
+    service.item_repo = Mock()
+    service.item_repo.create_item.side_effect = RuntimeError('insert failed')
+    service.item_repo.get_referenced_blob_hashes.return_value = set()
+    files = [{'type': 'file', 'content': base64.b64encode(data).decode()} for data in (b'new file', b'already stored')]
+
+    with pytest.raises(RuntimeError):
+        service.create_job(files)
+
+    # Only the blob this call added is removed; the one that existed before is left alone
+    service.item_repo.get_referenced_blob_hashes.assert_called_once_with([hashlib.sha256(b'new file').hexdigest()])
+    assert not store.exists(hashlib.sha256(b'new file').hexdigest())
+    assert store.exists(shared_hash)
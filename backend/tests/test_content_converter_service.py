@@ -0,0 +1,69 @@
+import sys
+import os
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.blob_store import BlobStore
+from services.content_converter_service import ContentConverterService, needs_browser
+
+ARTICLE = '<html><body><article>' + '<p>The port of Atlantis reported record cargo volumes this quarter.</p>' * 20 + \
+          '</article></body></html>'
+APP_SHELL = '<html><body><div id="root"></div><noscript>Please enable JavaScript</noscript>' \
+            '<script src="/app.js"></script></body></html>'
+
+
+def _response(text, content_type='text/html; charset=utf-8'):
+    response = Mock()
+    response.text = text
+    response.content = text.encode('utf-8')
+    response.headers = {'Content-Type': content_type, 'ETag': '"a1"'}
+    return response
+
+
+def test_needs_browser_detects_javascript_shells_only():
+    assert needs_browser(ARTICLE) is None
+    assert needs_browser(APP_SHELL) == 'little_text'
+
+
+@patch('services.content_converter_service.http_session')
+def test_static_page_is_fetched_over_plain_http(mock_session):
+    mock_session.return_value.get.return_value = _response(ARTICLE)
+    converter = ContentConverterService()
+    converter._fetch_rendered_html = Mock()
+
+    result = converter._convert_url({'id': 1, 'type': 'link', 'content': 'https://example.com/news'})
+
+    assert result['conversion_success'] and 'record cargo volumes' in result['content']
+    assert result['fetch_tier'] == 'http' and result['etag'] == '"a1"' and result['response_hash']
+    converter._fetch_rendered_html.assert_not_called()
+
+
+@patch('services.content_converter_service.http_session')
+def test_javascript_page_escalates_to_the_browser(mock_session):
+    mock_session.return_value.get.return_value = _response(APP_SHELL)
+    converter = ContentConverterService()
+    converter._fetch_rendered_html = Mock(return_value=(ARTICLE, {'etag': '"b2"'}))
+
+    result = converter._convert_url({'id': 1, 'type': 'link', 'content': 'https://example.com/app'})
+
+    assert result['fetch_tier'] == 'browser' and result['etag'] == '"b2"'
+    assert result['response_hash'] is None
+    assert 'record cargo volumes' in result['content']
+
+
+@patch('services.content_converter_service.http_session')
+def test_prefetched_body_is_converted_without_another_request(mock_session, tmp_path):
+    converter = ContentConverterService()
+    converter.blob_store = BlobStore(str(tmp_path))
+    blob_hash, size = converter.blob_store.put_bytes(ARTICLE.encode('utf-8'))
+    converter.prefetch({'https://example.com/news': {
+        'url': 'https://example.com/news', 'status_code': 200, 'headers': {'content-type': 'text/html'},
+        'encoding': 'utf-8', 'blob_hash': blob_hash, 'size': size, 'fetch_ms': 12.5, 'error': None
+    }})
+
+    result = converter._convert_url({'id': 1, 'type': 'link', 'content': 'https://example.com/news'})
+
+    assert 'record cargo volumes' in result['content']
+    assert result['fetch_tier'] == 'http' and result['fetch_ms'] == 12.5 and result['response_hash'] == blob_hash
+    mock_session.return_value.get.assert_not_called()
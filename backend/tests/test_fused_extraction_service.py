@@ -0,0 +1,36 @@
+import sys
+import os
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.fused_extraction_service import FusedExtractionService
+
+
+def test_chunk_text_respects_size_and_paragraphs():
+    text = "\n\n".join(["a" * 40, "b" * 40, "c" * 120])
+    chunks = FusedExtractionService.chunk_text(text, 100)
+    assert all(len(c) <= 100 for c in chunks)
+    assert chunks[0] == "a" * 40 + "\n\n" + "b" * 40
+    assert "".join(chunks[1:]) == "c" * 120
+
+
+def test_chunk_text_skips_whitespace_only_chunks():
+    text = "a" * 90 + "\n\n" + " " * 150 + "\n\n\n\n" + "b" * 20
+    chunks = FusedExtractionService.chunk_text(text, 100)
+    assert chunks and all(c.strip() for c in chunks)
+    assert chunks[0] == "a" * 90 and chunks[-1].strip() == "b" * 20
+
+
+@patch('services.fused_extraction_service.LLMClient')
+def test_extract_drops_out_of_range_fact_indices(mock_client):
+    mock_client.return_value.generate_json.return_value = {
+        'facts': ['Atlantis signed an energy deal with Finland'],
+        'predictions': [{'prediction': 'Energy prices in Atlantis will stabilise', 'source_fact_ids': [0, 5]}],
+        'unknowns': ['Terms of the energy agreement are not public']
+    }
+
+    result = FusedExtractionService().extract('text', 'en')
+
+    assert result['predictions'][0]['source_fact_ids'] == [0]
+    assert len(result['unknowns']) == 1
@@ -0,0 +1,37 @@
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.instrumentation import mark_item, profile_step, record
+from services.llm_scheduler import BATCH, llm_context
+
+
+def test_step_profile_collects_per_item_counters_across_threads():
+    with llm_context('job-1', BATCH):
+        with profile_step(1) as profile:
+            mark_item(10)
+            record(llm_calls=1, llm_ms=120.0, prompt_tokens=800)
+            mark_item(11)
+            record(conversions=1, bytes_fetched=2048)
+            mark_item(None)
+
+            def report_call():
+                with llm_context('job-1', BATCH):
+                    record(llm_calls=1, completion_tokens=300)
+
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                pool.submit(report_call).result()
+
+        # Calls for another job are not attributed to this one
+        with llm_context('job-2', BATCH):
+            record(llm_calls=5)
+
+    result = profile.finish()
+    assert result['llm_calls'] == 2
+    assert result['prompt_tokens'] == 800 and result['completion_tokens'] == 300
+    assert result['items']['10']['llm_ms'] == 120.0
+    assert result['items']['11']['bytes_fetched'] == 2048
+    assert result['items']['11']['llm_calls'] == 0
+    assert result['peak_rss_mb'] > 0
@@ -0,0 +1,55 @@
+import sys
+import os
+import asyncio
+from collections import Counter
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.blob_store import BlobStore
+from services.link_fetcher import LinkFetcher
+
+
+def test_fetches_concurrently_within_global_and_per_host_limits(tmp_path):
+    active = Counter()
+    peak = Counter()
+
+    async def handler(request):
+        host = request.url.host
+        active[host] += 1
+        active['all'] += 1
+        peak[host] = max(peak[host], active[host])
+        peak['all'] = max(peak['all'], active['all'])
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+        active['all'] -= 1
+        return httpx.Response(200, headers={'Content-Type': 'text/html', 'ETag': '"x"'}, content=f"<p>{request.url}</p>".encode())
+
+    urls = [f"https://{host}.example/{n}" for host in ('a', 'b', 'c') for n in range(6)]
+    fetcher = LinkFetcher(BlobStore(str(tmp_path)), concurrency=5, per_host=2, transport=httpx.MockTransport(handler))
+
+    results = fetcher.fetch_all(urls + urls[:3])
+
+    assert len(results) == 18 and all(r['error'] is None for r in results.values())
+    assert peak['all'] <= 5 and max(peak[h] for h in ('a.example', 'b.example', 'c.example')) <= 2
+    first = results['https://a.example/0']
+    assert first['headers']['etag'] == '"x"'
+    with fetcher.blob_store.open(first['blob_hash']) as f:
+        assert f.read() == b'<p>https://a.example/0</p>'
+
+
+def test_oversized_and_failed_responses_are_errors(tmp_path):
+    def handler(request):
+        if request.url.path == '/big':
+            return httpx.Response(200, content=b'x' * 2048)
+        return httpx.Response(404, content=b'missing')
+
+    fetcher = LinkFetcher(BlobStore(str(tmp_path)), max_bytes=1024, transport=httpx.MockTransport(handler))
+
+    results = fetcher.fetch_all(['https://a.example/big', 'https://a.example/gone'])
+
+    assert 'larger than 1024' in results['https://a.example/big']['error']
+    assert results['https://a.example/big']['blob_hash'] is None
+    assert results['https://a.example/gone']['error'] == 'HTTP 404'
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith('.upload-')] == []
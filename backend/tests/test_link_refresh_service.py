@@ -0,0 +1,82 @@
+import sys
+import os
+from unittest.mock import MagicMock, Mock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.blob_store import BlobStore
+from services.link_refresh_service import LinkRefreshService
+
+ITEM = {'id': 7, 'type': 'link', 'content': 'https://example.com/article'}
+
+
+def _service(tmp_path, snapshot=None):
+    service = LinkRefreshService(Mock(), content_converter=Mock())
+    service.blob_store = BlobStore(str(tmp_path))
+    service.snapshot_repo = Mock()
+    service.step_service = Mock()
+    service.job_repo = Mock()
+    service.item_repo = Mock()
+    service.item_repo.get_link_items.return_value = [ITEM]
+    if snapshot is not None:
+        markdown_hash, _ = service.blob_store.put_bytes(snapshot.pop('markdown').encode('utf-8'))
+        service.snapshot_repo.get_snapshot.return_value = dict(snapshot, markdown_hash=markdown_hash)
+    else:
+        service.snapshot_repo.get_snapshot.return_value = None
+    return service
+
+
+def _response(status_code, body=b'', headers=None):
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.iter_content.return_value = [body]
+    return response
+
+
+@patch('services.link_refresh_service.http_session')
+def test_not_modified_source_is_neither_downloaded_nor_rendered(mock_session, tmp_path):
+    mock_get = mock_session.return_value.get
+    service = _service(tmp_path, {'markdown': '# Page', 'etag': '"v1"', 'last_modified': None, 'response_hash': 'abc'})
+    mock_get.return_value = _response(304)
+
+    summary = service.refresh_job('job-1')
+
+    assert mock_get.call_args.kwargs['headers']['If-None-Match'] == '"v1"'
+    assert summary['not_modified'] == 1 and summary['changed'] == []
+    service.content_converter.convert_items_to_text.assert_not_called()
+    service.step_service.reopen_steps.assert_not_called()
+    service.job_repo.mark_report_stale.assert_not_called()
+
+
+@patch('services.link_refresh_service.http_session')
+def test_rendered_page_with_same_markdown_is_unchanged(mock_session, tmp_path):
+    mock_get = mock_session.return_value.get
+    service = _service(tmp_path, {'markdown': '# Page', 'etag': None, 'last_modified': None, 'response_hash': 'old'})
+    mock_get.return_value = _response(200, b'<html>new ad slot</html>', {'ETag': '"v2"'})
+    service.content_converter.convert_items_to_text.return_value = [{'content': '# Page', 'conversion_success': True}]
+
+    summary = service.refresh_job('job-1')
+
+    assert summary['unchanged'] == 1 and summary['changed'] == []
+    assert service.snapshot_repo.save_snapshot.call_args.args[2] == '"v2"'
+    service.step_service.reopen_steps.assert_not_called()
+
+
+@patch('services.link_refresh_service.http_session')
+def test_changed_markdown_reopens_only_that_item(mock_session, tmp_path):
+    mock_get = mock_session.return_value.get
+    service = _service(tmp_path, {'markdown': '# Page', 'etag': None, 'last_modified': None, 'response_hash': 'old'})
+    mock_get.return_value = _response(200, b'<html>updated</html>')
+    service.content_converter.convert_items_to_text.return_value = [{'content': '# Page v2', 'conversion_success': True}]
+
+    summary = service.refresh_job('job-1')
+
+    assert summary['changed'] == [7]
+    service.step_service.reopen_steps.assert_called_once_with('job-1', [7], [3, 4])
+    service.job_repo.mark_report_stale.assert_called_once_with('job-1')
+    # The new version becomes the snapshot the re-run converts from, without rendering again
+    service.snapshot_repo.get_snapshot.return_value = {'markdown_hash': service.snapshot_repo.save_snapshot.call_args.args[1]}
+    assert service.convert_link(ITEM)['content'] == '# Page v2'
+    assert service.content_converter.convert_items_to_text.call_count == 1
@@ -0,0 +1,235 @@
+import contextlib
+import pytest
+import sys
+import os
+import threading
+import time
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.llm_client import LLMClient
+from services.llm_router import LLMEndpoint, LLMRouter
+from services.llm_schemas import FACTS_SCHEMA, PREDICTIONS_SCHEMA, SchemaValidationError, validate
+from services.prompts import static_prefix
+from services.stream_parsers import iter_json_array_items
+
+
+@pytest.fixture(autouse=True)
+def single_endpoint():
+    router = LLMRouter([LLMEndpoint('test-ollama', 'ollama', url='http://test-host:11434', model='test-model')])
+    with patch('services.llm_client.get_router', return_value=router):
+        yield router
+
+
+def _ollama_config(mock_config):
+    mock_config.LLM_PROVIDER = 'ollama'
+    mock_config.OLLAMA_PREFIX_CONTEXT = False
+    mock_config.LLM_TIMING_LOG = False
+
+
+def _ollama_response(text):
+    response = Mock()
+    response.status_code = 200
+    response.json.return_value = {'response': text}
+    return response
+
+
+@patch('services.llm_client.config')
+@patch('services.llm_client.requests.post')
+def test_generate_json_sends_schema_to_ollama(mock_post, mock_config):
+    _ollama_config(mock_config)
+    mock_post.return_value = _ollama_response('{"facts": ["Atlantis joined NATO in 1997"]}')
+
+    result = LLMClient().generate_json('prompt', FACTS_SCHEMA)
+
+    assert result == {'facts': ['Atlantis joined NATO in 1997']}
+    assert mock_post.call_args.kwargs['json']['format'] == FACTS_SCHEMA
+
+
+@patch('services.llm_client.config')
+@patch('services.llm_client.requests.post')
+def test_generate_json_rejects_schema_mismatch(mock_post, mock_config):
+    _ollama_config(mock_config)
+    mock_post.return_value = _ollama_response('{"predictions": [{"prediction": "x"}]}')
+
+    assert LLMClient().generate_json('prompt', PREDICTIONS_SCHEMA) is None
+
+
+def test_validate_rejects_wrong_item_type():
+    with pytest.raises(SchemaValidationError):
+        validate({'facts': ['ok', 3]}, FACTS_SCHEMA)
+
+
+@patch('services.llm_client.config')
+@patch('services.llm_client.requests.post')
+def test_prompts_start_with_shared_static_prefix(mock_post, mock_config):
+    _ollama_config(mock_config)
+    mock_post.return_value = _ollama_response('- something')
+
+    LLMClient('fact_extraction').generate('Extract facts', 'pl')
+    LLMClient('report_generation').generate('Generate report', 'pl')
+
+    prompts = [c.kwargs['json']['prompt'] for c in mock_post.call_args_list]
+    assert all(p.startswith(static_prefix('pl')) for p in prompts)
+
+
+@patch('services.llm_client.config')
+@patch('services.llm_client.requests.post')
+def test_prefix_context_is_prefilled_once(mock_post, mock_config):
+    _ollama_config(mock_config)
+    mock_config.OLLAMA_PREFIX_CONTEXT = True
+    prefill = _ollama_response('')
+    prefill.json.return_value = {'response': '', 'context': [1, 2, 3]}
+    mock_post.side_effect = [prefill, _ollama_response('a'), _ollama_response('b')]
+
+    client = LLMClient()
+    with patch.dict(LLMClient._prefix_contexts, clear=True), patch.dict(LLMClient._prefix_failures, clear=True):
+        client.generate('first', 'en')
+        client.generate('second', 'en')
+
+    assert mock_post.call_count == 3
+    assert mock_post.call_args.kwargs['json']['context'] == [1, 2, 3]
+    assert mock_post.call_args.kwargs['json']['prompt'] == 'second'
+
+
+@patch('services.llm_client.config')
+@patch('services.llm_client.requests.post')
+def test_failed_prefix_prefill_is_not_retried_on_every_call(mock_post, mock_config):
+    _ollama_config(mock_config)
+    mock_config.OLLAMA_PREFIX_CONTEXT = True
+    mock_post.side_effect = [Mock(status_code=500), _ollama_response('a'), _ollama_response('b')]
+
+    client = LLMClient()
+    with patch.dict(LLMClient._prefix_contexts, clear=True), patch.dict(LLMClient._prefix_failures, clear=True):
+        client.generate('first', 'en')
+        client.generate('second', 'en')
+
+    assert mock_post.call_count == 3
+    assert 'context' not in mock_post.call_args.kwargs['json']
+    assert mock_post.call_args.kwargs['json']['prompt'].endswith('second')
+
+
+@patch('services.llm_client.config')
+@patch('services.llm_client.requests.post')
+def test_stream_keeps_partial_output_when_connection_drops(mock_post, mock_config):
+    _ollama_config(mock_config)
+
+    def lines():
+        yield b'{"response": "- Atlantis joined ", "done": false}'
+        yield b'{"response": "NATO in 1997\\n- Second", "done": false}'
+        raise ConnectionError('stream reset')
+
+    response = Mock()
+    response.iter_lines.return_value = lines()
+    mock_post.return_value.__enter__ = Mock(return_value=response)
+    mock_post.return_value.__exit__ = Mock(return_value=False)
+
+    chunks = list(LLMClient().stream('prompt'))
+
+    assert ''.join(chunks) == '- Atlantis joined NATO in 1997\n- Second'
+    assert mock_post.call_args.kwargs['json']['stream'] is True
+
+
+def test_json_array_items_complete_across_fragments():
+    fragments = ['```json\n{"predictions": [{"prediction": "Energy prices [EU] ', 'rise", "source_fact_ids": [0, 2]},',
+                 ' {"prediction": "Escaped \\"quote\\" here", "source_fact_ids": []}', ', {"prediction": "cut o']
+
+    items = list(iter_json_array_items(fragments))
+
+    assert items == [
+        {'prediction': 'Energy prices [EU] rise', 'source_fact_ids': [0, 2]},
+        {'prediction': 'Escaped "quote" here', 'source_fact_ids': []}
+    ]
+
+
+@patch('services.llm_client.config')
+@patch('services.llm_client.requests.post')
+def test_failed_endpoint_fails_over_and_leaves_rotation(mock_post, mock_config):
+    _ollama_config(mock_config)
+    primary = LLMEndpoint('box-1', 'ollama', url='http://box-1:11434', languages=['pl'])
+    secondary = LLMEndpoint('box-2', 'ollama', url='http://box-2:11434', priority=1)
+    english = LLMEndpoint('box-en', 'ollama', url='http://box-en:11434', languages=['en'])
+    router = LLMRouter([english, secondary, primary], max_failures=1)
+
+    def post(url, **kwargs):
+        if url.startswith('http://box-1'):
+            failed = Mock(status_code=500, text='out of memory')
+            return failed
+        return _ollama_response('ok')
+
+    mock_post.side_effect = post
+    with patch('services.llm_client.get_router', return_value=router):
+        assert LLMClient().generate('prompt', 'pl') == 'ok'
+
+    assert [c.args[0] for c in mock_post.call_args_list] == [
+        'http://box-1:11434/api/generate', 'http://box-2:11434/api/generate'
+    ]
+    assert [e.name for e in router.candidates('pl')] == ['box-2', 'box-1']
+
+
+@patch('services.llm_client.get_scheduler')
+@patch('services.llm_client.config')
+@patch('services.llm_client.requests.post')
+def test_concurrent_calls_on_a_shared_client_keep_their_own_usage(mock_post, mock_config, mock_scheduler):
+    _ollama_config(mock_config)
+    mock_scheduler.return_value.slot.return_value = contextlib.nullcontext()
+    both_sent = threading.Barrier(2)
+
+    def post(url, json, timeout):
+        both_sent.wait(2)
+        response = _ollama_response(json['prompt'][-1])
+        response.json.return_value['prompt_eval_count'] = len(json['prompt'])
+        return response
+
+    mock_post.side_effect = post
+    client = LLMClient('report_section')
+    results = {}
+
+    def call(prompt):
+        results[prompt] = client._call_endpoints(prompt, 'en', 10, None)
+
+    threads = [threading.Thread(target=call, args=(prompt,)) for prompt in ('a', 'bb')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    prefix_length = len(f"{static_prefix('en')}\n\n")
+    assert results['a'][1]['prompt_tokens'] == prefix_length + 1
+    assert results['bb'][1]['prompt_tokens'] == prefix_length + 2
+
+
+def test_coalesced_call_takes_over_the_leaders_usage():
+    release = threading.Event()
+    usage = {'provider': 'ollama', 'endpoint': 'test-ollama', 'model': 'test-model', 'prompt_tokens': 120,
+             'completion_tokens': 30}
+
+    def call_endpoints(self, prompt, *args):
+        if prompt != 'same prompt':
+            # Another call of the leader's client, finishing while the coalesced one is in flight
+            return 'other answer', dict(usage, prompt_tokens=999, service=self.service)
+        release.wait(2)
+        return 'shared answer', dict(usage, service=self.service)
+
+    leader, follower = LLMClient('fact_extraction'), LLMClient('prediction_extraction')
+    with patch.object(LLMClient, '_call_endpoints', call_endpoints), \
+            patch.object(LLMClient, '_record_shared_usage', autospec=True,
+                         side_effect=LLMClient._record_shared_usage) as mock_shared, \
+            patch('services.llm_client.record') as mock_record:
+        threads = [threading.Thread(target=client.generate, args=('same prompt', 'en')) for client in (leader, follower)]
+        threads[0].start()
+        deadline = time.monotonic() + 2
+        while not LLMClient._flights.metrics()['in_flight'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        threads[1].start()
+        while not LLMClient._flights.metrics()['waiting'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert leader.generate('other prompt', 'en') == 'other answer'
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    assert mock_shared.call_count == 1
+    assert mock_shared.call_args.args[0] is follower and mock_shared.call_args.args[1]['prompt_tokens'] == 120
+    mock_record.assert_called_once_with(prompt_tokens=120, completion_tokens=30)
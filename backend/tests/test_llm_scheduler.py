@@ -0,0 +1,44 @@
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.llm_scheduler import BATCH, INTERACTIVE, LLMScheduler, llm_context
+
+
+def _queued(scheduler):
+    priorities = scheduler.metrics()['ollama']['priorities']
+    return sum(p['queued'] for p in priorities.values())
+
+
+def test_interactive_first_then_round_robin_across_jobs():
+    scheduler = LLMScheduler({'ollama': {'concurrency': 1}})
+    order = []
+
+    def call(label, job_key, priority):
+        with llm_context(job_key, priority):
+            with scheduler.slot('ollama'):
+                order.append(label)
+
+    scheduler.acquire('ollama')
+    threads = []
+    for label, job_key, priority in [
+        ('a1', 'job-a', BATCH), ('a2', 'job-a', BATCH), ('b1', 'job-b', BATCH), ('report', 'job-c', INTERACTIVE)
+    ]:
+        expected = len(threads) + 1
+        thread = threading.Thread(target=call, args=(label, job_key, priority))
+        thread.start()
+        threads.append(thread)
+        while _queued(scheduler) < expected:
+            time.sleep(0.01)
+
+    scheduler.release('ollama')
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert order == ['report', 'a1', 'b1', 'a2']
+    metrics = scheduler.metrics()['ollama']
+    assert metrics['active'] == 0
+    assert metrics['priorities'][BATCH]['admitted'] == 4
@@ -0,0 +1,47 @@
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.metrics import Registry
+
+# No process has this pid: stands in for a worker that has exited
+EXITED_PID = 2 ** 22 + 1
+
+
+def _registry(directory):
+    registry = Registry(str(directory) if directory else None)
+    requests = registry.counter('requests_total', 'Requests', ('route',))
+    latency = registry.histogram('latency_seconds', 'Latency', (), (1, 5))
+    running = registry.gauge('running', 'Running jobs')
+    registry.gauge('jobs', 'Jobs from the database', ('status',), lambda: {('done',): 7}, aggregate=False)
+    return registry, requests, latency, running
+
+
+def test_samples_of_all_workers_are_summed(tmp_path):
+    (tmp_path / f'worker-{EXITED_PID}.json').write_text(json.dumps({'pid': EXITED_PID, 'metrics': {
+        'requests_total': [[['/health'], 3]],
+        'latency_seconds': [[[], [1, 2, 2, 4.5, 2]]],
+        'running': [[[], 5]]
+    }}))
+    registry, requests, latency, running = _registry(tmp_path)
+    requests.inc(route='/health')
+    latency.observe(0.5)
+    running.inc()
+
+    body = registry.render()
+
+    assert 'requests_total{route="/health"} 4' in body
+    assert 'latency_seconds_bucket{le="1.0"} 2' in body and 'latency_seconds_count 3' in body
+    # Gauges of the exited worker no longer count; database gauges are not multiplied per worker
+    assert 'running 1' in body
+    assert 'jobs{status="done"} 7' in body
+    assert 'pid=' not in body
+
+
+def test_without_a_directory_each_worker_reports_its_own_samples():
+    registry, requests, _, _ = _registry(None)
+    requests.inc(route='/health')
+
+    assert f'requests_total{{route="/health",pid="{os.getpid()}"}} 1' in registry.render()
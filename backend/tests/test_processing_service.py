@@ -0,0 +1,166 @@
+import sys
+import os
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.processing_service import ProcessingService
+
+
+def test_time_horizons_accepts_list_or_single_value():
+    assert ProcessingService._time_horizons({'time_horizons': ['1 year', '3 years', '1 year']}) == ['1 year', '3 years']
+    assert ProcessingService._time_horizons({'time_horizon': '3 years'}) == ['3 years']
+    assert ProcessingService._time_horizons({}) == ['1 year']
+
+
+@patch('repositories.job_repository.JobRepository')
+def test_report_generated_per_horizon_from_shared_nodes(mock_job_repository):
+    service = ProcessingService(Mock())
+    service.step_service = Mock()
+    service.node_repository = Mock()
+    service.node_repository.get_nodes_by_job.return_value = [{'id': 'f1', 'type': 'fact', 'value': 'fact'}]
+    service.node_repository.get_node_relations.return_value = []
+    service.job_report_repository = Mock()
+    service.report_service = Mock()
+    service.report_service.generate_report.side_effect = lambda *args, **kwargs: {'time_horizon': args[5]}
+
+    service._generate_report('job-1', 'en', 5, ['1 year', '3 years'])
+
+    service.node_repository.get_nodes_by_job.assert_called_once_with('job-1')
+    saved = {call.args[1]: call.args[3] for call in service.job_report_repository.save_report.call_args_list}
+    assert saved == {'1 year': {'time_horizon': '1 year'}, '3 years': {'time_horizon': '3 years'}}
+    mock_job_repository.return_value.save_report.assert_called_once_with('job-1', {'time_horizon': '1 year'})
+
+
+def _service_with_mocks():
+    service = ProcessingService(Mock())
+    for name in ('job_service', 'step_service', 'fact_storage_service', 'node_repository', 'content_converter',
+                 'fact_extraction_service'):
+        setattr(service, name, Mock())
+    return service
+
+
+def test_resumed_job_skips_completed_steps():
+    service = _service_with_mocks()
+    service.job_service.get_job_status.return_value = {'items': [{'id': 1, 'type': 'text'}]}
+    service.step_service.get_job_steps.return_value = [
+        {'id': 10 + n, 'step_number': n, 'status': 'completed', 'metadata': {}} for n in range(1, 5)
+    ] + [{'id': 15, 'step_number': 5, 'status': 'failed', 'metadata': {}}]
+    service.fact_storage_service.get_step_fact_ids.return_value = [7, 8]
+    service._generate_report = Mock()
+
+    service.process_job('job-1', {'language': 'en', 'extraction_mode': 'sequential'})
+
+    service.fact_storage_service.get_step_fact_ids.assert_called_once_with(11)
+    service.content_converter.convert_items_to_text.assert_not_called()
+    service._generate_report.assert_called_once_with('job-1', 'en', 5, ['1 year'])
+    service.job_service.update_job_status.assert_called_with('job-1', 'completed')
+
+
+@patch('services.processing_service.config')
+def test_interrupted_extraction_skips_finished_items_and_redoes_partial_one(mock_config):
+    mock_config.LLM_STREAMING = False
+    service = _service_with_mocks()
+    service.step_service.create_step.return_value = 21
+    service.job_service.get_item_content.return_value = {'content': 'Text', 'blob_hash': None}
+    service.content_converter.convert_items_to_text.return_value = [{'content': 'Text'}]
+    service.fact_extraction_service.extract_facts.return_value = ['A fact']
+    service.fact_storage_service.get_step_fact_ids.return_value = [1, 2]
+    previous = {'id': 21, 'status': 'failed', 'metadata': {'completed_items': [1]}}
+
+    fact_ids = service._extract_facts('job-1', [{'id': 1, 'type': 'text'}, {'id': 2, 'type': 'text'}],
+                                      'en', 1, previous)
+
+    assert service.content_converter.convert_items_to_text.call_count == 1
+    service.fact_storage_service.delete_item_facts.assert_called_once_with(21, 2)
+    service.node_repository.delete_job_nodes.assert_called_once_with('job-1', ['fact_extraction'], 2)
+    service.step_service.checkpoint_item.assert_called_once_with(21, 2)
+    assert fact_ids == [1, 2]
+
+
+def test_reasoning_step_extracts_from_new_items_only_and_keeps_existing_nodes():
+    service = _service_with_mocks()
+    service._extract_predictions = Mock()
+    steps = {3: {'id': 13, 'step_number': 3, 'status': 'pending', 'metadata': {'completed_items': [1, 2]}}}
+    items = [{'id': 1, 'type': 'text'}, {'id': 2, 'type': 'text'}, {'id': 3, 'type': 'link'}]
+
+    service._run_reasoning('job-1', 3, items, 'en', 'sequential', steps)
+
+    new_items, batch = service._extract_predictions.call_args.args[1], service._extract_predictions.call_args.args[4]
+    assert new_items == [{'id': 3, 'type': 'link'}]
+    # Only nodes of an interrupted run of this same batch are removed
+    service.node_repository.delete_job_nodes.assert_called_once_with(
+        'job-1', ['prediction_extraction', 'prediction_extraction_fallback'], batch=batch
+    )
+
+
+def test_restarted_reasoning_step_replaces_all_its_nodes():
+    service = _service_with_mocks()
+    service._extract_unknowns = Mock()
+    # A changed link source cleared the step's checkpoint
+    steps = {4: {'id': 14, 'step_number': 4, 'status': 'pending', 'metadata': {}}}
+    items = [{'id': 1, 'type': 'text'}, {'id': 2, 'type': 'link'}]
+
+    service._run_reasoning('job-1', 4, items, 'en', 'sequential', steps)
+
+    assert service._extract_unknowns.call_args.args[1] == items
+    service.node_repository.delete_job_nodes.assert_called_once_with('job-1', ['unknown_extraction'], batch=None)
+
+
+@patch('services.processing_service.config')
+def test_transient_failure_leaves_job_retrying_and_returns_the_delay(mock_config):
+    mock_config.JOB_MAX_ATTEMPTS = 3
+    mock_config.JOB_RETRY_DELAY = 30
+    service = _service_with_mocks()
+    service.job_service.start_attempt.return_value = 2
+    service.job_service.get_job_status.side_effect = requests.ConnectionError('connection reset')
+
+    assert service.run_job('job-1', {'language': 'en'}) == 60
+    service.job_service.schedule_retry.assert_called_once_with('job-1', 60, 'connection reset')
+
+
+@patch('services.processing_service.config')
+def test_permanent_or_last_failure_marks_job_failed(mock_config):
+    mock_config.JOB_MAX_ATTEMPTS = 2
+    service = _service_with_mocks()
+    service.job_service.start_attempt.return_value = 1
+    service.job_service.get_job_status.side_effect = ValueError('bad item')
+
+    with pytest.raises(ValueError):
+        service.run_job('job-1', {'language': 'en'})
+    service.job_service.update_job_status.assert_called_with('job-1', 'failed', 'bad item')
+
+    service.job_service.start_attempt.return_value = 2
+    service.job_service.get_job_status.side_effect = requests.Timeout('read timeout')
+    with pytest.raises(requests.Timeout):
+        service.run_job('job-1', {'language': 'en'})
+    service.job_service.update_job_status.assert_called_with('job-1', 'failed', 'read timeout')
+
+
+@patch('services.processing_service.config')
+def test_fact_stream_is_closed_once_enough_facts_are_read(mock_config):
+    mock_config.LLM_STREAMING = True
+    service = _service_with_mocks()
+    service.step_service.create_step.return_value = 21
+    service.job_service.get_item_content.return_value = {'content': 'Text', 'blob_hash': None}
+    service.content_converter.convert_items_to_text.return_value = [{'content': 'Text'}]
+    service.fact_storage_service.get_step_fact_ids.return_value = []
+    closed = []
+
+    def stream_facts(content, language):
+        try:
+            for n in range(100):
+                yield f'Fact number {n}'
+        finally:
+            closed.append(n)
+
+    service.fact_extraction_service.stream_facts.side_effect = stream_facts
+
+    service._extract_facts('job-1', [{'id': 1, 'type': 'text'}], 'en', 1, None)
+
+    assert service.fact_storage_service.store_extracted_fact.call_count == 20
+    # Closed right after the 20th fact instead of when the generator is garbage collected
+    assert closed == [19]
@@ -0,0 +1,57 @@
+import pytest
+import sys
+import os
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.llm_router import LLMEndpoint, LLMRouter
+from services.prompt_budget import PromptBuilder, get_token_counter, tokenizer_source
+from services.prompts import static_prefix
+
+
+def _builder(context_tokens):
+    router = LLMRouter([LLMEndpoint('test', 'ollama', url='http://test:11434', model='budget-test-model')])
+    with patch('services.prompt_budget.get_router', return_value=router), \
+            patch('services.prompt_budget.config') as mock_config:
+        mock_config.LLM_CONTEXT_WINDOWS = ''
+        mock_config.LLM_TOKENIZERS = ''
+        mock_config.LLM_CONTEXT_TOKENS = context_tokens
+        return PromptBuilder('test', 'en', max_output_tokens=100)
+
+
+def test_sections_are_packed_by_priority_within_budget():
+    counter = get_token_counter('budget-test-model')
+    # Room for the instructions, the facts and roughly 200 tokens of text
+    context = counter.count(static_prefix('en')) + 100 + 64 + 400
+    builder = _builder(context)
+    facts = [f"- fact number {i} about Atlantis energy policy" for i in range(10)]
+
+    builder.add_text('instructions', 'Extract things.\n\n')
+    builder.add_parts('text', ['a' * 5000, 'b' * 5000], priority=2)
+    builder.add_items('facts', facts, priority=1, header='\n\nFacts:\n')
+    prompt = builder.build()
+
+    assert prompt.startswith('Extract things.\n\n')
+    assert all(f in prompt for f in facts)
+    assert builder.stats['sections']['facts']['items'] == '10/10'
+    assert builder.stats['sections']['text']['truncated']
+    # Both parts get a fair share of what is left
+    assert 'a' * 100 in prompt and 'b' * 100 in prompt
+    assert builder.stats['used'] <= builder.budget()
+
+
+def test_default_models_have_a_tokenizer():
+    with patch('services.prompt_budget.config') as mock_config:
+        mock_config.LLM_TOKENIZERS = '{"qwen3:30b-a3b": "/models/qwen3/tokenizer.json"}'
+        assert tokenizer_source('qwen3:30b-a3b') == '/models/qwen3/tokenizer.json'
+        assert tokenizer_source('qwen3:8b') == 'Qwen/Qwen3-8B'
+        assert tokenizer_source('@cf/meta/llama-3.1-70b-instruct') == 'unsloth/Meta-Llama-3.1-8B-Instruct'
+        assert tokenizer_source('mistral:7b') is None
+
+
+def test_budget_without_room_for_the_prompt_is_an_error():
+    builder = _builder(500)
+    builder.add_text('instructions', 'Extract things.\n\n')
+    with pytest.raises(ValueError):
+        builder.build()
@@ -0,0 +1,49 @@
+import sys
+import os
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.report_generation_service import ReportGenerationService
+
+
+FACTS = [{'id': 'f1', 'type': 'fact', 'value': 'Atlantis joined NATO in 1997'}]
+PREDICTIONS = [{'id': 'p1', 'type': 'prediction', 'value': 'Energy prices in Atlantis will rise'}]
+UNKNOWNS = [{'id': 'u1', 'type': 'missing_information', 'value': 'Size of strategic gas reserves'}]
+
+
+@patch('services.report_generation_service.config')
+def test_only_sections_with_changed_inputs_are_regenerated(mock_config):
+    mock_config.REPORT_SECTIONS = True
+    mock_config.REPORT_SECTION_WORKERS = 4
+    mock_config.LLM_STRUCTURED_OUTPUT = False
+    repository = Mock()
+    service = ReportGenerationService(repository)
+
+    first_hashes = {
+        name: service._section_hash(name, {'facts': FACTS, 'predictions': PREDICTIONS, 'unknowns': UNKNOWNS, 'relations': []}, 'en', '1 year')
+        for name in ('summary', 'positive_scenario', 'negative_scenario', 'recommendations')
+    }
+    # A new unknown only affects the sections that read unknowns
+    changed_unknowns = UNKNOWNS + [{'id': 'u2', 'type': 'missing_information', 'value': 'Stance of the northern neighbour'}]
+    repository.get_sections.return_value = {
+        first_hashes['positive_scenario']: 'cached positive',
+        first_hashes['summary']: 'stale summary'
+    }
+
+    with patch.object(service, '_build_section_prompt', side_effect=lambda name, *a: name), \
+            patch.object(service.llm_client, 'generate', side_effect=lambda prompt, *a, **kw: (
+                '{"recommendations": []}' if prompt == 'recommendations' else f'{{"{prompt}": "new {prompt}"}}'
+            )):
+        report = service.generate_report(FACTS, PREDICTIONS, changed_unknowns, [], 'en', '1 year', job_uuid='job-1')
+
+    assert report['positive_scenario'] == 'cached positive'
+    assert report['summary'] == 'new summary'
+    assert report['negative_scenario'] == 'new negative_scenario'
+    assert report['recommendations'] == []
+    assert report['metadata']['sections'] == {
+        'summary': 'generated', 'positive_scenario': 'cached',
+        'negative_scenario': 'generated', 'recommendations': 'generated'
+    }
+    saved = sorted(c.args[1] for c in repository.save_section.call_args_list)
+    assert saved == ['negative_scenario', 'recommendations', 'summary']
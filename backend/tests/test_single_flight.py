@@ -0,0 +1,67 @@
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.single_flight import SingleFlight, flight_key
+
+
+def test_concurrent_identical_calls_run_once():
+    flights = SingleFlight('test')
+    calls = []
+    release = threading.Event()
+
+    def render():
+        calls.append(1)
+        release.wait(2)
+        return {'content': 'page'}
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flights.do, flight_key('link', 'https://example.com'), render) for _ in range(4)]
+        # Let the followers attach to the leader's flight
+        deadline = time.monotonic() + 2
+        while flights.metrics()['waiting'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r == {'content': 'page'} for r in results)
+    assert flights.metrics() == {'in_flight': 0, 'waiting': 0, 'executed': 1, 'shared': 3}
+
+
+def test_failure_is_shared_and_not_cached():
+    flights = SingleFlight('test')
+
+    def fail():
+        raise RuntimeError('render failed')
+
+    with pytest.raises(RuntimeError):
+        flights.do('key', fail)
+    # A later call runs again instead of reusing the failure
+    assert flights.do('key', lambda: 'ok') == 'ok'
+
+
+@patch('services.single_flight.config')
+def test_advisory_lock_is_held_on_its_own_connection(mock_config):
+    mock_config.SINGLE_FLIGHT = True
+    mock_config.SINGLE_FLIGHT_ADVISORY_LOCKS = True
+    mock_config.SINGLE_FLIGHT_LOCK_TIMEOUT = 5
+    lock_conn = Mock()
+    # Held by another process on the first try, free once it has stored the result
+    lock_conn.cursor.return_value.fetchone.side_effect = [(False,), (True,)]
+    lookups = iter([None, 'stored by another process'])
+
+    result = SingleFlight('test').do(flight_key('section'), lambda: 'generated',
+                                     connection_factory=lambda: lock_conn, lookup=lambda: next(lookups))
+
+    assert result == 'stored by another process'
+    assert lock_conn.autocommit is True
+    lock_conn.commit.assert_not_called()
+    lock_conn.close.assert_called_once()
@@ -0,0 +1,52 @@
+import sys
+import os
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.llm_scheduler import BATCH, current_context, llm_context
+from services.step_executor import PipelineStep, StepExecutor
+
+
+def test_independent_steps_run_in_parallel_after_their_dependencies():
+    barrier = threading.Barrier(3, timeout=5)
+    seen = {}
+
+    def middle(number):
+        def run(results):
+            assert results == {1: ['fact']}
+            seen[number] = current_context()
+            barrier.wait()  # only passes if steps 2, 3 and 4 run at the same time
+            return number
+        return run
+
+    steps = [
+        PipelineStep(1, 'extract', lambda results: ['fact']),
+        PipelineStep(2, 'validate', middle(2), depends_on=(1,)),
+        PipelineStep(3, 'predict', middle(3), depends_on=(1,)),
+        PipelineStep(4, 'unknowns', middle(4), depends_on=(1,)),
+        PipelineStep(5, 'report', lambda results: sorted(results), depends_on=(2, 3, 4)),
+    ]
+    with llm_context('job-1', BATCH):
+        results = StepExecutor(steps, max_workers=3).run()
+
+    assert results[5] == [2, 3, 4]
+    assert seen[3] == {'job_key': 'job-1', 'priority': BATCH, 'step': 3}
+
+
+def test_failed_step_stops_dependent_steps():
+    ran = []
+
+    def fail(results):
+        raise RuntimeError('LLM unavailable')
+
+    steps = [
+        PipelineStep(1, 'extract', lambda results: ran.append(1)),
+        PipelineStep(2, 'predict', fail, depends_on=(1,)),
+        PipelineStep(3, 'report', lambda results: ran.append(3), depends_on=(2,)),
+    ]
+    with pytest.raises(RuntimeError):
+        StepExecutor(steps, max_workers=2).run()
+    assert ran == [1]
@@ -0,0 +1,49 @@
+import sys
+import os
+import threading
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tracing
+from tracing import FileExporter, current_span, render_waterfall, span, traced, use_span, waterfall
+
+
+@traced
+class FakeRepository:
+    def get_items(self, job_uuid):
+        return ['item']
+
+
+def test_job_spans_form_a_waterfall_across_threads(tmp_path):
+    exporter = FileExporter(str(tmp_path / 'spans.jsonl'))
+    with patch.object(tracing, '_exporter', exporter):
+        with span('submit_job') as submit:
+            submit.job_uuid = 'job-1'
+
+        def background():
+            with use_span(submit), span('process_job', job_uuid='job-1'):
+                with span('step 1'):
+                    FakeRepository().get_items('job-1')
+
+        thread = threading.Thread(target=background)
+        thread.start()
+        thread.join()
+
+        with span('process_job', job_uuid='job-2'):
+            pass
+
+    rows = waterfall(exporter.read_job('job-1'))
+    assert [(r['name'], r['depth']) for r in rows] == [
+        ('submit_job', 0), ('process_job', 1), ('step 1', 2), ('FakeRepository.get_items', 3)
+    ]
+    assert all(r['job_uuid'] == 'job-1' for r in rows[1:])
+    assert 'FakeRepository.get_items' in render_waterfall(rows)
+    assert current_span() is None
+
+
+def test_spans_are_noops_when_tracing_is_off():
+    with patch.object(tracing, '_exporter', None), patch.object(tracing.config, 'TRACING_EXPORTER', 'none'):
+        with span('step 1') as s:
+            assert s is None
+        assert FakeRepository().get_items('job-1') == ['item']
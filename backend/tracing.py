@@ -0,0 +1,227 @@
+"""Span-based tracing of a job: submit -> pipeline steps -> conversions / LLM calls -> repositories.
+
+Spans form a tree per trace and carry the job UUID (inherited from the
+parent span), so every span of a job can be found and shown as a waterfall
+(GET /api/jobs/<uuid>/trace). Finished spans go to the exporter chosen by
+TRACING_EXPORTER:
+
+    none     tracing disabled (spans are no-ops)
+    console  one JSON line per span on stdout
+    file     JSON lines appended to TRACE_FILE (works offline; read back by the API)
+
+Spans follow the current thread; code that hands work to another thread
+passes `current_span()` and re-enters it there with `use_span(...)`.
+
+Lives at the top level (like config) so repositories can use it without
+importing the services package.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import config
+
+_local = threading.local()
+
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'job_uuid', 'start', 'end', 'attributes', 'status')
+
+    def __init__(self, name: str, parent: Optional['Span'], attributes: Dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.job_uuid = attributes.pop('job_uuid', None) or (parent.job_uuid if parent else None)
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes
+        self.status = 'ok'
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'job_uuid': str(self.job_uuid) if self.job_uuid else None,
+            'start': self.start,
+            'duration_ms': round(((self.end or time.time()) - self.start) * 1000, 3),
+            'status': self.status,
+            'attributes': self.attributes
+        }
+
+
+class ConsoleExporter:
+    def export(self, span: Span):
+        print(f"[TRACE] {json.dumps(span.to_dict(), ensure_ascii=False, default=str)}", flush=True)
+
+
+class FileExporter:
+    """Appends spans as JSON lines; one line per write keeps lines from several workers intact."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def read_job(self, job_uuid: str) -> List[Dict]:
+        """All spans of the traces that touched a job (including spans started before its UUID was known)."""
+        if not os.path.exists(self.path):
+            return []
+        spans = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        traces = {s['trace_id'] for s in spans if s.get('job_uuid') == job_uuid}
+        return [s for s in spans if s['trace_id'] in traces]
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    """Exporter configured by TRACING_EXPORTER, None when tracing is off."""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None and config.TRACING_EXPORTER != 'none':
+            if config.TRACING_EXPORTER == 'console':
+                _exporter = ConsoleExporter()
+            elif config.TRACING_EXPORTER == 'file':
+                _exporter = FileExporter(config.TRACE_FILE)
+            else:
+                raise ValueError(f"Unknown TRACING_EXPORTER: {config.TRACING_EXPORTER}")
+        return _exporter
+
+
+def current_span() -> Optional[Span]:
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def use_span(span: Optional[Span]):
+    """Make a span (e.g. from another thread) the parent of spans started here."""
+    if span is None:
+        yield None
+        return
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(span)
+    try:
+        yield span
+    finally:
+        stack.pop()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Trace a block. Yields the Span (None when tracing is off) so attributes can be added."""
+    current = start_span(name, **attributes)
+    if current is None:
+        yield None
+        return
+
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = 'error'
+        current.attributes['error'] = str(e)[:500]
+        raise
+    finally:
+        stack.pop()
+        end_span(current)
+
+
+def start_span(name: str, **attributes) -> Optional[Span]:
+    """Start a span without making it current, e.g. around a generator that yields to its caller."""
+    if get_exporter() is None:
+        return None
+    return Span(name, current_span(), attributes)
+
+
+def end_span(current: Optional[Span], error: Optional[str] = None):
+    if current is None:
+        return
+    if error:
+        current.status = 'error'
+        current.attributes['error'] = error[:500]
+    current.end = time.time()
+    try:
+        get_exporter().export(current)
+    except Exception as e:
+        print(f"[TRACE] Could not export span {current.name}: {e}", flush=True)
+
+
+def traced(cls):
+    """Class decorator: wrap every public method in a span named Class.method."""
+    for attr, method in list(vars(cls).items()):
+        if attr.startswith('_') or not callable(method) or isinstance(method, (staticmethod, classmethod)):
+            continue
+
+        def wrap(method, name):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                with span(name, kind='repository'):
+                    return method(*args, **kwargs)
+            return wrapper
+
+        setattr(cls, attr, wrap(method, f"{cls.__name__}.{attr}"))
+    return cls
+
+
+def waterfall(spans: List[Dict]) -> List[Dict]:
+    """Order spans depth-first by start time, with their offset from the job's first span and depth."""
+    if not spans:
+        return []
+    children: Dict[Optional[str], List[Dict]] = {}
+    ids = {s['span_id'] for s in spans}
+    for s in spans:
+        parent = s['parent_id'] if s['parent_id'] in ids else None
+        children.setdefault(parent, []).append(s)
+    origin = min(s['start'] for s in spans)
+
+    ordered = []
+
+    def visit(parent, depth):
+        for s in sorted(children.get(parent, []), key=lambda s: s['start']):
+            ordered.append(dict(s, depth=depth, offset_ms=round((s['start'] - origin) * 1000, 3)))
+            visit(s['span_id'], depth + 1)
+
+    visit(None, 0)
+    return ordered
+
+
+def render_waterfall(rows: List[Dict], width: int = 60) -> str:
+    """Plain-text waterfall: one bar per span, scaled to the whole job."""
+    if not rows:
+        return ''
+    total = max(r['offset_ms'] + r['duration_ms'] for r in rows) or 1
+    lines = []
+    for r in rows:
+        start = int(r['offset_ms'] / total * width)
+        length = max(1, int(r['duration_ms'] / total * width))
+        label = ('  ' * r['depth'] + r['name'])[:48]
+        bar = ' ' * start + '#' * length
+        lines.append(f"{label:<48} |{bar:<{width}}| {r['duration_ms']:>10.1f} ms{' !' if r['status'] == 'error' else ''}")
+    return '\n'.join(lines) + '\n'
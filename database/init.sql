@@ -16,25 +16,42 @@ CREATE INDEX IF NOT EXISTS facts_created_at_idx ON facts (created_at DESC);
 CREATE TABLE IF NOT EXISTS processing_jobs (
     id SERIAL PRIMARY KEY,
     job_uuid UUID DEFAULT gen_random_uuid() UNIQUE NOT NULL,
-    status VARCHAR(20) NOT NULL CHECK (status IN ('pending', 'processing', 'completed', 'failed')),
+    status VARCHAR(20) NOT NULL CHECK (status IN ('pending', 'processing', 'retrying', 'completed', 'failed')),
     report JSONB,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     completed_at TIMESTAMP,
-    error_message TEXT
+    error_message TEXT,
+    -- Client-supplied key of bulk submissions; a retried spec returns the job created first
+    idempotency_key VARCHAR(255) UNIQUE,
+    -- Kept so a failed job can be resumed with the configuration it was started with
+    processing_config JSONB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    -- When a 'retrying' job's next attempt is due; any worker's scheduler picks it up
+    retry_at TIMESTAMP,
+    -- Set when items are added to (or change in) a processed job, cleared when its report is saved again
+    report_stale BOOLEAN NOT NULL DEFAULT FALSE,
+    -- Link sources are re-checked every refresh_interval seconds (NULL = not monitored)
+    refresh_interval INTEGER CHECK (refresh_interval > 0),
+    refreshed_at TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS processing_items (
     id SERIAL PRIMARY KEY,
     job_id INTEGER NOT NULL REFERENCES processing_jobs(id) ON DELETE CASCADE,
     item_type VARCHAR(20) NOT NULL CHECK (item_type IN ('text', 'file', 'link')),
-    content TEXT NOT NULL,
+    -- Text and link items; file items reference a blob (SHA-256 of the file) in the blob store
+    content TEXT,
+    blob_hash VARCHAR(64),
+    content_size INTEGER,
+    content_hash VARCHAR(64),
     wage DECIMAL(10, 2),
     status VARCHAR(20) NOT NULL CHECK (status IN ('pending', 'processing', 'completed', 'failed')),
     processed_content TEXT,
     error_message TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT processing_items_content_check CHECK (content IS NOT NULL OR blob_hash IS NOT NULL)
 );
 
 CREATE TABLE IF NOT EXISTS processing_steps (
@@ -82,10 +99,50 @@ CREATE TABLE IF NOT EXISTS scraped_data (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Last converted version of a link item: HTTP validators and hashes used to detect changes
+CREATE TABLE IF NOT EXISTS link_snapshots (
+    item_id INTEGER PRIMARY KEY REFERENCES processing_items(id) ON DELETE CASCADE,
+    etag VARCHAR(512),
+    last_modified VARCHAR(64),
+    -- SHA-256 of the HTTP response body, and of the converted markdown (stored as a blob)
+    response_hash VARCHAR(64),
+    markdown_hash VARCHAR(64) NOT NULL,
+    -- How the page was last fetched: 'http' (plain GET) or 'browser' (Playwright), and how long it took
+    fetch_tier VARCHAR(10),
+    fetch_ms REAL,
+    checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Databases created before these columns existed: CREATE TABLE IF NOT EXISTS leaves their tables as they are
+ALTER TABLE processing_jobs
+    ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(255) UNIQUE,
+    ADD COLUMN IF NOT EXISTS processing_config JSONB,
+    ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS retry_at TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS report_stale BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS refresh_interval INTEGER CHECK (refresh_interval > 0),
+    ADD COLUMN IF NOT EXISTS refreshed_at TIMESTAMP;
+ALTER TABLE processing_jobs DROP CONSTRAINT IF EXISTS processing_jobs_status_check;
+ALTER TABLE processing_jobs ADD CONSTRAINT processing_jobs_status_check
+    CHECK (status IN ('pending', 'processing', 'retrying', 'completed', 'failed'));
+
+ALTER TABLE processing_items
+    ALTER COLUMN content DROP NOT NULL,
+    ADD COLUMN IF NOT EXISTS blob_hash VARCHAR(64),
+    ADD COLUMN IF NOT EXISTS content_size INTEGER,
+    ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE processing_items DROP CONSTRAINT IF EXISTS processing_items_content_check;
+ALTER TABLE processing_items ADD CONSTRAINT processing_items_content_check
+    CHECK (content IS NOT NULL OR blob_hash IS NOT NULL);
+
 CREATE INDEX IF NOT EXISTS processing_jobs_uuid_idx ON processing_jobs (job_uuid);
 CREATE INDEX IF NOT EXISTS processing_jobs_status_idx ON processing_jobs (status);
+CREATE INDEX IF NOT EXISTS processing_jobs_retry_idx ON processing_jobs (retry_at) WHERE status = 'retrying';
+CREATE INDEX IF NOT EXISTS processing_jobs_refresh_idx ON processing_jobs (refreshed_at) WHERE refresh_interval IS NOT NULL;
 CREATE INDEX IF NOT EXISTS processing_items_job_id_idx ON processing_items (job_id);
 CREATE INDEX IF NOT EXISTS processing_items_status_idx ON processing_items (status);
+CREATE INDEX IF NOT EXISTS processing_items_blob_hash_idx ON processing_items (blob_hash);
 CREATE INDEX IF NOT EXISTS processing_steps_job_id_idx ON processing_steps (job_id);
 CREATE INDEX IF NOT EXISTS processing_steps_status_idx ON processing_steps (status);
 CREATE INDEX IF NOT EXISTS extracted_facts_job_id_idx ON extracted_facts (job_id);
@@ -113,11 +170,63 @@ CREATE TABLE IF NOT EXISTS node_relations (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE TABLE IF NOT EXISTS job_reports (
+    id SERIAL PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES processing_jobs(id) ON DELETE CASCADE,
+    time_horizon VARCHAR(50) NOT NULL,
+    language VARCHAR(10) NOT NULL,
+    report JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(job_id, time_horizon, language)
+);
+
+CREATE TABLE IF NOT EXISTS report_tasks (
+    id SERIAL PRIMARY KEY,
+    task_uuid UUID DEFAULT gen_random_uuid() UNIQUE NOT NULL,
+    job_id INTEGER NOT NULL REFERENCES processing_jobs(id) ON DELETE CASCADE,
+    language VARCHAR(10) NOT NULL,
+    time_horizon VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL CHECK (status IN ('pending', 'processing', 'completed', 'failed')),
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS refresh_tasks (
+    id SERIAL PRIMARY KEY,
+    task_uuid UUID DEFAULT gen_random_uuid() UNIQUE NOT NULL,
+    job_id INTEGER NOT NULL REFERENCES processing_jobs(id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL CHECK (status IN ('pending', 'processing', 'completed', 'failed')),
+    summary JSONB,
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS report_sections (
+    id SERIAL PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES processing_jobs(id) ON DELETE CASCADE,
+    section VARCHAR(50) NOT NULL CHECK (section IN ('summary', 'positive_scenario', 'negative_scenario', 'recommendations')),
+    input_hash VARCHAR(64) NOT NULL,
+    language VARCHAR(10) NOT NULL,
+    time_horizon VARCHAR(50) NOT NULL,
+    content JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(job_id, section, input_hash)
+);
+
 CREATE INDEX IF NOT EXISTS nodes_type_idx ON nodes (type);
 CREATE INDEX IF NOT EXISTS nodes_job_id_idx ON nodes (job_id);
 CREATE INDEX IF NOT EXISTS node_relations_source_idx ON node_relations (source_node_id);
 CREATE INDEX IF NOT EXISTS node_relations_target_idx ON node_relations (target_node_id);
 CREATE INDEX IF NOT EXISTS node_relations_type_idx ON node_relations (relation_type);
+CREATE INDEX IF NOT EXISTS report_sections_job_id_idx ON report_sections (job_id);
+CREATE INDEX IF NOT EXISTS job_reports_job_id_idx ON job_reports (job_id);
+CREATE UNIQUE INDEX IF NOT EXISTS report_tasks_active_idx ON report_tasks (job_id, language, time_horizon)
+    WHERE status IN ('pending', 'processing');
 
 TRUNCATE TABLE node_relations, nodes, scraped_data, extracted_facts, processing_steps, processing_items, processing_jobs CASCADE;
 
@@ -1,15 +1,32 @@
 from flask import Flask, request, jsonify
 from sentence_transformers import SentenceTransformer
 import numpy as np
+import os
+import resource
 
 app = Flask(__name__)
 
 # Lightweight model for CPU - multilingual, good quality
 model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
 
+def current_rss_mb():
+    # Resident pages of this process now (Linux); None elsewhere
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'healthy', 'model': 'paraphrase-multilingual-MiniLM-L12-v2'}), 200
+    # ru_maxrss is reported in kilobytes on Linux; it is the high-water mark since the process started
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return jsonify({
+        'status': 'healthy',
+        'model': 'paraphrase-multilingual-MiniLM-L12-v2',
+        'rss_mb': current_rss_mb(),
+        'peak_rss_mb': round(peak_rss_mb, 1)
+    }), 200
 
 @app.route('/embed', methods=['POST'])
 def embed():
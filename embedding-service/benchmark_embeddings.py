@@ -0,0 +1,223 @@
+"""Benchmark / load-test harness for embedding service."""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+BASE_URL = "http://localhost:5001"
+
+SHORT_TEXTS = {
+    'en': [
+        "Atlantis signed a new energy agreement with Finland.",
+        "Inflation in the eurozone slowed to 2.1% in October.",
+        "The parliament approved the defence budget for next year.",
+        "A cyberattack disrupted the national railway signalling system.",
+        "Exports of chemical products grew by 7% year on year.",
+    ],
+    'pl': [
+        "Atlantis podpisała nową umowę energetyczną z Finlandią.",
+        "Inflacja w strefie euro spadła w październiku do 2,1%.",
+        "Parlament przyjął budżet obronny na przyszły rok.",
+        "Cyberatak zakłócił krajowy system sterowania ruchem kolejowym.",
+        "Eksport produktów chemicznych wzrósł o 7% rok do roku.",
+    ],
+}
+
+LONG_PARAGRAPHS = {
+    'en': (
+        "The government of Atlantis published a strategy for critical raw materials processing, "
+        "aiming to attract investment in refining capacity along its navigable rivers. Analysts note "
+        "that the plan depends on stable energy prices, on access to skilled workers and on the "
+        "outcome of negotiations with partners in Germany, France and Japan. "
+    ),
+    'pl': (
+        "Rząd Atlantis opublikował strategię przetwarzania surowców krytycznych, której celem jest "
+        "przyciągnięcie inwestycji w moce rafineryjne wzdłuż żeglownych rzek. Analitycy zauważają, "
+        "że plan zależy od stabilnych cen energii, dostępu do wykwalifikowanych pracowników oraz "
+        "wyniku negocjacji z partnerami z Niemiec, Francji i Japonii. "
+    ),
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def build_texts(count, length, pl_ratio, rng):
+    """Build a batch of texts: 'short' ~ single facts, 'long' ~ document chunks."""
+    texts = []
+    for _ in range(count):
+        lang = 'pl' if rng.random() < pl_ratio else 'en'
+        if length == 'short':
+            texts.append(rng.choice(SHORT_TEXTS[lang]))
+        else:
+            texts.append(LONG_PARAGRAPHS[lang] * rng.randint(4, 8))
+    return texts
+
+
+def get_rss_mb(base_url):
+    try:
+        return requests.get(f"{base_url}/health", timeout=10).json().get('rss_mb')
+    except Exception:
+        return None
+
+
+class RssSampler:
+    """Polls the service's current RSS in the background; `peak` is the largest value seen."""
+
+    def __init__(self, base_url, interval):
+        self.base_url = base_url
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            rss = get_rss_mb(self.base_url)
+            if rss is not None:
+                self.samples.append(rss)
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def peak(self):
+        return max(self.samples) if self.samples else None
+
+
+def run_scenario(base_url, batch_size, length, pl_ratio, concurrency, requests_count, seed, rss_interval):
+    rng = random.Random(seed)
+    batches = [build_texts(batch_size, length, pl_ratio, rng) for _ in range(requests_count)]
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+
+    def send(texts):
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}/embed", json={'texts': texts}, timeout=300)
+            ok = response.status_code == 200
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok, len(texts)
+
+    rss_before = get_rss_mb(base_url)
+    with RssSampler(base_url, rss_interval) as rss:
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(send, batches))
+        wall_time = time.perf_counter() - wall_start
+
+    latencies_ms = [r[0] * 1000 for r in results if r[1]]
+    texts_ok = sum(r[2] for r in results if r[1])
+    errors = sum(1 for r in results if not r[1])
+    rss_after = get_rss_mb(base_url)
+
+    return {
+        'batch_size': batch_size,
+        'text_length': length,
+        'pl_ratio': pl_ratio,
+        'concurrency': concurrency,
+        'requests': requests_count,
+        'errors': errors,
+        'wall_time_s': round(wall_time, 3),
+        'texts_per_sec': round(texts_ok / wall_time, 2) if wall_time > 0 else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies_ms, 50), 2) if latencies_ms else None,
+            'p95': round(percentile(latencies_ms, 95), 2) if latencies_ms else None,
+            'p99': round(percentile(latencies_ms, 99), 2) if latencies_ms else None,
+            'mean': round(statistics.mean(latencies_ms), 2) if latencies_ms else None,
+        },
+        'rss_before_mb': rss_before,
+        'rss_after_mb': rss_after,
+        # Largest RSS sampled while this scenario ran; a spike shorter than --rss-interval can be missed
+        'peak_rss_mb': rss.peak,
+        'rss_samples': len(rss.samples),
+    }
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the /embed endpoint.")
+    parser.add_argument('--url', default=BASE_URL)
+    parser.add_argument('--batch-sizes', type=parse_int_list, default=[1, 8, 32, 128])
+    parser.add_argument('--lengths', default='short,long', help="comma separated: short,long")
+    parser.add_argument('--pl-ratios', default='0,0.5,1', help="fraction of Polish texts, comma separated")
+    parser.add_argument('--concurrency', type=parse_int_list, default=[1, 4])
+    parser.add_argument('--requests', type=int, default=20, help="requests per scenario")
+    parser.add_argument('--warmup', type=int, default=2, help="warmup requests before measuring")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--rss-interval', type=float, default=0.2,
+                        help="seconds between /health RSS samples during a scenario")
+    parser.add_argument('--label', default='', help="free-form label, e.g. release or backend name")
+    parser.add_argument('--output', default='benchmark_results.json')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    lengths = [l.strip() for l in args.lengths.split(',') if l.strip()]
+    pl_ratios = [float(r) for r in args.pl_ratios.split(',') if r.strip()]
+
+    health = requests.get(f"{args.url}/health", timeout=10).json()
+    print(f"Service: {args.url}, model: {health.get('model')}")
+
+    for _ in range(args.warmup):
+        requests.post(f"{args.url}/embed", json={'texts': SHORT_TEXTS['en']}, timeout=300)
+
+    scenarios = []
+    for length in lengths:
+        for pl_ratio in pl_ratios:
+            for batch_size in args.batch_sizes:
+                for concurrency in args.concurrency:
+                    result = run_scenario(
+                        args.url, batch_size, length, pl_ratio,
+                        concurrency, args.requests, args.seed, args.rss_interval
+                    )
+                    scenarios.append(result)
+                    lat = result['latency_ms']
+                    print(
+                        f"{length:5} pl={pl_ratio:<4} batch={batch_size:<4} conc={concurrency:<3} "
+                        f"{result['texts_per_sec']} texts/s  p50={lat['p50']}ms p95={lat['p95']}ms "
+                        f"p99={lat['p99']}ms  errors={result['errors']}  "
+                        f"rss={result['rss_before_mb']}->{result['rss_after_mb']}MB peak={result['peak_rss_mb']}MB"
+                    )
+
+    report = {
+        'label': args.label,
+        'url': args.url,
+        'model': health.get('model'),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'requests_per_scenario': args.requests,
+        'scenarios': scenarios,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -21,18 +21,6 @@ export default function CreateAnalysisForm() {
     console.log('Zapisano jako szkic');
   };
 
-  const convertFileToBase64 = (file) => {
-    return new Promise((resolve, reject) => {
-      const reader = new FileReader();
-      reader.onload = () => {
-        const base64 = reader.result.split(',')[1];
-        resolve(base64);
-      };
-      reader.onerror = reject;
-      reader.readAsDataURL(file);
-    });
-  };
-
   const handleRunAnalysis = async () => {
     if (!positiveScenario && !negativeScenario) {
       alert('Wybierz co najmniej jeden wariant scenariusza');
@@ -42,7 +30,9 @@ export default function CreateAnalysisForm() {
     setIsSubmitting(true);
 
     try {
-      const items = await Promise.all(sources.map(async (source) => {
+      // Files are sent as multipart parts (streamed to the server), not base64 JSON
+      const formData = new FormData();
+      const items = sources.map((source, index) => {
         if (source.type === 'text') {
           return {
             type: 'text',
@@ -56,30 +46,28 @@ export default function CreateAnalysisForm() {
             wage: source.weight
           };
         } else if (source.type === 'file' || source.type === 'image') {
-          const base64Content = await convertFileToBase64(source.file);
+          const part = `file-${index}`;
+          formData.append(part, source.file, source.file.name);
           return {
             type: 'file',
-            content: base64Content,
+            file: part,
             wage: source.weight
           };
         }
+      });
+
+      formData.append('items', JSON.stringify(items));
+      formData.append('processing', JSON.stringify({
+        enable_scraping: true,
+        enable_fact_extraction: true,
+        enable_validation: true,
+        language: 'en',
+        time_horizon: timeHorizon === '12' ? '1 year' : '3 years'
       }));
 
-      const response = await fetch('http://localhost:8080/api/submit', {
+      const response = await fetch('http://localhost:8080/api/submit/multipart', {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          items,
-          processing: {
-            enable_scraping: true,
-            enable_fact_extraction: true,
-            enable_validation: true,
-            language: 'en',
-            time_horizon: timeHorizon === '12' ? '1 year' : '3 years'
-          }
-        })
+        body: formData
       });
 
       const data = await response.json();
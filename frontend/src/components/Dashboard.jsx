@@ -121,8 +121,8 @@ export default function Dashboard() {
                       <span className="text-sm font-medium text-gray-600">${item.wage}</span>
                     </div>
                     <div className="text-sm text-gray-700 mb-2">
-                      <span className="font-medium">Content:</span> {item.content.substring(0, 100)}
-                      {item.content.length > 100 && '...'}
+                      <span className="font-medium">Content:</span> {item.preview ?? `${item.content_size} bytes`}
+                      {item.preview && item.content_size > item.preview.length && '...'}
                     </div>
                     {item.processed_content && (
                       <div className="text-sm text-green-700 bg-green-50 p-2 rounded">